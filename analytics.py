@@ -0,0 +1,209 @@
+import numpy as np
+import pandas as pd
+
+import profiling
+from schema import AREAS, RESULTS, SHOT_TYPES
+
+REAR_AREAS = ["RR", "CR", "LR"]
+FRONT_AREAS = ["RF", "CF", "LF"]
+
+# 定義外の値（空欄や手入力の誤り）はまとめてこのラベルで数える
+UNKNOWN = "?"
+
+COUNT_COLUMNS = ["打点", "着地", "ショット", "結果"]
+CATEGORIES = {"打点": AREAS, "着地": AREAS, "ショット": SHOT_TYPES, "結果": RESULTS}
+
+# 試合IDの先頭の日付（例: 2025-03-27_①_...）
+_MATCH_DATE = r"^(\d{4}-\d{2}-\d{2})"
+
+# 選手の比較に使う指標（すべて 0〜1）
+COMPARE_METRICS = ["得点率", "ミス率", "多様性スコア", "中央打点率", "ドロップ率（後衛）", "スマッシュ率（後衛）", "クロス選択率（後衛）"]
+
+# bincount に使う配列の上限（選手数 × 組み合わせ数）。超える場合は np.unique で数える
+_BINCOUNT_LIMIT = 20_000_000
+
+
+def normalize(value, column):
+    return value if value in CATEGORIES[column] else UNKNOWN
+
+
+def category_codes(series, categories):
+    """categories 内の位置を整数コードにする。定義外と欠損は len(categories)。"""
+    if isinstance(series.dtype, pd.CategoricalDtype) and list(series.cat.categories) == categories:
+        # schema.to_typed() 済みの列はカテゴリコードをそのまま使う
+        codes = series.cat.codes.to_numpy().astype(np.int64)
+        codes[codes < 0] = len(categories)
+        return codes
+    codes, uniques = pd.factorize(series)
+    # 出現した値だけを対応表で引く。末尾は欠損（コード -1）用
+    lookup = np.array([categories.index(u) if u in categories else len(categories) for u in uniques] + [len(categories)], dtype=np.int64)
+    return lookup[codes]
+
+
+@profiling.timed(profiling.COMPUTE)
+def tidy_counts(shots):
+    """選手 × 打点 × 着地 × ショット × 結果 ごとの件数を1回の集計で求める。
+
+    列は 選手, 打点, 着地, ショット, 結果, 件数。件数が0の組み合わせは含まない。
+    """
+    shots = shots[shots["打った選手"].notna()]
+    player_codes, players = pd.factorize(shots["打った選手"])
+    dims = [len(CATEGORIES[col]) + 1 for col in COUNT_COLUMNS]
+    code = player_codes.astype(np.int64)
+    for col, size in zip(COUNT_COLUMNS, dims):
+        code = code * size + category_codes(shots[col], CATEGORIES[col])
+
+    n_bins = len(players) * int(np.prod(dims))
+    if n_bins <= _BINCOUNT_LIMIT:
+        counts = np.bincount(code, minlength=n_bins)
+        flat = np.flatnonzero(counts)
+        counts = counts[flat]
+    else:
+        flat, counts = np.unique(code, return_counts=True)
+
+    index = np.unravel_index(flat, [len(players)] + dims)
+    frame = {"選手": np.asarray(players, dtype=object)[index[0]]}
+    for col, codes in zip(COUNT_COLUMNS, index[1:]):
+        # カテゴリ型にしておくと、指標の計算での比較や str.contains が種類の数だけで済む
+        frame[col] = pd.Categorical.from_codes(codes, CATEGORIES[col] + [UNKNOWN])
+    frame["件数"] = counts.astype(np.int64)
+    return pd.DataFrame(frame)
+
+
+@profiling.timed(profiling.COMPUTE)
+def matches_played(shots):
+    """選手ごとの試合数（ショットを打った試合の数）。"""
+    shots = shots[shots["打った選手"].notna() & shots["試合ID"].notna()]
+    player_codes, players = pd.factorize(shots["打った選手"])
+    match_codes, matches = pd.factorize(shots["試合ID"])
+    n_matches = max(len(matches), 1)
+    code = player_codes.astype(np.int64) * n_matches + match_codes
+    if len(players) * n_matches <= _BINCOUNT_LIMIT:
+        pairs = np.flatnonzero(np.bincount(code, minlength=len(players) * n_matches))
+    else:
+        # return_counts を付けるとソートで求めるため、付けない場合より速い
+        pairs = np.unique(code, return_counts=True)[0]
+    counts = np.bincount(pairs // n_matches, minlength=len(players))
+    return pd.Series(counts, index=pd.Index(np.asarray(players, dtype=object), name="選手"), name="試合数")
+
+
+def match_shot_counts(shots):
+    """試合ごとのショット数。"""
+    column = shots["試合ID"]
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        codes = column.cat.codes.to_numpy()
+        counts = np.bincount(codes[codes >= 0], minlength=len(column.cat.categories))
+        return pd.Series(counts, index=pd.Index(np.asarray(column.cat.categories, dtype=object), name="試合ID"), name="ショット数")
+    return column.value_counts(sort=False).rename("ショット数")
+
+
+def _rate(count, total):
+    return (count / total.where(total > 0)).fillna(0)
+
+
+# 指標のもとになる件数。試合ごとに求めたものを足し合わせても、全体から求めたものと同じになる
+SUM_COLUMNS = ["総ショット数", "得点", "ミス", "中央打点", "中央選択", "後衛", "後衛ドロップ", "後衛スマッシュ", "後衛クロス"] + SHOT_TYPES
+
+
+def metric_sums(counts):
+    """tidy_counts() の結果から選手ごとの SUM_COLUMNS の件数を求める。"""
+    n = counts["件数"]
+    rear = counts["打点"].isin(REAR_AREAS)
+    shot = counts["ショット"]
+    sums = pd.DataFrame({
+        "総ショット数": n,
+        "得点": n.where(counts["結果"] == "得点", 0),
+        "ミス": n.where(counts["結果"] == "ミス", 0),
+        "中央打点": n.where(counts["打点"] == "CM", 0),
+        "中央選択": n.where(counts["打点"].str.contains("C") | counts["着地"].str.contains("C"), 0),
+        "後衛": n.where(rear, 0),
+        "後衛ドロップ": n.where(rear & (shot == "ドロップ"), 0),
+        "後衛スマッシュ": n.where(rear & (shot == "スマッシュ"), 0),
+        "後衛クロス": n.where(rear & counts["着地"].isin(FRONT_AREAS), 0),
+        **{t: n.where(shot == t, 0) for t in SHOT_TYPES},
+    }).groupby(counts["選手"], sort=False).sum()
+    sums.index.name = "選手"
+    return sums
+
+
+def metrics_from_sums(sums):
+    """metric_sums() の結果（または試合ごとのその和）から選手ごとの指標を求める。行は選手、率は 0〜1。"""
+    total = sums["総ショット数"]
+    metrics = sums.copy()
+    metrics["得点率"] = _rate(sums["得点"], total)
+    metrics["ミス率"] = _rate(sums["ミス"], total)
+    metrics["ミス率（逆）"] = (1 - metrics["ミス率"]).where(total > 0, 0)
+    metrics["多様性スコア"] = (sums[SHOT_TYPES] > 0).sum(axis=1) / len(SHOT_TYPES)
+    metrics["中央打点率"] = _rate(sums["中央打点"], total)
+    metrics["中央選択率"] = _rate(sums["中央選択"], total)
+    metrics["クリア選択率"] = _rate(sums["クリア"], total)
+    metrics["ロブ選択率"] = _rate(sums["ロブ"], total)
+    metrics["ドロップ率（後衛）"] = _rate(sums["後衛ドロップ"], sums["後衛"])
+    metrics["スマッシュ率（後衛）"] = _rate(sums["後衛スマッシュ"], sums["後衛"])
+    metrics["クロス選択率（後衛）"] = _rate(sums["後衛クロス"], sums["後衛"])
+    return metrics
+
+
+@profiling.timed(profiling.COMPUTE)
+def metrics_from_counts(counts):
+    """tidy_counts() の結果から選手ごとの指標を求める。行は選手、率は 0〜1。"""
+    return metrics_from_sums(metric_sums(counts))
+
+
+def player_metrics(shots):
+    return metrics_from_counts(tidy_counts(shots))
+
+
+def rear_shot_counts(counts, player):
+    """後衛エリアから打ったショット種類ごとの件数（多い順）。"""
+    rear = counts[(counts["選手"] == player) & counts["打点"].isin(REAR_AREAS)]
+    return rear.groupby("ショット")["件数"].sum().sort_values(ascending=False)
+
+
+def miss_area_counts(counts, player):
+    """ミスになったショットの打点ごとの件数（AREAS の順）。"""
+    miss = counts[(counts["選手"] == player) & (counts["結果"] == "ミス")]
+    return miss.groupby("打点")["件数"].sum().reindex(AREAS, fill_value=0)
+
+
+def match_dates(match_ids):
+    """試合IDの先頭の日付（datetime64）。日付で始まらない試合IDは NaT。"""
+    ids = pd.Series(pd.unique(pd.Series(match_ids, dtype=object).dropna()), dtype=object)
+    dates = pd.to_datetime(ids.str.extract(_MATCH_DATE)[0], format="%Y-%m-%d", errors="coerce")
+    return pd.Series(dates.to_numpy(), index=ids.to_numpy(), name="日付")
+
+
+@profiling.timed(profiling.COMPUTE)
+def metrics_by_date(shots):
+    """選手・試合日ごとの指標（調子の推移に使う）。index は (選手, 日付)。日付で始まらない試合IDのショットは除く。
+
+    (選手, 日付) の組を tidy_counts() の「選手」として渡し、1回の集計で求める。
+    """
+    shots = shots[shots["打った選手"].notna() & shots["試合ID"].notna()]
+    match_codes, match_ids = pd.factorize(shots["試合ID"])
+    shot_dates = match_dates(match_ids).reindex(np.asarray(match_ids, dtype=object)).to_numpy()[match_codes]
+    dated = ~pd.isna(shot_dates)
+    shots = shots[dated]
+    date_codes, dates = pd.factorize(shot_dates[dated])
+    player_codes, players = pd.factorize(shots["打った選手"])
+    n_dates = max(len(dates), 1)
+    pair_codes, pairs = pd.factorize(player_codes.astype(np.int64) * n_dates + date_codes)
+    metrics = metrics_from_counts(tidy_counts(shots.assign(打った選手=pair_codes)))
+    pair = np.asarray(pairs)[metrics.index.to_numpy(dtype=np.int64)]
+    metrics.index = pd.MultiIndex.from_arrays(
+        [np.asarray(players, dtype=object)[pair // n_dates], pd.DatetimeIndex(dates)[pair % n_dates]],
+        names=["選手", "日付"],
+    )
+    return metrics.sort_index()
+
+
+def shots_in_matches(shots, match_ids):
+    """試合IDが match_ids に含まれるショットだけを返す。
+
+    schema.to_typed() 済みの表なら、行ごとに比べずカテゴリごとに判定してからコードで引く。
+    """
+    column = shots["試合ID"]
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        allowed = np.append(column.cat.categories.isin(match_ids), False)
+        return shots[allowed[column.cat.codes.to_numpy()]]
+    return shots[column.isin(match_ids)]
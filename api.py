@@ -0,0 +1,362 @@
+"""ショットを HTTP で受け付ける API（スコア用タブレットや動画のタグ付けツールから記録する）。
+
+    python api.py [--host 127.0.0.1] [--port 8502] [--backend csv|sqlite] [--batch-window-ms 10]
+
+Streamlit の画面と同じ保存先（storage）に書き込む。標準ライブラリの asyncio だけで動く。
+
+- GET  /health
+- GET  /matches/<試合ID>/state                 試合の状態（スコア・次のラリー番号とショット順・次の打者）
+- POST /matches/<試合ID>/shots                 ショットを記録して、記録後の状態を返す
+
+POST の本文は、ショット1件の JSON オブジェクト・そのリスト・{"shots": [...]}・{"codes": "1RRLFs 3LFRRh ..."}（rapid_entry の形式）のいずれか。
+ショットのキーは SHOT_COLUMNS の列名（試合ID は URL から取る）。ラリー番号・ショット順を省くと、
+「試合開始・記録」ページと同じく試合の状態から振る。検証は schema.validate_shots() で行う。
+
+書き込みは1つのタスクにまとめ、batch-window の間に届いたリクエストを1回の append_shots() で書く。
+"""
+import argparse
+import asyncio
+import concurrent.futures
+import json
+import time
+import urllib.parse
+
+import pandas as pd
+
+import match_state
+import rapid_entry
+import storage
+from schema import COUNTER_COLUMNS, SHOT_COLUMNS, validate_shots
+
+MAX_BODY = 1 << 20
+# 大きすぎる本文を、413 を返す前に読み捨てる上限
+MAX_DRAIN = 16 << 20
+MAX_SHOTS = 5000
+MAX_BATCH = 500
+STATE_FIELDS = ["score", "rally_no", "shot_order", "next_player", "last_end_area", "shot_count"]
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class ApiError(Exception):
+    def __init__(self, status, message, details=None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.details = details
+
+
+def public_state(state):
+    return {field: state[field] for field in STATE_FIELDS}
+
+
+def parse_shots(body, match_id, players):
+    """本文をショットの dict（SHOT_COLUMNS）のリストにする。ラリー番号・ショット順は省略されていれば None。"""
+    if isinstance(body, dict) and "codes" in body:
+        shots, errors = rapid_entry.parse(str(body["codes"]), players)
+        if errors:
+            raise ApiError(400, "コードを読めませんでした。", errors)
+        # レシーバーは rapid_entry.to_rows() と同じく、同じラリーの次の球を打った選手
+        for shot, nxt in zip(shots, shots[1:] + [None]):
+            ends_rally = shot["結果"] in match_state.RALLY_END_RESULTS
+            shot["レシーバー"] = nxt["打った選手"] if nxt and not ends_rally else ""
+    elif isinstance(body, dict) and "shots" in body:
+        shots = body["shots"]
+    elif isinstance(body, dict):
+        shots = [body]
+    else:
+        shots = body
+    if not isinstance(shots, list) or not shots or not all(isinstance(s, dict) for s in shots):
+        raise ApiError(400, "ショットがありません。")
+    if len(shots) > MAX_SHOTS:
+        raise ApiError(413, f"1回に送れるショットは {MAX_SHOTS} 件までです。")
+    shots = [{col: shot.get(col) for col in SHOT_COLUMNS} | {"試合ID": match_id} for shot in shots]
+    unknown = sorted({str(s["打った選手"]) for s in shots if s["打った選手"] is not None} - set(players))
+    if unknown:
+        raise ApiError(400, "この試合の選手ではありません: " + "、".join(unknown))
+    for shot in shots:
+        shot["レシーバー"] = shot["レシーバー"] or ""
+    return shots
+
+
+def shot_errors(shots):
+    """schema.validate_shots() で不正な行を調べ、{位置: 理由} を返す。"""
+    # ラリー番号・ショット順は後で振ることがあるので、省略されたものは検証のときだけ仮の値を入れる
+    frame = pd.DataFrame(shots, columns=SHOT_COLUMNS)
+    for col in COUNTER_COLUMNS:
+        frame[col] = frame[col].fillna(1)
+    reasons = validate_shots(frame)
+    return {int(i): r for i, r in reasons.items() if r}
+
+
+class ShotWriter:
+    """保存先への読み書きをまとめる。
+
+    保存先の呼び出しはすべて1本のスレッドで順に行う（同じ試合のラリー番号・ショット順が前後しないように）。
+    batch_window の間に届いたリクエストは、検証も書き込みも1回にまとめる。
+    試合の状態は、保存先のデータが自分の書き込み以外で変わっていない間はメモリのものを使う。
+    """
+
+    def __init__(self, backend, batch_window=0.01, max_batch=MAX_BATCH):
+        self.backend = backend
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.queue = asyncio.Queue()
+        self.stats = {"requests": 0, "shots": 0, "batches": 0}
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        self._states = {}
+        self._task = None
+
+    async def call(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+        self._executor.shutdown(wait=True)
+
+    # ここから下の _ で始まるメソッドは executor のスレッドで動く
+
+    def _players(self, match_ids):
+        """{試合ID: 選手名のリスト}。登録されていない試合は入らない。"""
+        matches = self.backend.load_matches()
+        rows = matches[matches["試合ID"].isin(match_ids)].dropna(subset=["選手名"])
+        return {m: names.astype(str).tolist() for m, names in rows.groupby("試合ID", sort=False)["選手名"]}
+
+    def _check_match(self, players, match_id):
+        if match_id not in players:
+            raise ApiError(404, f"試合 {match_id} は登録されていません。")
+        return players[match_id]
+
+    def _state(self, match_id, version):
+        cached = self._states.get(match_id)
+        if cached is None or cached[0] != version:
+            cached = (version, self.backend.load_match_state(match_id))
+            self._states[match_id] = cached
+        return cached[1]
+
+    def _get_state(self, match_id):
+        self._check_match(self._players([match_id]), match_id)
+        return public_state(self._state(match_id, self.backend.data_version()))
+
+    def _parse(self, requests):
+        """requests の (試合ID, 本文) をショットのリストにする。不正なリクエストは ApiError になる。"""
+        players = self._players({match_id for match_id, _ in requests})
+        parsed = []
+        for match_id, body in requests:
+            try:
+                parsed.append(parse_shots(body, match_id, self._check_match(players, match_id)))
+            except ApiError as e:
+                parsed.append(e)
+        # 検証はまとめて1回
+        shots = [shot for p in parsed if not isinstance(p, ApiError) for shot in p]
+        errors = shot_errors(shots) if shots else {}
+        if not errors:
+            return parsed
+        offset = 0
+        for i, p in enumerate(parsed):
+            if isinstance(p, ApiError):
+                continue
+            mine = [{"index": j, "理由": errors[offset + j]} for j in range(len(p)) if offset + j in errors]
+            offset += len(p)
+            if mine:
+                parsed[i] = ApiError(400, "不正なショットがあります。", mine)
+        return parsed
+
+    def _write(self, requests):
+        """requests は (試合ID, 本文) のリスト。それぞれの記録後の状態（または ApiError）を返す。"""
+        parsed = self._parse(requests)
+        # 状態を読んでから書き終えるまでの間に別プロセス（Streamlit の画面など）が書き込むと、
+        # 古い状態でラリー番号を振ったり、その書き込みを含む版を自分の書き込みだけの版と取り違えたりするので、
+        # バージョンの読み取りから書き込みまでを保存先のショットのロックの中で行う
+        with self.backend.shots_lock():
+            before = self.backend.data_version()
+            rows, results, touched = [], [], set()
+            for (match_id, _), shots in zip(requests, parsed):
+                if isinstance(shots, ApiError):
+                    results.append(shots)
+                    continue
+                state = self._state(match_id, before)
+                touched.add(match_id)
+                for row in shots:
+                    if row["ラリー番号"] is None or row["ショット順"] is None:
+                        row["ラリー番号"], row["ショット順"] = state["rally_no"], state["shot_order"]
+                    row["ラリー番号"], row["ショット順"] = int(row["ラリー番号"]), int(row["ショット順"])
+                    match_state.apply(state, row)
+                    rows.append([row[col] for col in SHOT_COLUMNS])
+                results.append({"recorded": len(shots), "state": public_state(state)})
+            if not rows:
+                return results
+            try:
+                self.backend.append_shots(rows)
+            except Exception:
+                # 状態はメモリ上で進めてしまったので、次は読み直させる
+                for match_id in touched:
+                    self._states.pop(match_id, None)
+                raise
+            after = self.backend.data_version()
+        # 書き込み前に最新だった状態（書き込んだ試合の分は上で進めてある）はそのまま使える
+        for match_id, (version, state) in list(self._states.items()):
+            if version == before:
+                self._states[match_id] = (after, state)
+        self.stats["shots"] += len(rows)
+        return results
+
+    async def submit(self, match_id, body):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((match_id, body, future))
+        return await future
+
+    async def _run(self):
+        while True:
+            batch = [await self.queue.get()]
+            deadline = time.perf_counter() + self.batch_window
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                results = await self.call(self._write, [(m, body) for m, body, _ in batch])
+            except Exception as e:  # 書き込みに失敗したらまとめた全員に返す
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.stats["requests"] += len(batch)
+            self.stats["batches"] += 1
+            for (_, _, future), result in zip(batch, results):
+                if isinstance(result, ApiError):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+
+async def _read_request(reader):
+    """リクエストを1件読む。接続が閉じられていれば None。
+
+    読めないリクエストは ApiError になる。そのときは呼び出し側（make_handler()）が keep-alive にせず、応答の後で接続を閉じる。
+    """
+    line = await reader.readline()
+    if not line:
+        return None
+    parts = line.decode("latin-1").rstrip("\r\n").split(" ")
+    if len(parts) != 3 or not parts[2].startswith("HTTP/"):
+        raise ApiError(400, "リクエスト行を読めませんでした。")
+    method, target, _ = parts
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        length = -1
+    if length < 0:
+        raise ApiError(400, "Content-Length が正しくありません。")
+    if length > MAX_BODY:
+        # 読まずに閉じると、クライアントが応答を読む前に接続がリセットされることがあるので、
+        # MAX_DRAIN までなら本文を読み捨ててから 413 を返す（それより大きければそのまま閉じる）
+        if length <= MAX_DRAIN:
+            while length > 0:
+                length -= len(await reader.readexactly(min(length, 1 << 16)))
+        raise ApiError(413, "本文が大きすぎます。")
+    body = await reader.readexactly(length) if length else b""
+    return method, target, headers, body
+
+
+def _response(status, payload, keep_alive):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    head = (
+        f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+        "Content-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+    )
+    return head.encode("latin-1") + body
+
+
+async def route(writer, method, target, body):
+    parts = [urllib.parse.unquote(p) for p in urllib.parse.urlsplit(target).path.strip("/").split("/")]
+    if parts == ["health"]:
+        return {"ok": True, **writer.stats}
+    if len(parts) == 3 and parts[0] == "matches" and parts[2] in ("state", "shots"):
+        match_id = parts[1]
+        if parts[2] == "state" and method == "GET":
+            return await writer.call(writer._get_state, match_id)
+        if parts[2] == "shots" and method == "POST":
+            try:
+                payload = json.loads(body or b"null")
+            except ValueError:
+                raise ApiError(400, "本文が JSON ではありません。")
+            return await writer.submit(match_id, payload)
+        raise ApiError(405, f"{method} は使えません。")
+    raise ApiError(404, "そのパスはありません。")
+
+
+def make_handler(writer):
+    async def handle(reader, stream):
+        try:
+            while True:
+                keep_alive = False
+                try:
+                    request = await _read_request(reader)
+                    if request is None:
+                        break
+                    method, target, headers, body = request
+                    keep_alive = headers.get("connection", "").lower() != "close"
+                    status, payload = 200, await route(writer, method, target, body)
+                except ApiError as e:
+                    status, payload = e.status, {"error": e.message, "details": e.details}
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                except Exception as e:
+                    status, payload = 500, {"error": str(e)}
+                stream.write(_response(status, payload, keep_alive))
+                await stream.drain()
+                if not keep_alive:
+                    break
+        finally:
+            stream.close()
+    return handle
+
+
+async def serve(backend, host="127.0.0.1", port=8502, batch_window=0.01, ready=None):
+    writer = ShotWriter(backend, batch_window)
+    writer.start()
+    server = await asyncio.start_server(make_handler(writer), host, port)
+    if ready is not None:
+        ready(server.sockets[0].getsockname()[1])
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ショットを HTTP で受け付ける")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    parser.add_argument("--backend", choices=["csv", "sqlite"], default=storage.STORAGE_BACKEND)
+    parser.add_argument("--batch-window-ms", type=float, default=10, help="この時間内に届いたリクエストをまとめて書く")
+    args = parser.parse_args()
+
+    backend = storage.get_backend(args.backend)
+    print(f"http://{args.host}:{args.port} で待ち受けます（保存先: {args.backend}）")
+    try:
+        asyncio.run(serve(backend, args.host, args.port, args.batch_window_ms / 1000))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
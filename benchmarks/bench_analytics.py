@@ -0,0 +1,76 @@
+"""データ解析の指標計算を、従来の処理と analytics.player_metrics() で比較する。
+
+    python benchmarks/bench_analytics.py [--sizes 100000 10000000] [--players 20]
+
+従来の処理は「データ解析」ページの1選手分（マスクごとの .shape[0] と行単位の apply）、
+analytics は全選手分を1回の集計で求める。
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+import analytics  # noqa: E402
+
+
+def make_shots(n, n_players, seed=0):
+    rng = np.random.default_rng(seed)
+    players = np.array([f"選手{i:03d}" for i in range(n_players)], dtype=object)
+    areas = np.array(analytics.AREAS, dtype=object)
+    return pd.DataFrame({
+        "試合ID": np.array([f"2025-03-27_{i}" for i in range(max(1, n // 500))], dtype=object)[rng.integers(0, max(1, n // 500), n)],
+        "打った選手": players[rng.integers(0, n_players, n)],
+        "打点": areas[rng.integers(0, 9, n)],
+        "着地": areas[rng.integers(0, 9, n)],
+        "ショット": np.array(analytics.SHOT_TYPES, dtype=object)[rng.integers(0, 9, n)],
+        "結果": np.array(analytics.RESULTS, dtype=object)[rng.choice(4, n, p=[0.8, 0.08, 0.08, 0.04])],
+    })
+
+
+def legacy_metrics(df, selected_player):
+    player_df = df[df["打った選手"] == selected_player]
+    score_count = player_df[player_df["結果"] == "得点"].shape[0]
+    miss_count = player_df[player_df["結果"] == "ミス"].shape[0]
+    total = player_df.shape[0]
+    rear_areas = ["RR", "CR", "LR"]
+    rear_shots = player_df[player_df["打点"].isin(rear_areas)]
+    drop_count = (rear_shots["ショット"] == "ドロップ").sum()
+    smash_count = (rear_shots["ショット"] == "スマッシュ").sum()
+    cross_count = rear_shots.apply(lambda row: row["着地"] in ["LF", "CF", "RF"] and row["打点"] in ["RR", "CR", "LR"] and row["打点"] != row["着地"], axis=1).sum()
+    center_hits = player_df[(player_df["打点"].str.contains("C")) | (player_df["着地"].str.contains("C"))].shape[0]
+    clear_rate = player_df[player_df["ショット"] == "クリア"].shape[0] / total
+    lob_rate = player_df[player_df["ショット"] == "ロブ"].shape[0] / total
+    miss_df = player_df[player_df["結果"] == "ミス"]
+    area_counts = miss_df["打点"].value_counts().reindex(analytics.AREAS, fill_value=0)
+    return score_count, miss_count, drop_count, smash_count, cross_count, center_hits, clear_rate, lob_rate, area_counts
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - t0, result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 10_000_000])
+    parser.add_argument("--players", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'ショット数':>10} {'従来・1選手 (s)':>16} {'analytics・全選手 (s)':>22} {'1選手あたり比':>14}")
+    for n in args.sizes:
+        df = make_shots(n, args.players)
+        player = df["打った選手"].iloc[0]
+        legacy_s, _ = timed(lambda: legacy_metrics(df, player))
+        new_s, metrics = timed(lambda: analytics.player_metrics(df))
+        assert len(metrics) == args.players
+        print(f"{n:>10} {legacy_s:>16.3f} {new_s:>22.3f} {legacy_s * args.players / new_s:>13.1f}x")
+
+
+if __name__ == "__main__":
+    main()
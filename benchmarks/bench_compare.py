@@ -0,0 +1,77 @@
+"""「選手比較・ランキング」ページの集計にかかる時間を計測する。
+
+    python benchmarks/bench_compare.py [--shots 2000000] [--matches 4000] [--players 300]
+
+全選手の指標を、期間・試合形式で絞り込んだショットの1回の集計で求め、ランキング表と比較の図を作るまでの時間。
+比較として、プロフィール一覧と同じく選手ごとに絞り込んで集計する方法も計測する。
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+import plotly.graph_objects as go  # noqa: E402
+
+import analytics  # noqa: E402
+import schema  # noqa: E402
+from bench_schema import make_shots  # noqa: E402
+
+
+def leaderboard(shots, match_ids):
+    subset = analytics.shots_in_matches(shots, match_ids)
+    metrics = analytics.player_metrics(subset)
+    metrics["試合数"] = analytics.matches_played(subset).reindex(metrics.index, fill_value=0)
+    table = metrics[metrics["総ショット数"] >= 50].sort_values("得点率", ascending=False)
+    top = table.head(20)[analytics.COMPARE_METRICS]
+    go.Figure(go.Heatmap(z=top.to_numpy(), x=analytics.COMPARE_METRICS, y=top.index.tolist()))
+    return table
+
+
+def per_player(shots, match_ids):
+    subset = shots[shots["試合ID"].isin(match_ids)]
+    rows = {}
+    for player in subset["打った選手"].dropna().unique():
+        rows[player] = analytics.player_metrics(subset[subset["打った選手"] == player]).iloc[0]
+    return pd.DataFrame(rows).T
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shots", type=int, default=2_000_000)
+    parser.add_argument("--matches", type=int, default=4000)
+    parser.add_argument("--players", type=int, default=300)
+    parser.add_argument("--per-player", action="store_true", help="選手ごとに集計する方法も計測する（遅い）")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    shots = make_shots(args.shots, args.matches)
+    players = np.array([f"選手{i:03d}" for i in range(args.players)], dtype=object)
+    shots["打った選手"] = players[rng.integers(0, args.players, args.shots)]
+    shots = schema.to_typed(shots)
+
+    dates = analytics.match_dates(shots["試合ID"].cat.categories)
+    cases = {
+        "全期間": set(dates.index),
+        "上半期": set(dates.index[dates < pd.Timestamp("2025-07-01")]),
+        "1か月": set(dates.index[(dates >= pd.Timestamp("2025-03-01")) & (dates < pd.Timestamp("2025-04-01"))]),
+    }
+    print(f"{args.shots} 球・{args.players} 人")
+    for name, match_ids in cases.items():
+        times = []
+        for _ in range(5):
+            t0 = time.perf_counter()
+            table = leaderboard(shots, match_ids)
+            times.append(time.perf_counter() - t0)
+        print(f"  {name:<6} {len(match_ids):5d} 試合  {sorted(times)[2] * 1000:7.0f} ms  （{len(table)} 人）")
+    if args.per_player:
+        t0 = time.perf_counter()
+        per_player(shots, cases["全期間"])
+        print(f"  （比較）選手ごとに集計  {(time.perf_counter() - t0) * 1000:7.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
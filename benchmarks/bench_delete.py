@@ -0,0 +1,77 @@
+"""記録の取り消し・試合の削除にかかる時間を、保存済みショット数ごとに計測する。
+
+    python benchmarks/bench_delete.py [--sizes 10000 100000 1000000]
+
+目印（tombstone）の追記による削除と、従来の read_csv → to_csv による全書き換えを比較する。
+画面の再実行で読み込み済みの状態を想定し、読み込みのキャッシュは計測前に温めておく。
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd  # noqa: E402
+
+import storage  # noqa: E402
+from bench_schema import make_shots  # noqa: E402
+
+
+def legacy_delete_last(path, match_id):
+    df = pd.read_csv(path)
+    target = df[df["試合ID"] == match_id]
+    df.drop(index=target.index[-1]).to_csv(path, index=False)
+
+
+def legacy_delete_match(path, match_id):
+    df = pd.read_csv(path)
+    df[df["試合ID"] != match_id].to_csv(path, index=False)
+
+
+def timed(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    times.sort()
+    return times[len(times) // 2] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'保存済み件数':>12} {'取り消し (ms)':>14} {'全書き換え (ms)':>16} {'試合削除 (ms)':>14} {'全書き換え (ms)':>16}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            shots = make_shots(n, max(n // 500, 1))
+            match_ids = shots["試合ID"].value_counts().index  # ショットの多い試合から
+            paths = [os.path.join(tmp, name) for name in ("players.csv", "matches.csv", "shots.csv", "player_stats.json")]
+            shots.to_csv(paths[2], index=False)
+            if os.path.exists(storage.tombstone_path(paths[2])):
+                os.remove(storage.tombstone_path(paths[2]))
+            backend = storage.CsvBackend(*paths)
+            backend.load_player_counts()
+
+            def undo():
+                backend.delete_last_shot(match_ids[0])
+                backend.load_shots()  # 次の再実行で読み直す分（目印だけなのでキャッシュの作り直しのみ）
+
+            undo_ms = timed(undo, args.repeat)
+            deleted = iter(match_ids[1:])
+            delete_ms = timed(lambda: backend.delete_match(next(deleted)), args.repeat)
+
+            shots.to_csv(paths[2], index=False)
+            legacy_undo_ms = timed(lambda: legacy_delete_last(paths[2], match_ids[0]), args.repeat)
+            deleted = iter(match_ids[1:])
+            legacy_delete_ms = timed(lambda: legacy_delete_match(paths[2], next(deleted)), args.repeat)
+            print(f"{n:>12} {undo_ms:>14.1f} {legacy_undo_ms:>16.1f} {delete_ms:>14.1f} {legacy_delete_ms:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
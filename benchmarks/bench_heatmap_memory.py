@@ -0,0 +1,88 @@
+"""データ解析ページのミス打点ヒートマップを何千回も再実行したときのメモリの増え方を比べる。
+
+    python benchmarks/bench_heatmap_memory.py [--reruns 5000] [--players 20] [--legacy-reruns 200] [--png-reruns 200]
+
+- 従来: 再実行のたびに plt.subplots + sns.heatmap で図を作り、閉じない
+- png: heatmap.render_png（Figure を使い回す matplotlib 描画）をキャッシュなしで毎回実行
+- svg (キャッシュ): ページと同じ heatmap.cached_heatmap
+
+再実行ごとに選手を切り替え、ときどき件数を変える（記録が進んだ場合）。
+matplotlib で描く2つは1回あたり数百ミリ秒かかるため、それぞれ --legacy-reruns / --png-reruns 回だけ実行する。
+"""
+import argparse
+import gc
+import os
+import resource
+import sys
+import time
+import tracemalloc
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import matplotlib  # noqa: E402
+
+matplotlib.use("Agg")
+# 日本語フォントがない環境でも計測できるよう、グリフ欠けの警告は出さない
+warnings.filterwarnings("ignore", message="Glyph .* missing")
+
+import matplotlib.pyplot as plt  # noqa: E402
+import numpy as np  # noqa: E402
+
+import heatmap  # noqa: E402
+
+
+def make_grids(n_players, seed=0):
+    rng = np.random.default_rng(seed)
+    return [rng.integers(0, 30, size=(3, 3)) for _ in range(n_players)]
+
+
+def legacy(grid, title):
+    import seaborn as sns
+
+    fig, ax = plt.subplots(figsize=(5, 4))
+    sns.heatmap(grid, annot=True, fmt="d", cmap="Reds", xticklabels=heatmap.COLUMN_LABELS, yticklabels=heatmap.ROW_LABELS, ax=ax)
+    ax.set_title(title)
+    # st.pyplot と同じく PNG に書き出す
+    fig.savefig(os.devnull, format="png")
+
+
+def run(name, draw, reruns, grids):
+    gc.collect()
+    tracemalloc.start()
+    start_mem = tracemalloc.get_traced_memory()[0]
+    t0 = time.perf_counter()
+    checkpoints = []
+    for i in range(reruns):
+        grid = grids[i % len(grids)]
+        if i % 97 == 0:
+            grid[0, 0] += 1  # 記録が進んで件数が変わった
+        draw(grid, f"選手{i % len(grids)} のミス発生打点分布")
+        if (i + 1) % max(reruns // 4, 1) == 0:
+            checkpoints.append((tracemalloc.get_traced_memory()[0] - start_mem) / 1e6)
+    elapsed = time.perf_counter() - t0
+    tracemalloc.stop()
+    growth = " → ".join(f"{m:.1f}" for m in checkpoints)
+    print(f"{name:<14} {reruns:>6} 回 {elapsed / reruns * 1000:>8.2f} ms/回  増加量 (MB): {growth}  開いている図: {len(plt.get_fignums())}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reruns", type=int, default=5000)
+    parser.add_argument("--players", type=int, default=20)
+    parser.add_argument("--legacy-reruns", type=int, default=200)
+    parser.add_argument("--png-reruns", type=int, default=200)
+    args = parser.parse_args()
+
+    if args.legacy_reruns:
+        run("従来", legacy, args.legacy_reruns, make_grids(args.players))
+        plt.close("all")
+    if args.png_reruns:
+        run("png", heatmap.render_png, args.png_reruns, make_grids(args.players))
+    run("svg (キャッシュ)", heatmap.cached_heatmap, args.reruns, make_grids(args.players))
+    print(f"キャッシュ: ヒット {heatmap.stats['hits']} / ミス {heatmap.stats['misses']}")
+    print(f"最大RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
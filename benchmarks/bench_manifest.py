@@ -0,0 +1,51 @@
+"""起動時のデータファイルの確認にかかる時間を、保存済みショット数ごとに計測する。
+
+    python benchmarks/bench_manifest.py [--sizes 10000 100000 1000000] [--repeat 200]
+
+「従来」は以前のスクリプト先頭の確認（matches.csv を read_csv して列名を比べる）。
+「目録」は storage.check_files()。初回（目録を作り、行数とチェックサムを数える）と2回目以降を分けて表示する。
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd  # noqa: E402
+
+import storage  # noqa: E402
+import synthetic  # noqa: E402
+
+
+def per_call_ms(fn, repeat):
+    t0 = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - t0) / repeat * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'ショット数':>10} {'従来 (ms)':>10} {'目録・初回 (s)':>14} {'目録 (ms)':>10}")
+    for n in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            synthetic.write_season(tmp, n)
+            paths = [os.path.join(tmp, name) for name in ("players.csv", "matches.csv", "shots.csv")]
+            legacy = per_call_ms(lambda: list(pd.read_csv(paths[1]).columns) == storage.MATCH_COLUMNS, max(args.repeat // 20, 1))
+            t0 = time.perf_counter()
+            storage.check_files(*paths)
+            first = time.perf_counter() - t0
+            steady = per_call_ms(lambda: storage.check_files(*paths), args.repeat)
+        print(f"{n:>10} {legacy:>10.2f} {first:>14.2f} {steady:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
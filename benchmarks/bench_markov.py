@@ -0,0 +1,56 @@
+"""ラリーのマルコフ連鎖モデルの作成時間と、選手・ペアごとの計算時間をショット数ごとに計測する。
+
+    python benchmarks/bench_markov.py [--sizes 100000 1000000 2000000] [--subjects 20]
+
+「作成」は markov.RallyModel（並べ替え・全体の遷移）の時間で、データか期間が変わったときに1回だけかかる。
+「選手」「ペア」は subject() の1件あたりの時間（遷移の bincount と 162 状態の連立方程式）で、画面で対象を切り替えるたびにかかる。
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import markov  # noqa: E402
+import storage  # noqa: E402
+import synthetic  # noqa: E402
+
+
+def per_subject_ms(model, kind, count):
+    names = model.labels(kind)[:count]
+    if not names:
+        return float("nan")
+    t0 = time.perf_counter()
+    for name in names:
+        model.subject(kind, name)
+    return (time.perf_counter() - t0) / len(names) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 1_000_000, 2_000_000])
+    parser.add_argument("--subjects", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'ショット数':>10} {'作成 (s)':>10} {'選手 (ms)':>10} {'ペア (ms)':>10}")
+    for n in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            synthetic.write_season(tmp, n)
+            os.chdir(tmp)
+            backend = storage.get_backend("csv")
+            shots, matches = backend.load_shots(), backend.load_matches()
+            t0 = time.perf_counter()
+            model = markov.RallyModel(shots, matches)
+            build = time.perf_counter() - t0
+            player = per_subject_ms(model, "選手", args.subjects)
+            pair = per_subject_ms(model, "ペア", args.subjects)
+            os.chdir(ROOT)
+        print(f"{n:>10} {build:>10.2f} {player:>10.2f} {pair:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""アプリの主なページを合成データで実際に動かし、再実行1回あたりの時間をデータの規模ごとに計測する。
+
+    python benchmarks/bench_pages.py [--sizes 10000 100000 1000000] [--repeat 5] [--json 結果.json] [--baseline 前回.json]
+
+規模ごとに benchmarks/synthetic.py で players.csv / matches.csv / shots.csv を作り、
+別プロセスで badminton.py を Streamlit の AppTest で実行する。時間は profiling の記録（スクリプト1回分）。
+- キャッシュなし: 読み込みのキャッシュを捨ててから開いたとき
+- 再実行: 選手の切り替え・ショットの記録（高速入力は10球のラリー1回）など、ページ上の操作1回ごとの中央値と、その内訳（読み込み・計算・描画）
+- 操作全体: 同じ操作の経過時間。ボタンのコールバック（スクリプトの前に動く）と AppTest 自体の時間も含む
+--baseline に前回の --json を渡すと、1.5倍以上かつ 20 ms 以上遅くなったページに印を付ける。
+"""
+import argparse
+import glob
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import profiling  # noqa: E402
+import synthetic  # noqa: E402
+
+REGRESSION_RATIO = 1.5
+REGRESSION_MIN_MS = 20
+
+
+def _kinds(rerun):
+    table = profiling.summary(rerun)
+    return {kind: round(float(table.loc[kind, "時間(ms)"]), 1) for kind in (profiling.READ, profiling.COMPUTE, profiling.RENDER) if kind in table.index}
+
+
+def _record(at):
+    next(b for b in at.button if b.label == "記録する").click().run()
+
+
+# 高速入力で1回に送るラリー（10球）
+RALLY_CODES = " ".join(["1RRLFs", "3LFRRh", "2RRCMc", "4CMLRd"] * 2 + ["1LRRFp", "3RFCFh-"])
+
+
+def _record_rally(at):
+    if at.radio[0].value == "1球ずつ":
+        at.radio[0].set_value("高速入力（ラリーごと）").run()
+    at.text_area[0].set_value(RALLY_CODES)
+    next(b for b in at.button if b.label == "ラリーを記録").click().run()
+
+
+def _next_option(at):
+    # 最初の選択欄（選手・絞り込み）を次の項目に切り替える
+    box = at.selectbox[0]
+    box.set_value(box.options[(box.options.index(box.value) + 1) % len(box.options)]).run()
+
+
+def _rerun(at):
+    at.run()
+
+
+# ページ名 → 再実行ごとの操作
+SCENARIOS = {
+    "試合開始・記録": _record,
+    "試合開始・記録（高速入力・10球）": _record_rally,
+    "選手プロフィール一覧": _rerun,
+    "データ解析": _next_option,
+    "選手比較・ランキング": _rerun,
+    "試合管理": _next_option,
+}
+
+
+def worker(directory, repeat):
+    """directory の CSV を使ってページを実行し、結果を JSON で標準出力に書く。"""
+    os.chdir(directory)
+    import data_access
+    from streamlit.testing.v1 import AppTest
+
+    results = {}
+    for name, action in SCENARIOS.items():
+        page = name.split("（")[0]
+        data_access.invalidate()
+        at = AppTest.from_file(os.path.join(ROOT, "badminton.py"), default_timeout=600)
+        at.session_state["page"] = page
+        at.run()
+        if at.exception:
+            results[name] = {"error": str(at.exception[0].value)}
+            continue
+        cold = profiling.history[-1]
+        runs, walls = [], []
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            action(at)
+            walls.append((time.perf_counter() - t0) * 1000)
+            runs.append(profiling.history[-1])
+        errors = [str(e.value) for e in at.exception]
+        median = sorted(runs, key=lambda r: r["合計ms"])[len(runs) // 2]
+        results[name] = {
+            "キャッシュなし": cold["合計ms"],
+            "再実行": round(statistics.median(r["合計ms"] for r in runs), 1),
+            "操作全体": round(statistics.median(walls), 1),
+            "内訳": _kinds(median),
+            "error": errors[0] if errors else None,
+        }
+    print(json.dumps(results, ensure_ascii=False))
+
+
+def run_size(n_shots, repeat, tmp):
+    directory = os.path.join(tmp, str(n_shots))
+    counts = synthetic.write_season(directory, n_shots)
+    # ページが相対パスで読む画像
+    for image in glob.glob(os.path.join(ROOT, "*.webp")):
+        os.symlink(image, os.path.join(directory, os.path.basename(image)))
+    env = dict(os.environ, PYTHONWARNINGS="ignore", BADMINTON_STORAGE="csv")
+    env.pop("BADMINTON_PROFILE_LOG", None)
+    out = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--worker", directory, "--repeat", str(repeat)],
+        capture_output=True, text=True, env=env, check=True,
+    ).stdout
+    return counts, json.loads(out.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", help="結果を書き出すファイル")
+    parser.add_argument("--baseline", help="比較する前回の結果（--json で書き出したもの）")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.repeat)
+        return
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+    report = {}
+    regressions = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in args.sizes:
+            counts, results = run_size(n, args.repeat, tmp)
+            report[str(n)] = results
+            print(f"\n{n} 球（選手 {counts['players']} 人・試合 {counts['matches']}）")
+            print(f"  {'ページ':<12} {'キャッシュなし':>10} {'再実行':>9} {'操作全体':>9}   内訳（再実行）")
+            for page, r in results.items():
+                if "キャッシュなし" not in r:
+                    print(f"  {page:<12} エラー: {r['error']}")
+                    continue
+                before = baseline.get(str(n), {}).get(page, {}).get("再実行")
+                mark = ""
+                if before is not None and r["再実行"] > before * REGRESSION_RATIO and r["再実行"] - before > REGRESSION_MIN_MS:
+                    mark = f"  ← 遅くなった（前回 {before:.0f} ms）"
+                    regressions += 1
+                detail = " / ".join(f"{k} {v:.0f}" for k, v in r["内訳"].items())
+                print(f"  {page:<12} {r['キャッシュなし']:>8.0f}ms {r['再実行']:>7.0f}ms {r['操作全体']:>7.0f}ms   {detail}{mark}")
+                if r.get("error"):
+                    print(f"    エラー: {r['error']}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=1)
+    if regressions:
+        sys.exit(f"\n{regressions} ページが前回より遅くなりました。")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""期間を指定したショットの読み込み時間を、期間の長さごとに計測する。
+
+    python benchmarks/bench_partitions.py [--shots 1000000] [--days 7 30 90 365] [--backend csv|sqlite]
+
+「全件」は shots.csv をすべて読み、試合IDの日付で絞る場合（分割がない場合の方法）。
+「期間」は backend.load_shots_between()。どちらもメモリ上のキャッシュを捨ててから測る。
+分割を最初に作る時間（CSV のみ、1回だけ）も表示する。
+"""
+import argparse
+import datetime
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import analytics  # noqa: E402
+import data_access  # noqa: E402
+import storage  # noqa: E402
+import synthetic  # noqa: E402
+
+
+def cold(fn):
+    data_access.invalidate()
+    t0 = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - t0, result
+
+
+def full_scan(backend, start, end):
+    shots = backend.load_shots()
+    dates = analytics.match_dates(shots["試合ID"].cat.categories)
+    return analytics.shots_in_matches(shots, set(dates[(dates >= str(start)) & (dates <= str(end))].index))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shots", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, nargs="+", default=[7, 30, 90, 365])
+    parser.add_argument("--backend", choices=["csv", "sqlite"], default="csv")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        synthetic.write_season(tmp, args.shots)
+        os.chdir(tmp)
+        if args.backend == "sqlite":
+            storage.migrate_csv_to_sqlite()
+        backend = storage.get_backend(args.backend)
+        last = datetime.date.fromisoformat(max(backend.load_matches()["試合ID"])[:10])
+        if args.backend == "csv":
+            seconds, _ = cold(lambda: backend.load_shots_between(last, last))
+            print(f"分割の作成: {seconds:.2f} 秒（{args.shots} 球）")
+
+        print(f"{'日数':>6} {'ショット数':>10} {'全件 (s)':>10} {'期間 (s)':>10}")
+        for days in args.days:
+            start = last - datetime.timedelta(days=days - 1)
+            legacy, expected = cold(lambda: full_scan(backend, start, last))
+            seconds, shots = cold(lambda: backend.load_shots_between(start, last))
+            if len(shots) != len(expected):
+                sys.exit(f"件数が合いません: {len(shots)} / {len(expected)}")
+            print(f"{days:>6} {len(shots):>10} {legacy:>10.2f} {seconds:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""選手ごとの件数（player_stats.py）を保持したままのショット1件の記録時間を、保存済みショット数ごとに計測する。
+
+    python benchmarks/bench_player_stats.py [--sizes 100000 500000 1000000] [--repeat 200]
+
+「件数なし」は player_stats.json がない状態（件数の更新を行わない）での backend.append_shots()。
+「件数あり」は件数を作った後の backend.append_shots()（ジャーナルへの追記と、ときどきの畳み込みを含む）。
+中央値に加えて最大値（畳み込みが起きた1件）と、1件あたりの平均を表示する。
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import storage  # noqa: E402
+import synthetic  # noqa: E402
+from schema import AREAS, SHOT_TYPES  # noqa: E402
+
+
+def append_times(backend, match_id, players, repeat, seed):
+    rng = random.Random(seed)
+    times = []
+    for i in range(repeat):
+        row = [match_id, 10_000 + seed * repeat + i, 1, rng.choice(players), rng.choice(AREAS), rng.choice(AREAS),
+               rng.choice(SHOT_TYPES), rng.choice(["続行", "得点", "ミス"]), ""]
+        t0 = time.perf_counter()
+        backend.append_shots([row])
+        times.append(time.perf_counter() - t0)
+    return sorted(t * 1000 for t in times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000, 500_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'ショット数':>10} {'件数なし (ms)':>14} {'件数あり (ms)':>14} {'最大 (ms)':>10} {'平均 (ms)':>10}")
+    for n in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            synthetic.write_season(tmp, n)
+            os.chdir(tmp)
+            backend = storage.CsvBackend()
+            matches = backend.load_matches()
+            match_id = matches["試合ID"].iloc[0]
+            players = matches[matches["試合ID"] == match_id]["選手名"].tolist()
+            plain = append_times(backend, match_id, players, args.repeat, 0)
+            backend.load_player_counts()
+            with_stats = append_times(backend, match_id, players, args.repeat, 1)
+            os.chdir(ROOT)
+        print(f"{n:>10} {plain[len(plain) // 2]:>14.2f} {with_stats[len(with_stats) // 2]:>14.2f} "
+              f"{with_stats[-1]:>10.2f} {sum(with_stats) / len(with_stats):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""ショット表の読み込み時間とメモリ使用量を、pd.read_csv と schema の型付き読み込み・バイナリ形式で比較する。
+
+    python benchmarks/bench_schema.py [--shots 1000000] [--matches 2000]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+import schema  # noqa: E402
+
+PLAYERS = ["吉田陸", "平直樹", "久永亜美", "大内陽喜", "もりようすけ", "高橋ふみや", "佐藤健", "鈴木花子"]
+
+
+def make_shots(n, n_matches, seed=0):
+    rng = np.random.default_rng(seed)
+    match_ids = np.array([
+        f"2025-{m % 12 + 1:02d}-{m % 28 + 1:02d}_①_" + "_".join(rng.choice(PLAYERS, 4, replace=False))
+        for m in range(n_matches)
+    ], dtype=object)
+    per_match = n // n_matches + 1
+    return pd.DataFrame({
+        "試合ID": np.repeat(match_ids, per_match)[:n],
+        "ラリー番号": (np.arange(n) % per_match) // 8 + 1,
+        "ショット順": np.arange(n) % 8 + 1,
+        "打った選手": np.array(PLAYERS, dtype=object)[rng.integers(0, len(PLAYERS), n)],
+        "打点": np.array(schema.AREAS, dtype=object)[rng.integers(0, 9, n)],
+        "着地": np.array(schema.AREAS, dtype=object)[rng.integers(0, 9, n)],
+        "ショット": np.array(schema.SHOT_TYPES, dtype=object)[rng.integers(0, 9, n)],
+        "結果": np.array(schema.RESULTS, dtype=object)[rng.choice(4, n, p=[0.8, 0.08, 0.08, 0.04])],
+        "レシーバー": "",
+    })
+
+
+def report(name, path, load):
+    t0 = time.perf_counter()
+    df = load(path)
+    elapsed = time.perf_counter() - t0
+    memory = df.memory_usage(deep=True).sum() / 1e6
+    size = os.path.getsize(path) / 1e6
+    print(f"{name:<24} {elapsed:>10.3f} {memory:>12.1f} {size:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shots", type=int, default=1_000_000)
+    parser.add_argument("--matches", type=int, default=2_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = os.path.join(tmp, "shots.csv")
+        make_shots(args.shots, args.matches).to_csv(csv_path, index=False)
+        npz_path = os.path.join(tmp, "shots.npz")
+        schema.save_compact(schema.read_shots_csv(csv_path), npz_path)
+
+        print(f"ショット数 {args.shots}")
+        print(f"{'読み込み方法':<20} {'時間 (s)':>10} {'メモリ (MB)':>12} {'ファイル (MB)':>12}")
+        report("pd.read_csv", csv_path, pd.read_csv)
+        report("schema.read_shots_csv", csv_path, schema.read_shots_csv)
+        report("npz", npz_path, schema.load_compact)
+        if schema.has_parquet():
+            parquet_path = os.path.join(tmp, "shots.parquet")
+            schema.save_compact(schema.read_shots_csv(csv_path), parquet_path)
+            report("parquet", parquet_path, schema.load_compact)
+
+
+if __name__ == "__main__":
+    main()
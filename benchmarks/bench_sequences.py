@@ -0,0 +1,63 @@
+"""配球パターンの検索（sequences.SequenceIndex）の索引作成時間と検索時間を計測する。
+
+    python benchmarks/bench_sequences.py [--shots 2000000] [--matches 4000]
+
+比較として、同じ問い合わせを「ラリー順に並べ替えて全行を shift で突き合わせる」方法でも計測する。
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import schema  # noqa: E402
+import sequences  # noqa: E402
+from bench_schema import make_shots  # noqa: E402
+
+
+def timed(fn, repeat=5):
+    times = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        times.append(time.perf_counter() - t0)
+    times.sort()
+    return result, times[len(times) // 2] * 1000
+
+
+def scan_next_shots(shots, player):
+    """索引を使わない方法: 毎回ラリー順に並べ替え、次の行と突き合わせる。"""
+    d = shots.sort_values(["試合ID", "ラリー番号", "ショット順"], kind="stable")
+    nxt = d.shift(-1)
+    same = (nxt["試合ID"] == d["試合ID"]) & (nxt["ラリー番号"] == d["ラリー番号"])
+    hit = same & (d["ショット"] == "スマッシュ") & (d["着地"] == "LR") & (nxt["打った選手"] == player)
+    return nxt[hit].groupby(["ショット", "結果"], observed=True).size()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shots", type=int, default=2_000_000)
+    parser.add_argument("--matches", type=int, default=4000)
+    args = parser.parse_args()
+
+    shots = schema.to_typed(make_shots(args.shots, args.matches))
+    player = shots["打った選手"].iloc[0]
+    index, build_ms = timed(lambda: sequences.SequenceIndex(shots), repeat=1)
+    print(f"{args.shots} 球: 索引の作成 {build_ms:.0f} ms")
+
+    queries = {
+        "スマッシュ(LR) の次の一手": lambda: index.next_shots([{"ショット": "スマッシュ", "着地": "LR"}], player=player),
+        "ミスで終わる3球の流れ": lambda: index.top_sequences(3, result="ミス"),
+        "ミスで終わる3球の流れ（選手指定）": lambda: index.top_sequences(3, result="ミス", player=player),
+        "RR から打って2球後に得点": lambda: index.find([{"打点": "RR"}, {}, {"結果": "得点"}]),
+    }
+    for name, query in queries.items():
+        _, ms = timed(query)
+        print(f"  {name:<24} {ms:8.1f} ms")
+    _, ms = timed(lambda: scan_next_shots(shots, player), repeat=1)
+    print(f"  {'（比較）全行の突き合わせ':<24} {ms:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""ショット1件の記録（backend.append_shots() → load_match_state()）の時間を、保存済みショット数ごとに計測する。
+
+    python benchmarks/bench_shot_append.py [--sizes 10000 100000 1000000] [--repeat 50] [--backends csv sqlite]
+
+記録画面と同じく、試合の状態から次のラリー番号・ショット順・打者を決めて append_shots() で1件記録し、
+load_match_state() で次の状態を読むまでを1回として、中央値と最大値を表示する。
+集計（player_stats.json）・試合の状態は最初に1回作ってから計測する（作る時間は含めない）。
+比較のため、従来の read_csv → to_csv による全書き換えも --legacy-max 以下の件数でのみ計測する。
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pandas as pd  # noqa: E402
+
+import storage  # noqa: E402
+import synthetic  # noqa: E402
+from schema import AREAS, SHOT_TYPES  # noqa: E402
+
+
+def next_row(state, match_id, rng):
+    """状態の次のショット。ラリーは10球ほどで終える。"""
+    player = state["next_player"] or rng.choice(sorted(state["teams"]))
+    result = "得点" if rng.random() < 0.1 else "続行"
+    return [match_id, state["rally_no"], state["shot_order"], player, rng.choice(AREAS), rng.choice(AREAS),
+            rng.choice(SHOT_TYPES), result, ""]
+
+
+def record_times(backend, match_id, repeat):
+    """append_shots() → load_match_state() の1回ごとの時間（ms、昇順）。"""
+    rng = random.Random(0)
+    backend.load_player_counts()
+    state = backend.load_match_state(match_id)
+    times = []
+    for _ in range(repeat):
+        row = next_row(state, match_id, rng)
+        t0 = time.perf_counter()
+        backend.append_shots([row])
+        state = backend.load_match_state(match_id)
+        times.append(time.perf_counter() - t0)
+    return sorted(t * 1000 for t in times)
+
+
+def legacy_times(path, match_id, repeat):
+    rng = random.Random(0)
+    times = []
+    for i in range(repeat):
+        row = [match_id, 10_000 + i, 1, "", rng.choice(AREAS), rng.choice(AREAS), rng.choice(SHOT_TYPES), "続行", ""]
+        t0 = time.perf_counter()
+        df = pd.read_csv(path)
+        df.loc[len(df)] = row
+        df.to_csv(path, index=False)
+        times.append(time.perf_counter() - t0)
+    return sorted(t * 1000 for t in times)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--backends", nargs="+", choices=["csv", "sqlite"], default=["csv", "sqlite"])
+    parser.add_argument("--legacy-max", type=int, default=100_000)
+    args = parser.parse_args()
+
+    print(f"{'ショット数':>10} {'保存先':>8} {'中央値 (ms)':>12} {'最大 (ms)':>10}")
+    for n in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            synthetic.write_season(tmp, n)
+            os.chdir(tmp)
+            match_id = storage.CsvBackend().load_matches()["試合ID"].iloc[-1]
+            if n <= args.legacy_max:
+                shutil.copy("shots.csv", "legacy.csv")
+                times = legacy_times("legacy.csv", match_id, min(args.repeat, 5))
+                print(f"{n:>10} {'全書き換え':>8} {times[len(times) // 2]:>12.2f} {times[-1]:>10.2f}")
+            if "sqlite" in args.backends:
+                storage.migrate_csv_to_sqlite("badminton.db")
+            for kind in args.backends:
+                backend = storage.CsvBackend() if kind == "csv" else storage.SqliteBackend("badminton.db")
+                times = record_times(backend, match_id, args.repeat)
+                print(f"{n:>10} {kind:>8} {times[len(times) // 2]:>12.2f} {times[-1]:>10.2f}")
+                if kind == "sqlite":
+                    backend.conn.close()
+            os.chdir(ROOT)
+
+
+if __name__ == "__main__":
+    main()
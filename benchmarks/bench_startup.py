@@ -0,0 +1,57 @@
+"""ページごとのコールドスタート時のインポート時間を python -X importtime で計測する。
+
+    python benchmarks/bench_startup.py [--repeat 3]
+
+各ページについて、アプリ共通のモジュールとそのページのモジュールを新しいプロセスで読み込み、
+インポートにかかった時間の合計と重いモジュールの上位を表示する。
+「旧構成」は以前の badminton.py が先頭で読み込んでいた描画ライブラリをすべて読み込んだ場合。
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+BASE = "import streamlit, pandas, data_access, storage"
+LEGACY = "import seaborn, matplotlib.pyplot, numpy, plotly.graph_objects"
+
+
+def import_times(statement):
+    """(合計秒, {トップレベルのモジュール: 累積秒})"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    total = 0
+    top = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        total += int(self_us)
+        if not name.startswith("  "):
+            top[name.strip()] = int(cumulative_us) / 1e6
+    return total / 1e6, top
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    from views import PAGES
+
+    targets = [("旧構成（全ライブラリ）", f"{BASE}; {LEGACY}")]
+    targets += [(page, f"{BASE}; import {module}") for page, module in PAGES.items()]
+    print(f"{'ページ':<20} {'インポート (s)':>14}  重いモジュール")
+    for name, statement in targets:
+        runs = [import_times(statement) for _ in range(args.repeat)]
+        total, top = min(runs, key=lambda r: r[0])
+        heavy = ", ".join(f"{m} {s:.2f}s" for m, s in sorted(top.items(), key=lambda kv: -kv[1])[:3])
+        print(f"{name:<20} {total:>14.3f}  {heavy}")
+
+
+if __name__ == "__main__":
+    main()
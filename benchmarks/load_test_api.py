@@ -0,0 +1,149 @@
+"""api.py を別プロセスで起動し、複数のクライアントから同時にショットを送って処理量と応答時間を測る。
+
+    python benchmarks/load_test_api.py [--shots 100000] [--clients 20] [--requests 50] [--batch 10] [--backend csv|sqlite]
+
+一時ディレクトリに benchmarks/synthetic.py でデータを作り、そこで api.py を起動する。
+クライアントはそれぞれ別の試合に、keep-alive の接続で --batch 球ずつ（ラリー番号・ショット順は省略して）送る。
+終わったら保存先のショット数と各試合のラリー番号・ショット順が送った分だけ増えているかを確かめる。
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import storage  # noqa: E402
+import synthetic  # noqa: E402
+from schema import AREAS, SHOT_TYPES  # noqa: E402
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def _request(reader, writer, method, path, payload=None):
+    body = json.dumps(payload, ensure_ascii=False).encode("utf-8") if payload is not None else b""
+    writer.write(
+        f"{method} {urllib.parse.quote(path)} HTTP/1.1\r\nHost: localhost\r\n"
+        f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+    )
+    await writer.drain()
+    status = int((await reader.readline()).split()[1])
+    length = 0
+    while (line := await reader.readline()) not in (b"\r\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        if name.lower() == "content-length":
+            length = int(value)
+    return status, json.loads(await reader.readexactly(length))
+
+
+def _rally(players, n, i):
+    """n 球のショット（最後の1球で得点）。打つ選手はチームを交互に。"""
+    shots = []
+    for k in range(n):
+        shots.append({
+            "打った選手": players[(i + k) % len(players)],
+            "打点": AREAS[(i + k) % len(AREAS)],
+            "着地": AREAS[(i + 2 * k) % len(AREAS)],
+            "ショット": SHOT_TYPES[(i + k) % len(SHOT_TYPES)],
+            "結果": "得点" if k == n - 1 else "続行",
+        })
+    return shots
+
+
+async def client(port, match_id, players, n_requests, batch, latencies):
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    try:
+        _, before = await _request(reader, writer, "GET", f"/matches/{match_id}/state")
+        for i in range(n_requests):
+            t0 = time.perf_counter()
+            status, body = await _request(reader, writer, "POST", f"/matches/{match_id}/shots", {"shots": _rally(players, batch, i)})
+            latencies.append((time.perf_counter() - t0) * 1000)
+            if status != 200:
+                raise RuntimeError(f"{match_id}: {status} {body}")
+        return before, body["state"]
+    finally:
+        writer.close()
+
+
+async def run_clients(port, targets, n_requests, batch):
+    latencies = []
+    t0 = time.perf_counter()
+    states = await asyncio.gather(*(client(port, m, p, n_requests, batch, latencies) for m, p in targets))
+    return time.perf_counter() - t0, latencies, states
+
+
+def _wait_ready(port, proc, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            sys.exit(f"api.py が終了しました: {proc.stderr.read()}")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    sys.exit("api.py が起動しませんでした。")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="api.py の負荷試験")
+    parser.add_argument("--shots", type=int, default=100_000, help="最初に入れておくショット数")
+    parser.add_argument("--clients", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=50, help="クライアントごとのリクエスト数")
+    parser.add_argument("--batch", type=int, default=10, help="1リクエストのショット数")
+    parser.add_argument("--backend", choices=["csv", "sqlite"], default="csv")
+    parser.add_argument("--batch-window-ms", type=float, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        synthetic.write_season(tmp, args.shots)
+        os.chdir(tmp)
+        if args.backend == "sqlite":
+            storage.migrate_csv_to_sqlite()
+        matches = storage.get_backend(args.backend).load_matches()
+        groups = list(matches.groupby("試合ID", sort=False)["選手名"])[: args.clients]
+        targets = [(m, names.tolist()) for m, names in groups]
+
+        port = _free_port()
+        env = dict(os.environ, PYTHONWARNINGS="ignore")
+        proc = subprocess.Popen(
+            [sys.executable, os.path.join(ROOT, "api.py"), "--port", str(port), "--backend", args.backend,
+             "--batch-window-ms", str(args.batch_window_ms)],
+            cwd=tmp, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True,
+        )
+        try:
+            _wait_ready(port, proc)
+            elapsed, latencies, states = asyncio.run(run_clients(port, targets, args.requests, args.batch))
+        finally:
+            proc.terminate()
+            proc.wait()
+
+        n_requests = len(targets) * args.requests
+        latencies.sort()
+        print(f"{args.backend}: 最初に {args.shots} 球・クライアント {len(targets)}・{args.requests} リクエスト × {args.batch} 球")
+        print(f"  {n_requests / elapsed:,.0f} リクエスト/秒・{n_requests * args.batch / elapsed:,.0f} 球/秒（{elapsed:.2f} 秒）")
+        print(f"  応答時間 中央値 {statistics.median(latencies):.1f} ms・95% {latencies[int(len(latencies) * 0.95)]:.1f} ms")
+
+        backend = storage.get_backend(args.backend)
+        stored = len(backend.load_shots()) - args.shots
+        wrong = [m for (m, _), (before, after) in zip(targets, states) if after["rally_no"] - before["rally_no"] != args.requests]
+        print(f"  保存されたショット {stored} / {n_requests * args.batch}・ラリー番号がずれた試合 {len(wrong)}")
+        if stored != n_requests * args.batch or wrong:
+            sys.exit("送った分と保存された分が合いません。")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""複数コートで同時に記録したときに、ショットが失われたり壊れたりしないかを確かめる。
+
+    python benchmarks/stress_concurrent_writes.py [--backend csv|sqlite] [--writers 8] [--shots 200]
+
+--writers 個のプロセスがそれぞれ別の試合に --shots 件ずつ記録し、
+試合ごとの件数・合計件数・選手ごとの集計（player_stats）が合っているかを調べる。
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import storage  # noqa: E402
+from schema import AREAS, RESULTS, SHOT_TYPES  # noqa: E402
+
+
+def open_backend(kind, tmp):
+    if kind == "sqlite":
+        return storage.SqliteBackend(os.path.join(tmp, "badminton.db"), os.path.join(tmp, "player_stats.json"))
+    return storage.CsvBackend(
+        os.path.join(tmp, "players.csv"),
+        os.path.join(tmp, "matches.csv"),
+        os.path.join(tmp, "shots.csv"),
+        os.path.join(tmp, "player_stats.json"),
+    )
+
+
+def recorder(kind, tmp, court, n_shots, start):
+    backend = open_backend(kind, tmp)
+    rng = random.Random(court)
+    match_id = f"2025-03-27_コート{court}"
+    player = f"選手{court}"
+    start.wait()
+    for i in range(n_shots):
+        backend.append_shots([[
+            match_id, i // 10 + 1, i % 10 + 1, player,
+            rng.choice(AREAS), rng.choice(AREAS), rng.choice(SHOT_TYPES), rng.choice(RESULTS), "",
+        ]])
+        if i % 50 == 49:
+            # 記録中に分析ページを開いたときと同じく、集計の読み出しも混ぜる
+            backend.load_player_counts()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--backend", choices=["csv", "sqlite"], default="csv")
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--shots", type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        backend = open_backend(args.backend, tmp)
+        backend.load_player_counts()  # 集計ファイルを作っておき、以降は差分更新させる
+
+        start = multiprocessing.Event()
+        procs = [
+            multiprocessing.Process(target=recorder, args=(args.backend, tmp, court, args.shots, start))
+            for court in range(1, args.writers + 1)
+        ]
+        for p in procs:
+            p.start()
+        t0 = time.perf_counter()
+        start.set()
+        for p in procs:
+            p.join()
+        elapsed = time.perf_counter() - t0
+
+        errors = [f"プロセス {p.pid} が終了コード {p.exitcode} で終了" for p in procs if p.exitcode != 0]
+        backend = open_backend(args.backend, tmp)
+        shots = backend.load_shots()
+        expected = args.writers * args.shots
+        if len(shots) != expected:
+            errors.append(f"合計 {len(shots)} 件（期待値 {expected} 件）")
+        for court in range(1, args.writers + 1):
+            n = backend.count_shots(f"2025-03-27_コート{court}")
+            if n != args.shots:
+                errors.append(f"コート{court}: {n} 件（期待値 {args.shots} 件）")
+        if shots[["打点", "着地", "ショット", "結果"]].isna().any().any():
+            errors.append("読み込めない値を含む行がある")
+        counts = backend.load_player_counts()
+        if counts["件数"].sum() != expected or backend.player_stats._data["shot_count"] != expected:
+            errors.append(f"集計 {counts['件数'].sum()} 件（期待値 {expected} 件）")
+
+        print(f"{args.backend}: {args.writers} プロセス × {args.shots} 件 = {expected} 件を {elapsed:.2f} 秒（{expected / elapsed:.0f} 件/秒）")
+        for error in errors:
+            print("NG:", error)
+        if errors:
+            sys.exit(1)
+        print("OK: 欠落・重複・破損なし")
+
+
+if __name__ == "__main__":
+    main()
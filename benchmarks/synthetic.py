@@ -0,0 +1,154 @@
+"""シーズン規模の選手・試合・ショットのデータを作る。同じ引数（seed）なら毎回同じデータになる。
+
+    python benchmarks/synthetic.py 出力先ディレクトリ [--shots 1000000] [--players 0] [--seed 0]
+
+出力先に players.csv / matches.csv / shots.csv を書き出す（アプリと同じ列）。
+- 試合ID は「日付_丸数字_選手名…」の形式で、ダブルス（4人）とシングルス（2人）がある
+- 試合ごとにラリー番号は 1 から、ラリーの中のショット順も 1 から振る
+- 打つ選手はラリーの中でチーム A・B が交互になり、レシーバーは次に打つ選手
+- ラリーの最後の1球の結果は 得点 / ミス / アウト、それ以外は 続行
+"""
+import argparse
+import datetime
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from schema import AREAS, SHOT_COLUMNS, SHOT_TYPES  # noqa: E402
+
+SEASON_START = datetime.date(2025, 4, 1)
+SEASON_DAYS = 300
+CIRCLED = "①②③④⑤⑥⑦⑧⑨⑩⑪⑫⑬⑭⑮⑯⑰⑱⑲⑳"
+
+# 1試合あたりのラリー数と、ラリーの長さ（平均球数）の目安
+RALLIES_PER_MATCH = 60
+MEAN_RALLY_LENGTH = 7
+DOUBLES_RATE = 0.8
+
+# 打点・着地・ショット種類・ラリーの終わり方の出やすさ（AREAS・SHOT_TYPES の順）
+AREA_WEIGHTS = [0.14, 0.12, 0.14, 0.10, 0.08, 0.10, 0.12, 0.08, 0.12]
+SHOT_WEIGHTS = [0.16, 0.14, 0.12, 0.10, 0.10, 0.12, 0.10, 0.08, 0.08]
+END_RESULTS = ["得点", "ミス", "アウト"]
+END_WEIGHTS = [0.45, 0.40, 0.15]
+
+
+def default_players(n_shots):
+    # 選手数は試合数に合わせて増やす（8〜300人）
+    return int(np.clip(n_shots // (RALLIES_PER_MATCH * MEAN_RALLY_LENGTH * 5), 8, 300))
+
+
+def make_players(n, rng):
+    return pd.DataFrame({
+        "名前": [f"選手{i:03d}" for i in range(n)],
+        "利き手": rng.choice(["右", "左"], n, p=[0.85, 0.15]),
+        "チーム": [f"クラブ{i % 10 + 1}" for i in range(n)],
+    })
+
+
+def make_matches(players, n_matches, rng):
+    """試合の一覧（matches.csv と同じく 選手ごとに1行）。チームは A / B。"""
+    names = players["名前"].to_numpy()
+    rows = []
+    per_day = {}
+    for m in range(n_matches):
+        date = SEASON_START + datetime.timedelta(days=int(m * SEASON_DAYS // max(n_matches, 1)))
+        number = per_day.get(date, 0)
+        per_day[date] = number + 1
+        doubles = rng.random() < DOUBLES_RATE
+        members = rng.choice(names, 4 if doubles else 2, replace=False)
+        match_id = f"{date.isoformat()}_{CIRCLED[number % len(CIRCLED)]}{number // len(CIRCLED) or ''}_" + "_".join(members)
+        half = len(members) // 2
+        for i, name in enumerate(members):
+            rows.append([match_id, "ダブルス" if doubles else "シングルス", name, "A" if i < half else "B"])
+    return pd.DataFrame(rows, columns=["試合ID", "試合形式", "選手名", "チーム"])
+
+
+def make_shots(matches, n_shots, rng):
+    """matches の試合にショットを n_shots 件割り振る。試合の順・ラリー番号・ショット順に並ぶ。"""
+    # members[試合, チーム(A=0/B=1), k]。シングルスは同じ選手を2つ並べる
+    match_ids = matches["試合ID"].drop_duplicates().tolist()
+    members = np.empty((len(match_ids), 2, 2), dtype=object)
+    for m, (_, rows) in enumerate(matches.groupby("試合ID", sort=False)):
+        for side, team in enumerate(["A", "B"]):
+            names = rows[rows["チーム"] == team]["選手名"].to_numpy()
+            members[m, side] = [names[0], names[-1]]
+
+    # ラリーの長さを足して n_shots に届くまで作り、端数は最後のラリーで切る
+    lengths = rng.geometric(1 / MEAN_RALLY_LENGTH, n_shots // MEAN_RALLY_LENGTH * 2 + 16)
+    while lengths.sum() < n_shots:
+        lengths = np.concatenate([lengths, rng.geometric(1 / MEAN_RALLY_LENGTH, len(lengths))])
+    ends = np.cumsum(lengths)
+    n_rallies = int(np.searchsorted(ends, n_shots) + 1)
+    lengths = lengths[:n_rallies]
+    lengths[-1] -= ends[n_rallies - 1] - n_shots
+
+    rally = np.repeat(np.arange(n_rallies), lengths)
+    starts = np.repeat(np.cumsum(lengths) - lengths, lengths)
+    order = np.arange(n_shots) - starts + 1
+    # ラリーを試合に均等に割り振る
+    match_of_rally = np.arange(n_rallies) * len(match_ids) // n_rallies
+    first_rally = np.searchsorted(match_of_rally, match_of_rally)
+    match_index = match_of_rally[rally]
+    rally_no = rally - first_rally[rally] + 1
+
+    # サーブ側のチームはラリーごとに決め、そこから A・B が交互に打つ
+    server_team = rng.integers(0, 2, n_rallies)
+    team = (server_team[rally] + order - 1) % 2
+    hitters = members[match_index, team, rng.integers(0, 2, n_shots)]
+
+    last = np.zeros(n_shots, dtype=bool)
+    last[np.cumsum(lengths) - 1] = True
+    receivers = np.empty(n_shots, dtype=object)
+    receivers[:-1] = hitters[1:]
+    receivers[last] = ""
+    results = np.full(n_shots, "続行", dtype=object)
+    results[last] = rng.choice(END_RESULTS, int(last.sum()), p=END_WEIGHTS)
+
+    return pd.DataFrame({
+        "試合ID": np.asarray(match_ids, dtype=object)[match_index],
+        "ラリー番号": rally_no,
+        "ショット順": order,
+        "打った選手": hitters,
+        "打点": rng.choice(AREAS, n_shots, p=AREA_WEIGHTS),
+        "着地": rng.choice(AREAS, n_shots, p=AREA_WEIGHTS),
+        "ショット": rng.choice(SHOT_TYPES, n_shots, p=SHOT_WEIGHTS),
+        "結果": results,
+        "レシーバー": receivers,
+    })[SHOT_COLUMNS]
+
+
+def make_season(n_shots, n_players=0, seed=0):
+    """(players, matches, shots) の DataFrame を返す。n_players=0 なら件数から決める。"""
+    rng = np.random.default_rng(seed)
+    players = make_players(n_players or default_players(n_shots), rng)
+    n_matches = max(n_shots // (RALLIES_PER_MATCH * MEAN_RALLY_LENGTH), 1)
+    matches = make_matches(players, n_matches, rng)
+    return players, matches, make_shots(matches, n_shots, rng)
+
+
+def write_season(directory, n_shots, n_players=0, seed=0):
+    """directory に players.csv / matches.csv / shots.csv を書き出し、件数を返す。"""
+    players, matches, shots = make_season(n_shots, n_players, seed)
+    os.makedirs(directory, exist_ok=True)
+    players.to_csv(os.path.join(directory, "players.csv"), index=False)
+    matches.to_csv(os.path.join(directory, "matches.csv"), index=False)
+    shots.to_csv(os.path.join(directory, "shots.csv"), index=False)
+    return {"players": len(players), "matches": matches["試合ID"].nunique(), "shots": len(shots)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="シーズン規模の合成データを CSV で書き出す")
+    parser.add_argument("directory")
+    parser.add_argument("--shots", type=int, default=1_000_000)
+    parser.add_argument("--players", type=int, default=0, help="0 なら件数から決める")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(write_season(args.directory, args.shots, args.players, args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""過去の試合のショット記録（CSV / JSONL）をまとめて取り込む。
+
+    python bulk_import.py 2023.csv 2024.jsonl [--chunk-size 50000] [--backend csv|sqlite] [--rejects rejects.csv] [--dry-run]
+
+ファイルは --chunk-size 行ずつ読み、検証（schema.validate_shots）して、
+(試合ID, ラリー番号, ショット順) が保存済み・取り込み済みの行と重複しないものだけをまとめて書き込む。
+メモリに載るのは1チャンク分の行と、重複判定用のキー（1行あたり8バイト）だけ。
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import storage
+from schema import COUNTER_COLUMNS, SHOT_COLUMNS, validate_shots
+
+
+def read_chunks(path, chunk_size):
+    """ファイルを chunk_size 行ずつの DataFrame にして返す。拡張子が .jsonl / .json なら JSON Lines として読む。"""
+    if path.endswith((".jsonl", ".json")):
+        with pd.read_json(path, lines=True, chunksize=chunk_size, dtype=False) as reader:
+            yield from reader
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size, dtype=str, keep_default_na=False)
+
+
+def _keys(rally, order):
+    # (ラリー番号, ショット順) を1つの整数にする
+    return (np.asarray(rally, dtype=np.int64) << 20) | np.asarray(order, dtype=np.int64)
+
+
+class ShotKeys:
+    """試合ごとの (ラリー番号, ショット順) を整数のソート済み配列で持つ。
+
+    保存済みの分は、その試合が初めて出てきたときに existing から作る。
+    """
+
+    def __init__(self, existing):
+        self._existing = existing
+        self._positions = existing.groupby("試合ID", observed=True).indices if len(existing) else {}
+        self._keys = {}
+
+    def for_match(self, match_id):
+        keys = self._keys.get(match_id)
+        if keys is None:
+            rows = self._existing.iloc[self._positions.get(match_id, [])]
+            keys = np.unique(_keys(rows["ラリー番号"], rows["ショット順"]))
+            self._keys[match_id] = keys
+        return keys
+
+    def add(self, match_id, keys):
+        self._keys[match_id] = np.union1d(self.for_match(match_id), keys)
+
+
+def missing_columns(chunk):
+    """SHOT_COLUMNS のうち chunk にない列（レシーバーは省略してよい）。"""
+    return [col for col in SHOT_COLUMNS if col not in chunk.columns and col != "レシーバー"]
+
+
+def prepare(chunk):
+    """列をそろえ、(正しい行, 不正な行と理由) に分ける。chunk には missing_columns() の列がないこと。"""
+    chunk = chunk.copy()
+    if "レシーバー" not in chunk.columns:
+        chunk["レシーバー"] = ""
+    reasons = validate_shots(chunk)
+    rejected = chunk[reasons != ""].assign(理由=reasons[reasons != ""])
+    valid = chunk[reasons == ""]
+    valid = valid.assign(**{col: pd.to_numeric(valid[col]).astype(int) for col in COUNTER_COLUMNS})
+    valid["試合ID"] = valid["試合ID"].astype(str).str.strip()
+    valid["打った選手"] = valid["打った選手"].astype(str).str.strip()
+    valid["レシーバー"] = valid["レシーバー"].fillna("").astype(str)
+    return valid[SHOT_COLUMNS], rejected
+
+
+def drop_duplicates(valid, keys):
+    """保存済み・取り込み済みのキーと重複する行を除き、残した行のキーを keys に加える。チャンク内で重複する行は最初の1行を残す。"""
+    codes = _keys(valid["ラリー番号"], valid["ショット順"])
+    keep = np.zeros(len(valid), dtype=bool)
+    for match_id, positions in valid.groupby("試合ID", sort=False).indices.items():
+        match_codes = codes[positions]
+        _, first = np.unique(match_codes, return_index=True)
+        first = np.sort(first)
+        fresh = first[~np.isin(match_codes[first], keys.for_match(match_id))]
+        keep[positions[fresh]] = True
+        keys.add(match_id, match_codes[fresh])
+    return valid[keep]
+
+
+def import_files(backend, paths, chunk_size=50_000, rejects_path=None, dry_run=False, log=print):
+    totals = {"読み込み": 0, "追加": 0, "重複": 0, "不正": 0}
+    keys = ShotKeys(backend.load_shot_keys().dropna())
+    rejects = None
+    t0 = time.perf_counter()
+    try:
+        for path in paths:
+            for chunk in read_chunks(path, chunk_size):
+                missing = missing_columns(chunk)
+                if missing:
+                    # 列がなければ検証も重複判定もできないので、チャンクの全行を不正にする
+                    reason = "、".join(missing) + " 列がない"
+                    log(f"{path}: {reason}ため、{len(chunk)} 行を取り込みません。")
+                    valid = new = pd.DataFrame(columns=SHOT_COLUMNS)
+                    rejected = chunk.reindex(columns=SHOT_COLUMNS).assign(理由=reason)
+                else:
+                    valid, rejected = prepare(chunk)
+                    new = drop_duplicates(valid, keys)
+                if not dry_run and len(new):
+                    backend.append_shots(new.to_numpy(dtype=object).tolist())
+                if rejects_path and len(rejected):
+                    if rejects is None:
+                        rejects = open(rejects_path, "w", newline="", encoding="utf-8")
+                        csv.writer(rejects, lineterminator="\n").writerow(["ファイル"] + list(rejected.columns))
+                    rejected.insert(0, "ファイル", path)
+                    rejected.to_csv(rejects, header=False, index=False)
+                totals["読み込み"] += len(chunk)
+                totals["追加"] += len(new)
+                totals["重複"] += len(valid) - len(new)
+                totals["不正"] += len(rejected)
+                elapsed = time.perf_counter() - t0
+                log(" / ".join(f"{k} {v}" for k, v in totals.items()) + f"  （{totals['読み込み'] / elapsed:.0f} 行/秒）")
+    finally:
+        if rejects is not None:
+            rejects.close()
+    return totals
+
+
+def _peak_memory_mb():
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ショット記録の CSV / JSONL をまとめて取り込む")
+    parser.add_argument("files", nargs="+")
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument("--backend", choices=["csv", "sqlite"], default=storage.STORAGE_BACKEND)
+    parser.add_argument("--rejects", help="不正な行を理由つきで書き出す CSV")
+    parser.add_argument("--dry-run", action="store_true", help="検証と重複判定だけを行い、書き込まない")
+    args = parser.parse_args()
+
+    for path in args.files:
+        if not os.path.exists(path):
+            sys.exit(f"{path} が見つかりません。")
+    backend = storage.get_backend(args.backend)
+    t0 = time.perf_counter()
+    totals = import_files(backend, args.files, args.chunk_size, args.rejects, args.dry_run)
+    elapsed = time.perf_counter() - t0
+    message = f"完了: {totals['読み込み']} 行を {elapsed:.1f} 秒（{totals['読み込み'] / max(elapsed, 1e-9):.0f} 行/秒）"
+    peak = _peak_memory_mb()
+    if peak is not None:
+        message += f"、最大メモリ {peak:.0f} MB"
+    print(message)
+    if args.dry_run:
+        print("--dry-run のため書き込んでいません。")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""選手の図（Plotly）。画面（views）とレポート（reports.py）で同じものを使う。ミス打点のヒートマップは heatmap.py。"""
+import plotly.graph_objects as go
+
+# データ解析のレーダーチャートの軸（選手プロフィール一覧は別の軸を使う）
+ANALYSIS_RADAR = ["ミス率（逆）", "中央選択率", "クリア選択率", "ロブ選択率"]
+PROFILE_RADAR = ["得点率", "ミス率（逆）", "多様性スコア", "中央打点率"]
+
+
+def radar_figure(m, categories, name, **layout):
+    """選手の指標（analytics.metrics_from_counts() の1行）の categories のレーダーチャート。率は 0〜1。"""
+    values = m[categories].tolist()
+    fig = go.Figure()
+    fig.add_trace(go.Scatterpolar(
+        r=values + [values[0]],
+        theta=categories + [categories[0]],
+        fill='toself',
+        name=name
+    ))
+    fig.update_layout(
+        polar=dict(radialaxis=dict(visible=True, range=[0, 1])),
+        showlegend=False,
+        **layout
+    )
+    return fig
+
+
+def rear_pie_figure(shot_counts, total_shots):
+    """後衛から打ったショット種類（analytics.rear_shot_counts()）の、全体のショット数に対する割合の円グラフ。"""
+    shot_percent = (shot_counts / total_shots * 100).round(1)
+    fig = go.Figure(data=[
+        go.Pie(labels=shot_percent.index, values=shot_percent.values, hole=0.4)
+    ])
+    fig.update_traces(textinfo='label+percent')
+    fig.update_layout(margin=dict(t=0, b=0))
+    return fig
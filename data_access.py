@@ -0,0 +1,59 @@
+import os
+
+import pandas as pd
+
+import profiling
+
+# 返したDataFrameを書き換えてもキャッシュ本体に影響しないよう Copy-on-Write を使う（pandas 3 以降は常に有効）
+if int(pd.__version__.split(".")[0]) < 3:
+    pd.set_option("mode.copy_on_write", True)
+
+_cache = {}
+stats = {"hits": 0, "misses": 0}
+last_stats = {"hits": 0, "misses": 0}
+
+
+def file_signature(*paths):
+    """ファイルの (mtime, サイズ) の組。存在しないファイルは None。"""
+    signature = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            signature.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+
+def cached(key, signature, loader):
+    """signature が前回と同じならキャッシュ済みのDataFrameを返し、変わっていれば loader で読み直す。
+
+    key の2番目の要素は invalidate() で指定するファイルパスにする。
+    """
+    entry = _cache.get(key)
+    if entry is not None and entry[0] == signature:
+        stats["hits"] += 1
+    else:
+        stats["misses"] += 1
+        entry = (signature, loader())
+        _cache[key] = entry
+    return entry[1].copy(deep=False)
+
+
+def load_csv(path):
+    return cached(("csv", path), file_signature(path), lambda: profiling.read_csv(path))
+
+
+def invalidate(path=None):
+    """書き込み後に呼ぶ。path を省略するとキャッシュをすべて捨てる。"""
+    for key in list(_cache):
+        if path is None or key[1] == path:
+            del _cache[key]
+
+
+def begin_rerun():
+    """スクリプトの先頭で呼ぶ。前回の再実行でのヒット・ミス数を返してカウンタを戻す。"""
+    last_stats.update(stats)
+    stats["hits"] = 0
+    stats["misses"] = 0
+    return dict(last_stats)
@@ -0,0 +1,121 @@
+import io
+import threading
+from collections import OrderedDict
+from html import escape
+
+import numpy as np
+
+import profiling
+from schema import AREAS
+
+# AREAS は 後（RR CR LR）→ 中 → 前 の順なので、3×3 に並べると上の行が後衛になる
+ROW_LABELS = ["後", "中", "前"]
+COLUMN_LABELS = ["右", "中央", "左"]
+
+# matplotlib の "Reds" に近い配色（0 → 最大値）
+_REDS = np.array([
+    (255, 245, 240), (254, 224, 210), (252, 187, 161), (252, 146, 114), (251, 106, 74),
+    (239, 59, 44), (203, 24, 29), (165, 15, 21), (103, 0, 13),
+], dtype=float)
+
+_CACHE_SIZE = 128
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+stats = {"hits": 0, "misses": 0}
+
+
+def court_grid(area_counts):
+    """打点エリアごとの件数（AREAS の順）を コートの並び（行: 後・中・前、列: 右・中央・左）の 3×3 にする。"""
+    return np.asarray(area_counts.reindex(AREAS, fill_value=0).to_numpy(), dtype=np.int64).reshape(3, 3)
+
+
+def _color(value, vmax):
+    t = value / vmax if vmax > 0 else 0.0
+    pos = t * (len(_REDS) - 1)
+    i = min(int(pos), len(_REDS) - 2)
+    rgb = _REDS[i] + (_REDS[i + 1] - _REDS[i]) * (pos - i)
+    return "#%02x%02x%02x" % tuple(int(round(c)) for c in rgb), t > 0.5
+
+
+@profiling.timed(profiling.RENDER)
+def render_svg(grid, title=""):
+    """3×3 のヒートマップを SVG 文字列にする。matplotlib を使わない。"""
+    cell, left, top = 80, 48, 40 if title else 12
+    width, height = left + cell * 3 + 12, top + cell * 3 + 36
+    vmax = int(grid.max())
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" width="{width}" height="{height}" font-family="sans-serif">']
+    if title:
+        parts.append(f'<text x="{width / 2}" y="24" text-anchor="middle" font-size="15">{escape(title)}</text>')
+    for r in range(3):
+        for c in range(3):
+            fill, dark = _color(grid[r, c], vmax)
+            x, y = left + c * cell, top + r * cell
+            parts.append(f'<rect x="{x}" y="{y}" width="{cell}" height="{cell}" fill="{fill}" stroke="#ffffff"/>')
+            parts.append(
+                f'<text x="{x + cell / 2}" y="{y + cell / 2 + 6}" text-anchor="middle" font-size="18" '
+                f'fill="{"#ffffff" if dark else "#262626"}">{grid[r, c]}</text>'
+            )
+        parts.append(f'<text x="{left - 10}" y="{top + r * cell + cell / 2 + 5}" text-anchor="end" font-size="14">{ROW_LABELS[r]}</text>')
+    for c in range(3):
+        parts.append(f'<text x="{left + c * cell + cell / 2}" y="{top + cell * 3 + 24}" text-anchor="middle" font-size="14">{COLUMN_LABELS[c]}</text>')
+    parts.append("</svg>")
+    return "".join(parts)
+
+
+_figure = None
+_figure_lock = threading.Lock()
+
+
+@profiling.timed(profiling.RENDER)
+def render_png(grid, title="", dpi=100):
+    """matplotlib で描いた PNG のバイト列。
+
+    pyplot を通さずに1枚の Figure を使い回すので、再実行のたびに図が増えることはない。
+    """
+    global _figure
+    from matplotlib.figure import Figure
+
+    with _figure_lock:
+        if _figure is None:
+            _figure = Figure(figsize=(5, 4))
+        fig = _figure
+        fig.clear()
+        ax = fig.add_subplot()
+        vmax = int(grid.max())
+        ax.imshow(grid, cmap="Reds", vmin=0, vmax=max(vmax, 1))
+        for r in range(3):
+            for c in range(3):
+                dark = vmax > 0 and grid[r, c] / vmax > 0.5
+                ax.text(c, r, str(grid[r, c]), ha="center", va="center", color="white" if dark else "#262626")
+        ax.set_xticks(range(3), COLUMN_LABELS)
+        ax.set_yticks(range(3), ROW_LABELS)
+        if title:
+            ax.set_title(title)
+        buf = io.BytesIO()
+        fig.savefig(buf, format="png", dpi=dpi, bbox_inches="tight")
+        fig.clear()
+    return buf.getvalue()
+
+
+RENDERERS = {"svg": render_svg, "png": render_png}
+
+
+def cached_heatmap(grid, title="", kind="svg"):
+    """描画結果をキャッシュして返す。
+
+    キーは (形式, タイトル, 9マスの件数) なので、同じ選手の件数が変わっていなければ描き直さない。
+    古いものから捨て、_CACHE_SIZE 件より多くは保持しない。
+    """
+    key = (kind, title, tuple(int(v) for v in grid.ravel()))
+    with _cache_lock:
+        if key in _cache:
+            stats["hits"] += 1
+            _cache.move_to_end(key)
+            return _cache[key]
+    stats["misses"] += 1
+    output = RENDERERS[kind](grid, title)
+    with _cache_lock:
+        _cache[key] = output
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return output
@@ -1,42 +1,25 @@
 import streamlit as st
-import pandas as pd
-import os
-import ast
-import json
 import datetime
-import seaborn as sns
-import matplotlib.pyplot as plt
-import numpy as np
-import plotly.graph_objects as go
-
-PLAYER_CSV = "players.csv"
-MATCH_CSV = "matches.csv"
-SHOT_CSV = "shots.csv"
-
-expected_columns = ["試合ID", "試合形式", "選手名", "チーム"]
-if os.path.exists(MATCH_CSV):
-    try:
-        df_check = pd.read_csv(MATCH_CSV)
-        if list(df_check.columns) != expected_columns:
-            st.warning("⚠️ matchファイルの列構成が不正だったため、初期化しました。")
-            os.remove(MATCH_CSV)
-    except Exception as e:
-        st.warning(f"⚠️ matchファイルの読み込みに失敗したため、初期化しました。\n詳細: {e}")
-        os.remove(MATCH_CSV)
-
-if not os.path.exists(PLAYER_CSV):
-    pd.DataFrame(columns=["名前", "利き手", "チーム"]).to_csv(PLAYER_CSV, index=False)
-if not os.path.exists(MATCH_CSV):
-    pd.DataFrame(columns=expected_columns).to_csv(MATCH_CSV, index=False)
-if not os.path.exists(SHOT_CSV):
-    pd.DataFrame(columns=["試合ID", "ラリー番号", "ショット順", "打った選手", "打点", "着地", "ショット", "結果", "レシーバー"]).to_csv(SHOT_CSV, index=False)
-
-for key in ["match_id", "last_end_area", "rally_no", "shot_order", "score_A", "score_B", "last_hitter", "next_player"]:
-    if key not in st.session_state:
-        st.session_state[key] = 0 if key.startswith("score") else (None if key == "match_id" else 1 if key == "rally_no" else "")
+
+import data_access
+import storage
+from views import paging
+
+cache_stats = data_access.begin_rerun()
+
+# 列構成の確認は目録（manifest.json）との比較だけで、ファイルの中身は読まない。古い形式は移行し、消すことはない
+for message in storage.check_files():
+    st.warning(message)
+
+backend = storage.get_backend()
+
+# スコア・ラリー番号・ショット順・次の打者は記録から求める（backend.load_match_state()）
+if "match_id" not in st.session_state:
+    st.session_state.match_id = None
 
 st.sidebar.title("メニュー")
 page = st.sidebar.selectbox("ページを選択", ["選手登録", "試合開始・記録", "データ解析"])
+st.sidebar.caption(f"データキャッシュ（前回の再実行）: ヒット {cache_stats['hits']} / ミス {cache_stats['misses']}")
 
 if page == "選手登録":
     st.title("🏸 選手登録")
@@ -46,21 +29,20 @@ if page == "選手登録":
         team = st.text_input("チーム名")
         submit = st.form_submit_button("登録")
         if submit:
-            df = pd.read_csv(PLAYER_CSV)
+            df = backend.load_players()
             if name in df["名前"].values:
                 st.warning("この選手はすでに登録されています。")
             else:
-                df.loc[len(df)] = [name, hand, team]
-                df.to_csv(PLAYER_CSV, index=False)
+                backend.add_player([name, hand, team])
                 st.success(f"{name} さんを登録しました！")
     st.subheader("📋 登録済み選手")
-    st.dataframe(pd.read_csv(PLAYER_CSV))
+    paging.show_table(backend, "players", key="players_page")
 
 
 
 elif page == "試合開始・記録":
     st.title("📘 試合登録・配球記録")
-    players_df = pd.read_csv(PLAYER_CSV)
+    players_df = backend.load_players()
     all_players = players_df["名前"].tolist()
 
     if st.session_state.match_id is None:
@@ -85,25 +67,20 @@ elif page == "試合開始・記録":
                     st.warning("同じ選手を両方のチームに選ぶことはできません。")
                     st.warning("両ペアとも2人ずつ選択してください。")
                 else:
-                    df = pd.read_csv(MATCH_CSV)
+                    df = backend.load_matches()
                     if auto_match_id in df["試合ID"].values:
                         st.warning("この試合IDはすでに存在します。")
                     else:
-                        for p in left_pair:
-                            df.loc[len(df)] = [auto_match_id, "ダブルス", p, "A"]
-                        for p in right_pair:
-                            df.loc[len(df)] = [auto_match_id, "ダブルス", p, "B"]
-                        df.to_csv(MATCH_CSV, index=False)
+                        backend.add_match_rows(
+                            [[auto_match_id, "ダブルス", p, "A"] for p in left_pair]
+                            + [[auto_match_id, "ダブルス", p, "B"] for p in right_pair]
+                        )
                     st.session_state.match_id = auto_match_id
-                    st.session_state.rally_no = 1
-                    st.session_state.shot_order = 1
-                    st.session_state.score_A = 0
-                    st.session_state.score_B = 0
                     st.success("試合を開始しました！")
 
     else:
         match_id = st.session_state.match_id
-        match_df = pd.read_csv(MATCH_CSV)
+        match_df = backend.load_matches()
         match_filtered = match_df[match_df["試合ID"] == match_id]
         if match_filtered.empty:
             st.error(f"試合ID「{match_id}」が見つかりません。試合を再登録してください。")
@@ -113,8 +90,9 @@ elif page == "試合開始・記録":
         left_team = match_players[match_players["チーム"] == "A"]["選手名"].tolist()
         right_team = match_players[match_players["チーム"] == "B"]["選手名"].tolist()
         all_players = left_team + right_team
+        state = backend.load_match_state(match_id)
         st.success(f"進行中の試合ID: {match_id}")
-        st.subheader(f"🌟 スコア：{st.session_state.score_A} - {st.session_state.score_B}")
+        st.subheader(f"🌟 スコア：{state['score'].get('A', 0)} - {state['score'].get('B', 0)}")
         st.markdown("---")
 
         col1, col2 = st.columns([2, 3])
@@ -128,30 +106,18 @@ elif page == "試合開始・記録":
         with col2:
             st.subheader("📝 配球記録")
             with st.form("record_form"):
-                rally_no = st.session_state.rally_no
-                shot_order = st.session_state.shot_order
-
-                # 毎回直前のレシーバーを使用して次の打者を更新
-                if st.session_state.shot_order > 1 and "last_receiver" in st.session_state and st.session_state["last_receiver"] in all_players:
-                    st.session_state["next_player"] = st.session_state["last_receiver"]
-                elif "next_player" not in st.session_state or st.session_state["next_player"] not in all_players:
-                    st.session_state["next_player"] = all_players[0]
-                default_hitter = st.session_state["next_player"]
-                col_a, col_b = st.columns(2)
-                st.session_state["last_hitter"] = default_hitter  # 強制更新
+                # 次の打者はラリー中なら直前のレシーバー、ラリーの最初ならサーブ側の選手
                 col_a, col_b = st.columns(2)
                 with col_a:
                     st.markdown("**打った選手（自チーム）**")
-                    player = st.selectbox("", all_players, index=all_players.index(st.session_state["next_player"]) if st.session_state["next_player"] in all_players else 0)
+                    player = st.selectbox("", all_players, index=all_players.index(state["next_player"]) if state["next_player"] in all_players else 0)
                 with col_b:
                     st.markdown("**レシーブした選手（相手チーム）**")
                     receiver_candidates = right_team if player in left_team else left_team
                     receiver = st.selectbox("", receiver_candidates)
-                    st.session_state["last_receiver"] = receiver
-                
 
                 area_list = ["RR", "CR", "LR", "RM", "CM", "LM", "RF", "CF", "LF"]
-                default_start = st.session_state.last_end_area if st.session_state.last_end_area in area_list else "CM"
+                default_start = state["last_end_area"] if state["last_end_area"] in area_list else "CM"
                 start_area = st.selectbox("打点エリア", area_list, index=area_list.index(default_start))
                 end_area = st.selectbox("着地点エリア", area_list)
                 shot_type = st.radio("ショット種類", ["クリア", "スマッシュ", "ドロップ", "ロングリターン", "ショートリターン", "ドライブ", "ロブ", "プッシュ", "ヘアピン"], horizontal=True)
@@ -160,8 +126,6 @@ elif page == "試合開始・記録":
                 submit = st.form_submit_button("記録する")
                 if submit:
                     submitted_data = {
-                        "rally_no": rally_no,
-                        "shot_order": shot_order,
                         "player": player,
                         "receiver": receiver,
                         "start_area": start_area,
@@ -172,55 +136,21 @@ elif page == "試合開始・記録":
                     shot_saved = True
 
         if shot_saved:
-            df = pd.read_csv(SHOT_CSV)
-            if "レシーバー" not in df.columns:
-                df["レシーバー"] = ""
-            df.loc[len(df)] = [match_id, submitted_data["rally_no"], submitted_data["shot_order"], submitted_data["player"], submitted_data["start_area"], submitted_data["end_area"], submitted_data["shot_type"], submitted_data["result"], submitted_data["receiver"]]
-            df.to_csv(SHOT_CSV, index=False)
+            # 画面に出した状態の後に別のコートが記録していることがあるので、ラリー番号・ショット順はロックの中で読み直して振る
+            with backend.shots_lock():
+                state = backend.load_match_state(match_id)
+                backend.append_shots([[match_id, state["rally_no"], state["shot_order"], submitted_data["player"], submitted_data["start_area"], submitted_data["end_area"], submitted_data["shot_type"], submitted_data["result"], submitted_data["receiver"]]])
             st.success("記録しました！")
 
-            if submitted_data["result"] in ["得点", "ミス", "アウト"]:
-                if submitted_data["player"] in left_team:
-                    st.session_state.score_B += 1
-                else:
-                    st.session_state.score_A += 1
-
-            st.session_state.last_end_area = submitted_data["end_area"]
-
-            if submitted_data["result"] == "続行":
-                st.session_state.shot_order += 1
-                st.session_state.next_player = submitted_data["receiver"]
-                st.session_state.last_receiver = submitted_data["receiver"]
-            else:
-                st.session_state.rally_no += 1
-                st.session_state.shot_order = 1
-                st.session_state.next_player = ""
-
         st.subheader("📊 この試合の記録")
-        shot_df = pd.read_csv(SHOT_CSV)
-        filtered_df = shot_df[shot_df["試合ID"] == match_id].sort_values(by=["ラリー番号", "ショット順"])
-        st.dataframe(filtered_df)
+        filtered_df = backend.query_shots(match_id=match_id).sort_values(by=["ラリー番号", "ショット順"])
+        paging.show_frame(filtered_df, key="history_page")
 
         if st.button("⬅️ 最後の1件を削除"):
-            df = pd.read_csv(SHOT_CSV)
-            match_shots = df[df["試合ID"] == match_id]
-            if not match_shots.empty:
-                last_shot = match_shots.iloc[-1]
-                df = df.drop(match_shots.tail(1).index)
-                df.to_csv(SHOT_CSV, index=False)
+            if backend.delete_last_shot(match_id) is not None:
                 st.success("最後の配球記録を削除しました。")
-                if last_shot["結果"] in ["得点", "ミス", "アウト"]:
-                    if last_shot["打った選手"] in left_team:
-                        st.session_state.score_B = max(0, st.session_state.score_B - 1)
-                    else:
-                        st.session_state.score_A = max(0, st.session_state.score_A - 1)
-                st.session_state.shot_order = max(1, st.session_state.shot_order - 1)
 
         if st.button("❌ 試合終了"):
+            backend.finish_match(match_id)
             st.session_state.match_id = None
-            st.session_state.rally_no = 1
-            st.session_state.shot_order = 1
-            st.session_state.last_end_area = ""
-            st.session_state.score_A = 0
-            st.session_state.score_B = 0
-            st.info("試合を終了しました。")
+            st.info("試合を終了しました。試合のまとめを保存しました。")
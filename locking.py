@@ -0,0 +1,52 @@
+import os
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+_held = threading.local()
+
+
+@contextmanager
+def locked(path):
+    """path に対する排他ロック（別プロセス・別スレッドの両方に効く）。
+
+    ロックは path + ".lock" に取るので、path 自体を os.replace で置き換えても有効。
+    同じスレッドの中では入れ子にしてよい。
+    """
+    held = _held.__dict__.setdefault("paths", {})
+    if held.get(path):
+        held[path] += 1
+        try:
+            yield
+        finally:
+            held[path] -= 1
+        return
+    with open(path + ".lock", "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        held[path] = 1
+        try:
+            yield
+        finally:
+            del held[path]
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def replace_atomically(path, write):
+    """write(tmp_path) で一時ファイルに書き、path と差し替える。読み手が書きかけのファイルを見ることはない。"""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    write(tmp)
+    os.replace(tmp, path)
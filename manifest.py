@@ -0,0 +1,304 @@
+"""データファイルの目録（manifest.json）: スキーマのバージョンと、ファイルごとの列・行数・チェックサム（CRC32）。
+
+起動時の check() は目録に書いた (更新時刻, サイズ) と os.stat() を比べるだけで、ファイルの中身は読まない。
+合わないファイルだけ先頭行（列名）を見て、
+- 今の列なら、アプリの外で書き換えられたものとして行数とチェックサムを数え直す
+- 古いバージョンの列なら、MIGRATIONS の手順で今の形式に移行する
+- どのバージョンにも合わなければ、別名に移して（消さずに）空のファイルを作る
+
+追記（storage.append_rows()）は追記したバイト列の CRC を前の値につなぐので、ファイル全体を読み直さない。
+目録と中身の照合は python storage.py verify で行う。
+"""
+import csv
+import datetime
+import json
+import os
+import zlib
+
+import data_access
+import profiling
+from locking import locked, replace_atomically
+from schema import MATCH_COLUMNS, PLAYER_COLUMNS, SHOT_COLUMNS
+
+MANIFEST_JSON = "manifest.json"
+SCHEMA_VERSION = 2
+
+# バージョンごとの表の列。列を変えるときはバージョンを上げ、MIGRATIONS に前のバージョンからの手順を足す
+SCHEMAS = {
+    1: {"players": PLAYER_COLUMNS, "matches": MATCH_COLUMNS, "shots": [c for c in SHOT_COLUMNS if c != "レシーバー"]},
+    2: {"players": PLAYER_COLUMNS, "matches": MATCH_COLUMNS, "shots": SHOT_COLUMNS},
+}
+
+
+def add_columns(path, columns):
+    """columns にない列を空欄で足して書き直し、行数を返す。既存の値と行の順（削除の目印が指す行番号）は変えない。"""
+    df = profiling.read_csv(path, dtype=str, keep_default_na=False)
+    for col in columns:
+        if col not in df.columns:
+            df[col] = ""
+    replace_atomically(path, lambda tmp: profiling.to_csv(df[columns], tmp, index=False))
+    return len(df)
+
+
+# バージョン → (内容, {表: 手順})。手順 step(path, columns) は一つ前のバージョンの形式のファイルを
+# columns（このバージョンの列）に書き直し、行数を返す
+MIGRATIONS = {
+    2: ("shots に レシーバー 列を追加", {"shots": add_columns}),
+}
+
+
+def manifest_path(path):
+    return os.path.join(os.path.dirname(path), MANIFEST_JSON)
+
+
+def read_header(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return next(csv.reader(f), [])
+
+
+def count_rows(path):
+    """ヘッダーを除いた行数（空行は数えない。引用符の中の改行は1行のうち）。"""
+    with open(path, newline="", encoding="utf-8") as f:
+        return max(sum(1 for row in csv.reader(f) if row) - 1, 0)
+
+
+def file_crc(path):
+    crc = 0
+    with open(path, "rb") as f:
+        while chunk := f.read(1 << 20):
+            crc = zlib.crc32(chunk, crc)
+    return crc
+
+
+def load(manifest):
+    try:
+        with open(manifest, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        # ない・壊れている目録は作り直す（ファイルを数え直すだけで、データには触れない）
+        return {"schema_version": None, "files": {}}
+    data.setdefault("files", {})
+    return data
+
+
+def _save(manifest, data):
+    def write(tmp):
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+
+    replace_atomically(manifest, write)
+
+
+def _matches(entry, path):
+    if entry is None:
+        return False
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return False
+    return (entry["mtime_ns"], entry["size"]) == (st.st_mtime_ns, st.st_size)
+
+
+def _new_generation():
+    return os.urandom(8).hex()
+
+
+def record(path, rows, appended=None, generation=None, removed=None):
+    """path を書いた直後に、path のロックの中で呼ぶ。
+
+    appended は末尾に追記したバイト列で、rows はその行数。None ならファイル全体を書き直したときで、rows は全行数。
+    removed は削除の目印のファイルのときの、目印で消える行数（追記なら追記した目印の分、書き直しなら全体）。
+    目録にない・目録の後で外から書き換えられたファイルへの追記は、行数とチェックサムを 不明（None）にする。
+    世代（generation()）は追記では変わらず、それ以外では新しくなる。行の中身を変えずに書き直したとき
+    （削除済みの行を取り除くなど）は、書き直す前の generation() を渡すとそれを引き継ぐ。
+    """
+    manifest = manifest_path(path)
+    with locked(manifest):
+        data = load(manifest)
+        old = data["files"].get(os.path.basename(path))
+        st = os.stat(path)
+        if appended is None:
+            entry = {
+                "columns": read_header(path), "rows": rows, "crc32": file_crc(path),
+                "generation": generation or _new_generation(), "removed": removed,
+            }
+        elif old is not None and old["size"] + len(appended) == st.st_size:
+            known = old["crc32"] is not None
+            entry = {
+                "columns": old["columns"],
+                "rows": old["rows"] + rows if known else None,
+                "crc32": zlib.crc32(appended, old["crc32"]) if known else None,
+                "generation": old.get("generation") if known else _new_generation(),
+                "removed": old["removed"] + removed if known and removed is not None and old.get("removed") is not None else None,
+            }
+        else:
+            entry = {"columns": read_header(path), "rows": None, "crc32": None, "generation": _new_generation(), "removed": None}
+        entry.update(size=st.st_size, mtime_ns=st.st_mtime_ns)
+        data["files"][os.path.basename(path)] = entry
+        _save(manifest, data)
+
+
+def generation(path, companions=()):
+    """path の世代。アプリの中から書いたとおりのファイルである間は同じ値で、それ以外の書き直しのたびに変わる。
+
+    path から求めて保存した値（試合の状態など）は、世代が同じならアプリの中からの更新だけで最新に保てる。
+    path・companions（削除の目印など）のどれかが目録にない・目録の後にアプリの外で書き換えられていれば None。
+    """
+    files = load(manifest_path(path))["files"]
+    entry = files.get(os.path.basename(path))
+    if not _matches(entry, path) or entry["rows"] is None:
+        return None
+    for other in companions:
+        other_entry = files.get(os.path.basename(other))
+        if not (_matches(other_entry, other) if os.path.exists(other) else other_entry is None):
+            return None
+    return entry.get("generation")
+
+
+def live_rows(path, tombstones):
+    """path の行数から、削除の目印のファイル tombstones で消える行数を引いたもの（ファイルは読まない）。
+
+    どちらかが目録にない・目録の後にアプリの外で書き換えられた・数が不明なら None。
+    """
+    files = load(manifest_path(path))["files"]
+    entry = files.get(os.path.basename(path))
+    if not _matches(entry, path) or entry["rows"] is None:
+        return None
+    tomb = files.get(os.path.basename(tombstones))
+    if not os.path.exists(tombstones):
+        return entry["rows"] if tomb is None else None
+    if not _matches(tomb, tombstones) or tomb.get("removed") is None:
+        return None
+    return entry["rows"] - tomb["removed"]
+
+
+def forget(path):
+    """消したファイルを目録から除く。"""
+    manifest = manifest_path(path)
+    with locked(manifest):
+        data = load(manifest)
+        if data["files"].pop(os.path.basename(path), None) is not None:
+            _save(manifest, data)
+
+
+def create(path, columns):
+    """ヘッダーだけのファイルを作って目録に載せる。すでにあれば何もしない。"""
+    with locked(path):
+        if os.path.exists(path):
+            return
+
+        def write(tmp):
+            with open(tmp, "w", newline="", encoding="utf-8") as f:
+                csv.writer(f, lineterminator="\n").writerow(columns)
+
+        replace_atomically(path, write)
+        record(path, 0, removed=0)
+
+
+def _set_aside(path, companions):
+    """path（と companions のうちあるもの）を日時付きの別名に移し、移した先を返す。"""
+    stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    moved = []
+    for p in [path] + list(companions):
+        if os.path.exists(p):
+            base, ext = os.path.splitext(p)
+            os.replace(p, f"{base}.invalid-{stamp}{ext}")
+            forget(p)
+            data_access.invalidate(p)
+            moved.append(f"{base}.invalid-{stamp}{ext}")
+    return moved
+
+
+def repair(table, path, companions=()):
+    """path のロックの中で呼ぶ。table の今の列（SCHEMAS[SCHEMA_VERSION]）に合わせ、行ったことの説明のリストを返す。
+
+    companions は path と組で使うファイル（削除の目印など）。path を別名に移すときは一緒に移す。
+    """
+    columns = SCHEMAS[SCHEMA_VERSION][table]
+    if not os.path.exists(path):
+        create(path, columns)
+        return []
+    header = read_header(path)
+    if header == columns:
+        if not _matches(load(manifest_path(path))["files"].get(os.path.basename(path)), path):
+            record(path, count_rows(path))
+        return []
+
+    versions = [v for v, schema in SCHEMAS.items() if schema[table] == header]
+    if not versions:
+        moved = _set_aside(path, companions)
+        create(path, columns)
+        return [f"⚠️ {path} の列構成（{', '.join(header)}）がどのバージョンとも合わないため、{moved[0]} に移して新しく作りました。"]
+
+    messages = []
+    rows = None
+    for version in range(max(versions) + 1, SCHEMA_VERSION + 1):
+        description, steps = MIGRATIONS[version]
+        if table in steps:
+            rows = steps[table](path, SCHEMAS[version][table])
+            messages.append(f"{path} を移行しました（バージョン {version - 1} → {version}: {description}）。")
+    record(path, count_rows(path) if rows is None else rows)
+    data_access.invalidate(path)
+    return messages
+
+
+def check(tables, companions=None):
+    """起動時に呼ぶ。tables は {表: パス}（表は SCHEMAS のキー）。行ったこと（移行・退避）の説明のリストを返す。
+
+    目録のバージョンが今のもので、どのファイルも目録の (更新時刻, サイズ) と同じなら、ファイルは開かない。
+    """
+    companions = companions or {}
+    manifests = {m: load(m) for m in {manifest_path(p) for p in tables.values()}}
+    stale = {
+        table: path
+        for table, path in tables.items()
+        if manifests[manifest_path(path)]["schema_version"] != SCHEMA_VERSION
+        or not _matches(manifests[manifest_path(path)]["files"].get(os.path.basename(path)), path)
+    }
+    if not stale:
+        return []
+
+    messages = []
+    for table, path in stale.items():
+        with locked(path):
+            messages += repair(table, path, companions.get(table, ()))
+    for manifest in manifests:
+        with locked(manifest):
+            data = load(manifest)
+            if data["schema_version"] != SCHEMA_VERSION:
+                data["schema_version"] = SCHEMA_VERSION
+                _save(manifest, data)
+    return messages
+
+
+def upgrade(path, columns):
+    """追記の直前に呼ぶ。起動時の確認の後に古い形式のファイルが置かれていたら、ここで移行する。"""
+    for table, current in SCHEMAS[SCHEMA_VERSION].items():
+        if current == columns:
+            return repair(table, path)
+    raise ValueError(f"{path} の列 {read_header(path)} が {columns} と違います。")
+
+
+def verify(paths):
+    """目録の行数・チェックサムとファイルの中身を照らし合わせ、合わないものの説明のリストを返す（ファイル全体を読む）。
+
+    行数とチェックサムが未確認（目録の外で作られたファイルへの追記の後）なら、ここで数えて目録に書く。
+    """
+    problems = []
+    for path in paths:
+        entry = load(manifest_path(path))["files"].get(os.path.basename(path))
+        if entry is None:
+            problems.append(f"{path}: 目録にありません。")
+            continue
+        if not _matches(entry, path):
+            problems.append(f"{path}: 目録の後に書き換えられています。")
+            continue
+        if entry["crc32"] is None:
+            with locked(path):
+                record(path, count_rows(path))
+            problems.append(f"{path}: 行数とチェックサムが未確認だったため、数えて目録に書きました。")
+            continue
+        rows, crc = count_rows(path), file_crc(path)
+        if (rows, crc) != (entry["rows"], entry["crc32"]):
+            problems.append(f"{path}: 行数 {rows}（目録 {entry['rows']}）・CRC32 {crc:08x}（目録 {entry['crc32']:08x}）")
+    return problems
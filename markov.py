@@ -0,0 +1,224 @@
+"""ラリーのマルコフ連鎖モデル。球の状態は 着地エリア × ショット種類（AREAS × SHOT_TYPES の 9×9 = 81 状態）。
+
+1球ごとに、ラリーが続いて相手の球（次の状態）に移るか、その球でラリーが終わる（得点なら打った側、ミス・アウトなら相手側の勝ち）。
+選手・ペア（対象）ごとに
+- 対象の球 → 相手の返球 の遷移と、対象の球の終わり方の件数
+- 相手の返球 → 対象側の次の球 の遷移と、相手の返球の終わり方の件数
+を数え、対象の球と相手の球の 162 状態の吸収マルコフ連鎖として、各状態から対象がラリーを取る確率を求める。
+ダブルスでは、パートナーの球も対象の球として扱う（選手の遷移は本人の球だけから数える）。
+記録の少ない状態の遷移は、全員の球から求めた遷移に PRIOR 球ぶん寄せる。
+
+件数はすべて bincount で数え、モデルはデータの版（backend.data_version()）と期間ごとに1つだけ作り直す。
+"""
+import numpy as np
+import pandas as pd
+
+import profiling
+from analytics import category_codes
+from schema import AREAS, SHOT_TYPES
+
+N_AREAS = len(AREAS)
+N_SHOTS = len(SHOT_TYPES)
+N_STATES = N_AREAS * N_SHOTS
+# 打った側から見た終わり方
+WIN, LOSE = 0, 1
+# 記録の少ない状態を全体の遷移に寄せる強さ（球数）
+PRIOR = 5
+
+
+def _solve(a, b):
+    try:
+        return np.linalg.solve(a, b)
+    except np.linalg.LinAlgError:
+        # どの状態からも終わりに届かない（終わりの記録がない）ときは最小二乗で近い解を使う
+        return np.linalg.lstsq(a, b, rcond=None)[0]
+
+
+def _probabilities(trans, ends, prior=None):
+    """件数（状態 × 次の状態、状態 × 終わり方）を行ごとの確率にする。
+
+    prior（全員の球の確率の組）を渡すと、各行を PRIOR 球ぶんその行に寄せる（記録のない状態は prior と同じになる）。
+    """
+    trans, ends = trans.astype(float), ends.astype(float)
+    if prior is not None:
+        trans = trans + PRIOR * prior[0]
+        ends = ends + PRIOR * prior[1]
+    total = trans.sum(axis=1) + ends.sum(axis=1)
+    scale = np.divide(1.0, total, out=np.zeros_like(total), where=total > 0)[:, None]
+    return trans * scale, ends * scale
+
+
+class RallyModel:
+    """ショット表（型付き）と試合の表から作るラリーのモデル。選手・ペアごとの結果は subject() で求める。"""
+
+    def __init__(self, shots, matches):
+        rally_no = shots["ラリー番号"].astype("Float64").fillna(-1).to_numpy(dtype=np.int64)
+        order = shots["ショット順"].astype("Float64").fillna(-1).to_numpy(dtype=np.int64)
+        match_codes, match_ids = pd.factorize(shots["試合ID"])
+        perm = np.lexsort((order, rally_no, match_codes))
+        match_codes, rally_no = match_codes[perm], rally_no[perm]
+        self.size = len(perm)
+
+        area = category_codes(shots["着地"], AREAS)[perm]
+        shot = category_codes(shots["ショット"], SHOT_TYPES)[perm]
+        self.state = np.where((area < N_AREAS) & (shot < N_SHOTS), area * N_SHOTS + shot, -1)
+        result = shots["結果"].astype(object).to_numpy()[perm]
+        self.end = np.select([result == "得点", np.isin(result, ["ミス", "アウト"])], [WIN, LOSE], -1)
+
+        # 同じラリーの次の球の状態（ラリーの最後の球は -1）
+        same_rally = np.zeros(self.size, dtype=bool)
+        same_rally[:-1] = (match_codes[1:] == match_codes[:-1]) & (rally_no[1:] == rally_no[:-1])
+        self.next_state = np.full(self.size, -1, dtype=np.int64)
+        self.next_state[:-1] = np.where(same_rally[:-1], self.state[1:], -1)
+
+        player_codes, players = pd.factorize(shots["打った選手"])
+        player_codes = player_codes[perm]
+        self.players = [str(p) for p in players]
+        pair_codes, self.pairs = self._pair_codes(match_codes, list(match_ids), player_codes, self.players, matches)
+        self._groups = {"選手": self._group(player_codes, len(self.players)), "ペア": self._group(pair_codes, len(self.pairs))}
+
+        # 全員の球（打った側から見た片側のモデル）
+        valid = self.state >= 0
+        self.trans = self._transitions(np.flatnonzero(valid & (self.end < 0)))
+        self.ends = self._ends(np.flatnonzero(valid))
+        self.prior = _probabilities(self.trans, self.ends)
+        q, r = self.prior
+        # 打った側の勝率 w = r_win + Q (1 - w)（次の球は相手が打つ）
+        self.win = _solve(np.eye(N_STATES) + q, r[:, WIN] + q.sum(axis=1))
+        self._subjects = {}
+
+    @staticmethod
+    def _pair_codes(match_codes, match_ids, player_codes, players, matches):
+        """ショットごとの、打った選手のペア（同じ試合・同じチームの2人）のコードと、ペアの名前のリスト。"""
+        match_index = {m: i for i, m in enumerate(match_ids)}
+        player_index = {p: i for i, p in enumerate(players)}
+        members = {}
+        for match_id, player, team in matches[["試合ID", "選手名", "チーム"]].itertuples(index=False):
+            if match_id in match_index and not pd.isna(player):
+                members.setdefault((match_id, "" if pd.isna(team) else str(team)), []).append(str(player))
+        keys, labels = [], []
+        for (match_id, _), names in members.items():
+            if len(names) != 2:
+                continue
+            label = "・".join(sorted(names))
+            for name in names:
+                if name in player_index:
+                    keys.append(match_index[match_id] * len(players) + player_index[name])
+                    labels.append(label)
+        if not keys:
+            return np.full(len(match_codes), -1, dtype=np.int64), []
+        label_codes, pairs = pd.factorize(pd.Series(labels, dtype=object))
+        keys = np.asarray(keys, dtype=np.int64)
+        sort = np.argsort(keys)
+        keys, label_codes = keys[sort], label_codes[sort]
+        shot_keys = match_codes.astype(np.int64) * len(players) + player_codes
+        pos = np.clip(np.searchsorted(keys, shot_keys), 0, len(keys) - 1)
+        found = (keys[pos] == shot_keys) & (player_codes >= 0) & (match_codes >= 0)
+        return np.where(found, label_codes[pos], -1), list(pairs)
+
+    @staticmethod
+    def _group(codes, n):
+        """コードごとの球の位置（並べ替えた順のまま）を引けるようにする。"""
+        order = np.argsort(codes, kind="stable")
+        return order, np.searchsorted(codes[order], np.arange(-1, n + 1))
+
+    def _transitions(self, positions):
+        positions = positions[self.next_state[positions] >= 0]
+        key = self.state[positions] * N_STATES + self.next_state[positions]
+        return np.bincount(key, minlength=N_STATES * N_STATES).reshape(N_STATES, N_STATES)
+
+    def _ends(self, positions):
+        positions = positions[self.end[positions] >= 0]
+        return np.bincount(self.state[positions] * 2 + self.end[positions], minlength=N_STATES * 2).reshape(N_STATES, 2)
+
+    def labels(self, kind):
+        return self.players if kind == "選手" else self.pairs
+
+    def subject(self, kind, name):
+        """kind（"選手" か "ペア"）の name の結果の dict。記録がなければ None。状態は 着地エリア × N_SHOTS + ショット。
+
+        - "遷移": 対象の球 → 相手の返球 の件数（81 × 81）
+        - "終わり方": 対象の球の 勝ち・負け の件数（81 × 2）
+        - "勝率": 対象の球の状態から対象がラリーを取る確率（81）
+        - "相手の球": 相手の返球の状態ごとの件数（81）
+        - "相手の球の勝率": 相手の返球の状態から対象がラリーを取る確率（81）
+        """
+        key = (kind, name)
+        if key not in self._subjects:
+            labels = self.labels(kind)
+            self._subjects[key] = self._subject(kind, labels.index(name)) if name in labels else None
+        return self._subjects[key]
+
+    @profiling.timed(profiling.COMPUTE, "RallyModel.subject")
+    def _subject(self, kind, code):
+        order, bounds = self._groups[kind]
+        # bounds[0] はコード -1（ペアのない球）の始まり
+        own = order[bounds[code + 1]:bounds[code + 2]]
+        own = own[self.state[own] >= 0]
+        if not len(own):
+            return None
+        # 相手の返球は、対象の球でラリーが終わらずに続いた次の球
+        replies = own[(self.end[own] < 0) & (self.next_state[own] >= 0)] + 1
+        own_trans, own_ends = self._transitions(own[self.end[own] < 0]), self._ends(own)
+        reply_trans, reply_ends = self._transitions(replies[self.end[replies] < 0]), self._ends(replies)
+
+        # 対象の球（0〜80）と相手の球（81〜161）の吸収マルコフ連鎖。相手の球の ミス・アウト は対象の勝ち
+        q_own, r_own = _probabilities(own_trans, own_ends, self.prior)
+        q_reply, r_reply = _probabilities(reply_trans, reply_ends, self.prior)
+        chain = np.zeros((2 * N_STATES, 2 * N_STATES))
+        chain[:N_STATES, N_STATES:] = q_own
+        chain[N_STATES:, :N_STATES] = q_reply
+        win = _solve(np.eye(2 * N_STATES) - chain, np.concatenate([r_own[:, WIN], r_reply[:, LOSE]]))
+        return {
+            "球数": len(own),
+            "遷移": own_trans,
+            "終わり方": own_ends,
+            "勝率": win[:N_STATES],
+            "相手の球": np.bincount(self.state[replies], minlength=N_STATES),
+            "相手の球の勝率": win[N_STATES:],
+        }
+
+
+def area_transitions(trans):
+    """81 × 81 の遷移を 着地エリア → 着地エリア の 9 × 9 にまとめる（AREAS の順）。"""
+    return trans.reshape(N_AREAS, N_SHOTS, N_AREAS, N_SHOTS).sum(axis=(1, 3))
+
+
+def shot_transitions(trans):
+    """81 × 81 の遷移を ショット → ショット の 9 × 9 にまとめる（SHOT_TYPES の順）。"""
+    return trans.reshape(N_AREAS, N_SHOTS, N_AREAS, N_SHOTS).sum(axis=(0, 2))
+
+
+def danger_zones(result, min_count=5):
+    """相手の返球の着地エリアごとの、対象がラリーを取る確率（低い順）。
+
+    勝率は エリア内の状態の勝率を返球の件数で重み付けした平均。「危険なショット」は件数が min_count 以上の中で勝率が最も低いもの。
+    """
+    counts = result["相手の球"].reshape(N_AREAS, N_SHOTS)
+    win = result["相手の球の勝率"].reshape(N_AREAS, N_SHOTS)
+    total = counts.sum(axis=1)
+    rate = np.divide((counts * win).sum(axis=1), total, out=np.full(N_AREAS, np.nan), where=total > 0)
+    masked = np.where(counts >= min_count, win, np.inf)
+    worst = masked.argmin(axis=1)
+    zones = pd.DataFrame({
+        "エリア": AREAS,
+        "件数": total,
+        "勝率": rate,
+        "危険なショット": [SHOT_TYPES[w] if np.isfinite(masked[i, w]) else "" for i, w in enumerate(worst)],
+        "そのショットの勝率": [win[i, w] if np.isfinite(masked[i, w]) else np.nan for i, w in enumerate(worst)],
+    })
+    return zones[zones["件数"] > 0].sort_values("勝率", kind="stable").reset_index(drop=True)
+
+
+_model = None
+
+
+def model_for(backend, period=None):
+    """backend のショット（period を指定するとその期間のショット）から作ったモデル。データと期間が同じなら作り直さない。"""
+    global _model
+    key = (backend.data_version(), period)
+    if _model is None or _model[0] != key:
+        shots = backend.load_shots() if period is None else backend.load_shots_between(*period)
+        with profiling.span(profiling.COMPUTE, "RallyModel"):
+            _model = (key, RallyModel(shots, backend.load_matches()))
+    return _model[1]
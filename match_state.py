@@ -0,0 +1,205 @@
+import contextlib
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+import profiling
+from locking import replace_atomically
+
+# ラリーが終わる結果。得点は打った側、ミス・アウトは相手側の得点になる
+RALLY_END_RESULTS = ["得点", "ミス", "アウト"]
+
+# 取り消しに備えて覚えておく直前の状態の数。これより多く取り消すとその試合だけ作り直す
+UNDO_DEPTH = 20
+
+_FIELDS = ["rally_no", "shot_order", "next_player", "last_end_area", "score", "server", "last_server"]
+
+
+def new_state(teams):
+    """まだショットがない試合の状態。teams は {選手名: チーム}。"""
+    return {
+        "shot_count": 0,
+        "teams": dict(teams),
+        "score": {team: 0 for team in sorted(set(teams.values()))},
+        "rally_no": 1,
+        "shot_order": 1,
+        "next_player": "",
+        "last_end_area": "",
+        # 今のラリーのサーバー（チーム・選手）と、チームごとに最後にサーブした選手
+        "server": {"team": "", "player": ""},
+        "last_server": {},
+        "undo": [],
+    }
+
+
+def _value(v):
+    return "" if v is None or pd.isna(v) else v
+
+
+def _opponent(state, team):
+    others = [t for t in state["score"] if t != team]
+    return others[0] if len(others) == 1 else ""
+
+
+def apply(state, shot):
+    """ショット1件分だけ状態を進める。shot は SHOT_COLUMNS をキーにした dict。"""
+    hitter = _value(shot["打った選手"])
+    team = state["teams"].get(hitter, "")
+    rally_no = int(shot["ラリー番号"])
+
+    # _FIELDS の値は数値・文字列か、それらだけの dict なので1段だけコピーすれば足りる
+    previous = {field: dict(state[field]) if isinstance(state[field], dict) else state[field] for field in _FIELDS}
+    previous["shot"] = [rally_no, int(shot["ショット順"]), hitter]
+    state["undo"].append(previous)
+    del state["undo"][:-UNDO_DEPTH]
+
+    if int(shot["ショット順"]) == 1:
+        state["server"] = {"team": team, "player": hitter}
+        if team:
+            state["last_server"][team] = hitter
+    state["last_end_area"] = _value(shot["着地"])
+
+    result = _value(shot["結果"])
+    if result in RALLY_END_RESULTS:
+        winner = team if result == "得点" else _opponent(state, team)
+        if winner in state["score"]:
+            state["score"][winner] += 1
+        state["rally_no"] = rally_no + 1
+        state["shot_order"] = 1
+        # ラリーを取ったチームが次にサーブする。サーブ権が移ったときはそのチームで最後にサーブした選手（推定）
+        if winner and winner == state["server"]["team"]:
+            state["next_player"] = state["server"]["player"]
+        else:
+            state["next_player"] = state["last_server"].get(winner, "")
+    else:
+        state["rally_no"] = rally_no
+        state["shot_order"] = int(shot["ショット順"]) + 1
+        state["next_player"] = _value(shot["レシーバー"])
+    state["shot_count"] += 1
+    return state
+
+
+def revert(state, shot):
+    """最後のショット shot を記録する前の状態に戻す。戻せなければ False。"""
+    if not state["undo"] or state["shot_count"] == 0:
+        return False
+    previous = state["undo"][-1]
+    if previous["shot"] != [int(shot["ラリー番号"]), int(shot["ショット順"]), _value(shot["打った選手"])]:
+        return False
+    state["undo"].pop()
+    state.update({field: previous[field] for field in _FIELDS})
+    state["shot_count"] -= 1
+    return True
+
+
+@profiling.timed(profiling.COMPUTE, "match_state.replay")
+def replay(shots, teams):
+    """ショットの記録（記録順）から状態を作る。"""
+    state = new_state(teams)
+    for shot in shots.to_dict("records"):
+        apply(state, shot)
+    return state
+
+
+class MatchStateStore:
+    """試合ごとの状態（スコア・次のラリー番号とショット順・次の打者など）を試合ごとの JSON ファイルに保持する。
+
+    状態はショットの記録から求まるもので、記録・取り消しのたびに1件分だけ進めたり戻したりする。
+    試合ごとにファイルを分けているので、試合数が増えても1件あたりの読み書きは変わらない。
+    保存済みの状態のショット数が実際と合わなければ、その試合のショットから作り直す。
+    add_shots() / remove_shot() はショットを書き込むのと同じロックの中で呼ぶこと。
+    """
+
+    def __init__(self, directory, lock=contextlib.nullcontext):
+        self.directory = directory
+        self.lock = lock
+
+    def _path(self, match_id):
+        digest = hashlib.sha1(str(match_id).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.directory, digest + ".json")
+
+    def _load(self, match_id):
+        try:
+            with open(self._path(match_id), encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        # ハッシュが衝突した別の試合の状態は使わない
+        return state if state.get("match_id") == str(match_id) else None
+
+    def _save(self, match_id, state):
+        state["match_id"] = str(match_id)
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(match_id)
+        replace_atomically(path, lambda tmp: _write_json(tmp, state))
+
+    def _remove(self, match_id):
+        try:
+            os.remove(self._path(match_id))
+        except FileNotFoundError:
+            pass
+
+    def add_shots(self, shots):
+        states = {}
+        for shot in shots:
+            match_id = str(shot["試合ID"])
+            if match_id not in states:
+                states[match_id] = self._load(match_id)
+            # 状態をまだ作っていない試合は、最初に読むときに作る
+            if states[match_id] is not None:
+                apply(states[match_id], shot)
+        for match_id, state in states.items():
+            if state is not None:
+                self._save(match_id, state)
+
+    def remove_shot(self, shot):
+        match_id = str(shot["試合ID"])
+        state = self._load(match_id)
+        if state is None:
+            return
+        if revert(state, shot):
+            self._save(match_id, state)
+        else:
+            self._remove(match_id)
+
+    def remove_match(self, match_id):
+        self._remove(match_id)
+
+    def invalidate(self):
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith(".json"):
+                    os.remove(os.path.join(self.directory, name))
+
+    def get(self, match_id, load_shots, teams, shot_count=None, generation=None):
+        """試合の状態。保存済みの状態が teams と合わなければ load_shots() から作り直す。
+
+        shot_count を渡すと保存済みのショット数と、generation を渡すと状態を作ったときのショットの世代
+        （manifest.generation()）と比べ、合わなければ作り直す。
+        """
+        state = self._load(match_id)
+        if not self._current(state, teams, shot_count, generation):
+            with self.lock():
+                # ロックを待つ間に別のプロセスが作り直していれば、それを使う
+                state = self._load(match_id)
+                if not self._current(state, teams, shot_count, generation):
+                    state = replay(load_shots(), teams)
+                    state["generation"] = generation
+                    self._save(match_id, state)
+        return state
+
+    @staticmethod
+    def _current(state, teams, shot_count, generation):
+        return (
+            state is not None
+            and state["teams"] == teams
+            and (shot_count is None or state["shot_count"] == shot_count)
+            and (generation is None or state.get("generation") == generation)
+        )
+
+
+def _write_json(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(json.dumps(data, ensure_ascii=False))
@@ -0,0 +1,281 @@
+"""試合のまとめ: 試合の終了時に一度だけ求め、試合ごとの JSON ファイルとして保存する。
+
+終了の操作をしていない試合のまとめは python storage.py summaries でまとめて作れる。
+
+まとめには次を含む（build() を参照）。
+- 選手ごとの指標（率）と、そのもとになる件数（analytics.SUM_COLUMNS）
+- 選手ごとの打点・着地・ミスの打点のエリア別件数（AREAS の順、heatmap.court_grid() でコートの並びにできる）
+- ラリーの長さ（球数）の分布と、ラリーごとのスコアの推移
+件数は足し合わせられるので、期間・試合を絞った集計は生のショットを数え直さずに merge() で求められる。
+"""
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import analytics
+import data_access
+import match_state
+import profiling
+from locking import replace_atomically
+from schema import AREAS
+
+VERSION = 1
+AREA_KEYS = ["打点", "着地", "ミス打点"]
+
+
+def _area_counts(pair_codes, n_pairs, areas):
+    """(試合, 選手) × エリア（AREAS の順）の件数。エリアが定義外のショットは数えない。"""
+    n = len(AREAS) + 1
+    return np.bincount(pair_codes * n + areas, minlength=n_pairs * n).reshape(n_pairs, n)[:, :-1]
+
+
+def _empty(match_id, teams):
+    return {
+        "version": VERSION,
+        "match_id": str(match_id),
+        "shot_count": 0,
+        "score": {team: 0 for team in sorted(set(teams.values()))},
+        "players": {},
+        "ラリーの長さ": {},
+        "スコアの推移": [],
+    }
+
+
+def _progression(ends, teams):
+    """ラリーが終わるたびのスコア。match_state.apply() と同じく、得点は打った側、ミス・アウトは相手側に入る。
+
+    ends はラリーの最後の1球（記録順）の (ラリー番号, 打った選手, 結果)。
+    """
+    score = {team: 0 for team in sorted(set(teams.values()))}
+    rows = []
+    for rally_no, hitter, result in ends:
+        team = teams.get(hitter, "")
+        if result == "得点":
+            winner = team
+        else:
+            others = [t for t in score if t != team]
+            winner = others[0] if len(others) == 1 else ""
+        if winner in score:
+            score[winner] += 1
+        rows.append({"ラリー": int(rally_no), **score})
+    return rows, score
+
+
+@profiling.timed(profiling.COMPUTE, "match_summary.build_many")
+def build_many(shots, teams):
+    """複数の試合のショット（記録順）から、試合ID → まとめ の dict を作る。teams は {試合ID: {選手名: チーム}}。
+
+    件数はすべての試合をまとめて1回ずつ数える（試合ごとに集計すると試合数に比例して遅くなる）。
+    """
+    shots = shots[shots["試合ID"].notna()]
+    match_codes, match_ids = pd.factorize(shots["試合ID"])
+    player_codes, players = pd.factorize(shots["打った選手"])
+    # 下のループで1件ずつ引くので、pandas の Index ではなく Python のリストにしておく
+    match_ids, players = [str(m) for m in match_ids], [str(p) for p in players]
+
+    # (試合, 選手) の組ごとに数える。組は tidy_counts() の「選手」として渡す
+    hit = player_codes >= 0
+    pair_codes, pairs = pd.factorize(match_codes[hit].astype(np.int64) * max(len(players), 1) + player_codes[hit])
+    by_pair = shots[hit].assign(打った選手=pair_codes)
+    sums = analytics.metric_sums(analytics.tidy_counts(by_pair)).sort_index()
+    metrics = analytics.metrics_from_sums(sums)
+    start = analytics.category_codes(by_pair["打点"], AREAS)
+    miss = (by_pair["結果"] == "ミス").to_numpy()
+    areas = {
+        "打点": _area_counts(pair_codes, len(pairs), start),
+        "着地": _area_counts(pair_codes, len(pairs), analytics.category_codes(by_pair["着地"], AREAS)),
+        "ミス打点": _area_counts(pair_codes[miss], len(pairs), start[miss]),
+    }
+    sum_values = sums[analytics.SUM_COLUMNS].to_numpy().tolist()
+    metric_values = metrics[analytics.COMPARE_METRICS].to_numpy().round(4).tolist()
+    areas = {key: grid.tolist() for key, grid in areas.items()}
+
+    summaries = {match_id: _empty(match_id, teams.get(match_id, {})) for match_id in match_ids}
+    for i, pair in enumerate(pairs.tolist()):
+        match_id, player = match_ids[pair // max(len(players), 1)], players[pair % max(len(players), 1)]
+        summaries[match_id]["players"][player] = {
+            "チーム": teams.get(match_id, {}).get(player, ""),
+            "件数": dict(zip(analytics.SUM_COLUMNS, sum_values[i])),
+            "指標": dict(zip(analytics.COMPARE_METRICS, metric_values[i])),
+            **{key: grid[i] for key, grid in areas.items()},
+        }
+
+    for m, n in enumerate(np.bincount(match_codes, minlength=len(match_ids))):
+        summaries[match_ids[m]]["shot_count"] = int(n)
+    rallies = pd.DataFrame({"試合": match_codes, "ラリー番号": shots["ラリー番号"].to_numpy()})
+    lengths = rallies.groupby(["試合", "ラリー番号"]).size()
+    for (m, length), n in lengths.groupby(level="試合").value_counts().sort_index().items():
+        summaries[match_ids[m]]["ラリーの長さ"][str(length)] = int(n)
+
+    # ラリーの最後の1球を試合ごとに（試合の中では記録順に）並べ、試合ごとにスコアを進める
+    end = np.flatnonzero(shots["結果"].isin(match_state.RALLY_END_RESULTS).to_numpy())
+    end = end[np.argsort(match_codes[end], kind="stable")]
+    ends = list(zip(
+        shots["ラリー番号"].to_numpy()[end].tolist(),
+        shots["打った選手"].astype(object).to_numpy()[end].tolist(),
+        shots["結果"].astype(object).to_numpy()[end].tolist(),
+    ))
+    bounds = np.searchsorted(match_codes[end], np.arange(len(match_ids) + 1)).tolist()
+    for m, match_id in enumerate(match_ids):
+        if bounds[m] < bounds[m + 1]:
+            progression, score = _progression(ends[bounds[m]:bounds[m + 1]], teams.get(match_id, {}))
+            summaries[match_id]["スコアの推移"] = progression
+            summaries[match_id]["score"] = score
+    return summaries
+
+
+def build(match_id, shots, teams):
+    """1試合のショット（記録順）から まとめ の dict を作る。teams は {選手名: チーム}。"""
+    # ショットがない試合は空のまとめ
+    return build_many(shots, {match_id: teams}).get(match_id) or _empty(match_id, teams)
+
+
+def merge(summaries):
+    """まとめ（のリスト）を足し合わせ、選手ごとの指標（analytics.metrics_from_sums()）に 試合数 を加えたもの。"""
+    rows = [
+        [player] + [entry["件数"][col] for col in analytics.SUM_COLUMNS]
+        for summary in summaries
+        for player, entry in summary["players"].items()
+    ]
+    return _metrics(*_sum_rows(pd.DataFrame(rows, columns=["選手"] + analytics.SUM_COLUMNS)))
+
+
+def _sum_rows(rows):
+    """選手 と SUM_COLUMNS の列を持つ表（1行 = 1試合の1選手）の、選手ごとの件数の和と試合数。"""
+    grouped = rows.groupby("選手", sort=False)
+    return grouped[analytics.SUM_COLUMNS].sum(), grouped.size()
+
+
+def _metrics(sums, played):
+    metrics = analytics.metrics_from_sums(sums)
+    metrics["試合数"] = played.reindex(metrics.index, fill_value=0).astype("int64")
+    return metrics
+
+
+def rally_lengths(summaries):
+    """ラリーの長さ（球数）ごとのラリー数を足し合わせたもの。"""
+    total = {}
+    for summary in summaries:
+        for length, n in summary["ラリーの長さ"].items():
+            total[int(length)] = total.get(int(length), 0) + n
+    return pd.Series(total, dtype="int64", name="ラリー数").sort_index().rename_axis("球数")
+
+
+def area_grid(summaries, player, key="ミス打点"):
+    """選手の key（AREA_KEYS のいずれか）のエリア別件数を足し合わせ、heatmap.court_grid() と同じ 3×3 にする。"""
+    grid = np.zeros(len(AREAS), dtype=np.int64)
+    for summary in summaries:
+        entry = summary["players"].get(player)
+        if entry is not None:
+            grid += entry[key]
+    return grid.reshape(3, 3)
+
+
+class MatchSummaryStore:
+    """試合ごとのまとめを1試合1ファイルの JSON で保持する（ファイル名は MatchStateStore と同じく試合IDのハッシュ）。
+
+    まとめは試合の終了時に作る。その後にショットが追加・削除された試合のまとめは捨てる（保存先が remove() を呼ぶ）。
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def _path(self, match_id):
+        digest = hashlib.sha1(str(match_id).encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.directory, digest + ".json")
+
+    def save(self, summary):
+        os.makedirs(self.directory, exist_ok=True)
+        data = json.dumps(summary, ensure_ascii=False)
+
+        def write(tmp):
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(data)
+
+        replace_atomically(self._path(summary["match_id"]), write)
+
+    def get(self, match_id):
+        try:
+            with open(self._path(match_id), encoding="utf-8") as f:
+                summary = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if summary.get("match_id") != str(match_id) or summary.get("version") != VERSION:
+            return None
+        return summary
+
+    def remove(self, match_id):
+        try:
+            os.remove(self._path(match_id))
+        except FileNotFoundError:
+            pass
+
+    def remove_matches(self, match_ids):
+        for match_id in set(match_ids):
+            self.remove(match_id)
+
+    def invalidate(self):
+        if os.path.isdir(self.directory):
+            for name in os.listdir(self.directory):
+                if name.endswith(".json"):
+                    os.remove(os.path.join(self.directory, name))
+
+    def _read_all(self):
+        summaries = []
+        for name in os.listdir(self.directory) if os.path.isdir(self.directory) else []:
+            if name.endswith(".json"):
+                with open(os.path.join(self.directory, name), encoding="utf-8") as f:
+                    summary = json.load(f)
+                if summary.get("version") == VERSION:
+                    summaries.append(summary)
+        return summaries
+
+    def player_rows(self):
+        """すべてのまとめの 試合ID・選手・SUM_COLUMNS・shot_count・generation の表（1行 = 1試合の1選手）。
+
+        ファイルの追加・削除でディレクトリの更新時刻が変わるので、それまではメモリ上の表を使う。
+        """
+        def load():
+            rows = [
+                [summary["match_id"], summary["shot_count"], summary.get("generation"), player]
+                + [entry["件数"][col] for col in analytics.SUM_COLUMNS]
+                for summary in self._read_all()
+                for player, entry in summary["players"].items()
+            ]
+            return pd.DataFrame(rows, columns=["試合ID", "shot_count", "generation", "選手"] + analytics.SUM_COLUMNS)
+
+        return data_access.cached(("match-summaries", self.directory), data_access.file_signature(self.directory), load)
+
+
+def metrics_for_matches(backend, match_ids):
+    """match_ids の試合の選手ごとの指標（試合数を含む）。
+
+    まとめがあり今の記録と合う試合はまとめを足し合わせ、残りの試合だけ生のショットから数える。
+    ショットを読むのは残りの試合があるときだけで、その試合日の範囲（load_shots_between()）に限る。
+    """
+    rows = backend.match_summaries.player_rows()
+    rows = rows[rows["試合ID"].isin(match_ids)]
+    # まとめを作った後にショットが変わった試合のまとめは保存先が消すので、作ったときとショットの世代が同じなら今の記録と合う。
+    # 世代のないまとめ（SQLite・古いまとめ）は試合ごとのショット数を比べる
+    generation = backend.shots_generation()
+    stamped = (rows["generation"] == generation).to_numpy() if generation is not None else np.zeros(len(rows), dtype=bool)
+    if not stamped.all():
+        counts = backend.match_shot_counts(rows["試合ID"][~stamped].unique())
+        rows = rows[stamped | (rows["shot_count"].to_numpy() == counts.reindex(rows["試合ID"], fill_value=0).to_numpy())]
+    sums, played = _sum_rows(rows)
+
+    rest = set(match_ids) - set(rows["試合ID"])
+    if rest:
+        dates = analytics.match_dates(list(rest))
+        if dates.notna().all():
+            shots = backend.load_shots_between(dates.min().date(), dates.max().date())
+        else:
+            shots = backend.load_shots()
+        rest = analytics.shots_in_matches(shots, rest)
+        if len(rest):
+            sums = sums.add(analytics.metric_sums(analytics.tidy_counts(rest)), fill_value=0).astype("int64")
+            played = played.add(analytics.matches_played(rest), fill_value=0)
+    return _metrics(sums, played)
@@ -0,0 +1,207 @@
+"""ショットの試合日ごとの分割。期間を指定した読み込みで、期間内の試合日のファイルだけを読むために使う。
+
+ディレクトリに試合日ごとの CSV（2025-03-27.csv。日付で始まらない試合IDは undated.csv）と、
+索引 index.json（分割ごとの行数と、分割が対応する shots.csv の版 = backend.data_version()）を置く。
+試合の日付は試合IDの先頭にあるので、試合から分割は索引を引かずに決まる（partition_of()）。
+
+記録の正本は shots.csv のままで、分割は CsvBackend がショットの追記・削除と同じロックの中で更新する。
+索引の版が shots.csv と合わないとき（アプリの外で書き換えられた、ファイル全体を書き直したなど）は
+次の読み込みで作り直す。
+"""
+import csv
+import io
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+import data_access
+import profiling
+import schema
+from locking import replace_atomically
+from schema import SHOT_COLUMNS
+
+VERSION = 1
+UNDATED = "undated"
+_MATCH_DATE = re.compile(r"^(\d{4}-\d{2}-\d{2})")
+
+
+def partition_of(match_id):
+    """試合IDの先頭の日付（YYYY-MM-DD）。日付で始まらない試合IDは UNDATED。"""
+    found = _MATCH_DATE.match(str(match_id))
+    return found.group(1) if found else UNDATED
+
+
+def _jsonable(version):
+    # data_version() のタプルを JSON に保存したものと比べられる形にする
+    return json.loads(json.dumps(version))
+
+
+class ShotPartitions:
+    def __init__(self, directory):
+        self.directory = directory
+        self.index_path = os.path.join(directory, "index.json")
+
+    def _path(self, partition):
+        return os.path.join(self.directory, partition + ".csv")
+
+    def _read_index(self):
+        try:
+            with open(self.index_path, encoding="utf-8") as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return index if index.get("version") == VERSION else None
+
+    def _write_index(self, index):
+        os.makedirs(self.directory, exist_ok=True)
+
+        def write(tmp):
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(index, f, ensure_ascii=False)
+
+        replace_atomically(self.index_path, write)
+
+    def _current_index(self, version):
+        index = self._read_index()
+        if index is None or index["source"] != _jsonable(version):
+            return None
+        return index
+
+    def is_current(self, version):
+        return self._current_index(version) is not None
+
+    def invalidate(self):
+        try:
+            os.remove(self.index_path)
+        except FileNotFoundError:
+            pass
+
+    def _write_partition(self, partition, rows):
+        """分割を rows（SHOT_COLUMNS の順の値の並び）で書き直す。"""
+        def write(tmp):
+            with open(tmp, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f, lineterminator="\n")
+                writer.writerow(SHOT_COLUMNS)
+                writer.writerows(rows)
+
+        with profiling.span(profiling.WRITE, self._path(partition)):
+            replace_atomically(self._path(partition), write)
+
+    @profiling.timed(profiling.COMPUTE, "ShotPartitions.rebuild")
+    def rebuild(self, shots, version):
+        """shots（書き戻し用の生の表、保存順）から分割をすべて作り直す。version はそのときの data_version()。"""
+        os.makedirs(self.directory, exist_ok=True)
+        self.invalidate()
+        # 試合IDごとに1回だけ日付を取り出し、分割ごとに（分割の中では保存順に）並べ替える
+        codes, match_ids = pd.factorize(shots["試合ID"])
+        part_codes, names = pd.factorize(np.array([partition_of(m) for m in match_ids] + [UNDATED], dtype=object)[codes])
+        order = np.argsort(part_codes, kind="stable")
+        bounds = np.searchsorted(part_codes[order], np.arange(len(names) + 1)).tolist()
+        # pandas の to_csv より、値のリストを csv.writer で書くほうが速い
+        table = shots.reindex(columns=SHOT_COLUMNS)
+        rows = list(zip(*(table[col].astype(object).where(table[col].notna(), "").to_numpy()[order].tolist() for col in SHOT_COLUMNS)))
+        counts = {}
+        for i, partition in enumerate(names):
+            self._write_partition(partition, rows[bounds[i]:bounds[i + 1]])
+            counts[partition] = bounds[i + 1] - bounds[i]
+        for name in os.listdir(self.directory):
+            if name.endswith(".csv") and name[:-4] not in counts:
+                os.remove(os.path.join(self.directory, name))
+        self._write_index({"version": VERSION, "source": _jsonable(version), "partitions": counts})
+
+    def add_shots(self, rows, before, after):
+        """shots.csv への追記（rows は SHOT_COLUMNS の順のリスト）に合わせて、各分割の末尾に追記する。
+
+        before / after は追記の前後の data_version()。分割が before に対応していなければ何もしない（次の読み込みで作り直す）。
+        """
+        index = self._current_index(before)
+        if index is None:
+            return
+        by_partition = {}
+        for row in rows:
+            by_partition.setdefault(partition_of(row[0]), []).append(row)
+        for partition, part_rows in by_partition.items():
+            path = self._path(partition)
+            new = not os.path.exists(path)
+            with open(path, "a", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f, lineterminator="\n")
+                if new:
+                    writer.writerow(SHOT_COLUMNS)
+                writer.writerows(["" if v is None else v for v in row] for row in part_rows)
+            index["partitions"][partition] = index["partitions"].get(partition, 0) + len(part_rows)
+        index["source"] = _jsonable(after)
+        self._write_index(index)
+
+    def _rewrite(self, match_id, before, after, drop):
+        """match_id の分割を読み、drop(その分割の表) が返す行を除いて書き直す。"""
+        index = self._current_index(before)
+        if index is None:
+            return
+        partition = partition_of(match_id)
+        path = self._path(partition)
+        if os.path.exists(path):
+            df = profiling.read_csv(path, dtype=str, keep_default_na=False)
+            df = df.drop(index=drop(df))
+            if len(df):
+                self._write_partition(partition, df.itertuples(index=False, name=None))
+                index["partitions"][partition] = len(df)
+            else:
+                os.remove(path)
+                index["partitions"].pop(partition, None)
+        index["source"] = _jsonable(after)
+        self._write_index(index)
+
+    def remove_match(self, match_id, before, after):
+        self._rewrite(match_id, before, after, lambda df: df.index[df["試合ID"] == str(match_id)])
+
+    def remove_last_shot(self, match_id, player, before, after):
+        def last(df):
+            target = df["試合ID"] == str(match_id)
+            if player is not None:
+                target &= df["打った選手"] == str(player)
+            return df.index[target][-1:]
+
+        self._rewrite(match_id, before, after, last)
+
+    def touch(self, before, after):
+        """ショットの中身は変えずに shots.csv を書き直したとき（compact()）に、索引の版だけ進める。"""
+        index = self._current_index(before)
+        if index is not None:
+            index["source"] = _jsonable(after)
+            self._write_index(index)
+
+    def select(self, start=None, end=None):
+        """試合日が start〜end（YYYY-MM-DD、両端を含む。None は制限なし）の分割名。期間を指定すると UNDATED は含まない。"""
+        index = self._read_index() or {"partitions": {}}
+        names = sorted(index["partitions"])
+        if start is None and end is None:
+            return names
+        return [
+            name for name in names
+            if name != UNDATED and (start is None or name >= start) and (end is None or name <= end)
+        ]
+
+    def load(self, start=None, end=None):
+        """select() で選んだ分割のショットを型付き（schema.to_typed()）でつなげた表。
+
+        最後に読んだ期間の表だけをメモリに残す（期間を変えると、その期間の分割だけを読み直す）。
+        """
+        paths = [self._path(name) for name in self.select(start, end)]
+
+        def read():
+            # 分割ごとに read_csv して concat するより、ヘッダーを除いてつなげたものを1回で読むほうが速い
+            buf = io.BytesIO()
+            buf.write((",".join(SHOT_COLUMNS) + "\n").encode("utf-8"))
+            for path in paths:
+                with open(path, "rb") as f:
+                    f.readline()
+                    data = f.read()
+                buf.write(data if not data or data.endswith(b"\n") else data + b"\n")
+            buf.seek(0)
+            with profiling.span(profiling.READ, self.directory, buf.getbuffer().nbytes):
+                return schema.to_typed(pd.read_csv(buf, dtype=schema.CSV_DTYPES))
+
+        return data_access.cached(("csv-partitions", self.directory), (start, end) + data_access.file_signature(*paths), read)
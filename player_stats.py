@@ -0,0 +1,284 @@
+import contextlib
+import json
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+import analytics
+import data_access
+import profiling
+
+COUNT_COLUMNS = ["選手"] + analytics.COUNT_COLUMNS + ["件数"]
+
+# これ以上の件数をまとめて追加するときは1行ずつではなく集計してから足し込む
+_BATCH_SIZE = 1000
+# ジャーナルがスナップショットのこの倍率（かつ _FOLD_MIN_BYTES）を超えたら畳み込む。
+# 畳み込みはスナップショットの大きさに比例するが、その間隔も比例して伸びるので1件あたりは一定
+_FOLD_RATIO = 0.5
+_FOLD_MIN_BYTES = 1 << 20
+
+
+def _count_key(shot):
+    return ",".join(analytics.normalize(shot[col], col) for col in analytics.COUNT_COLUMNS)
+
+
+def _bump(counts, key, n):
+    key = str(key)
+    counts[key] = counts.get(key, 0) + n
+    if counts[key] <= 0:
+        del counts[key]
+
+
+def _shot_delta(shots, sign):
+    """shots（dict のリスト）を足す（sign=1）・引く（sign=-1）差分。"""
+    counts, matches = {}, {}
+    for shot in shots:
+        player = shot["打った選手"]
+        if not pd.isna(player):
+            key = (player, _count_key(shot))
+            counts[key] = counts.get(key, 0) + sign
+            key = (player, str(shot["試合ID"]))
+            matches[key] = matches.get(key, 0) + sign
+    return {
+        "n": sign * len(shots),
+        "counts": [[player, key, n] for (player, key), n in counts.items()],
+        "試合": [[player, match_id, n] for (player, match_id), n in matches.items()],
+    }
+
+
+# 列ごとの 値 → カテゴリコード（analytics.tidy_counts() のカテゴリの順。末尾は UNKNOWN）
+_CODES = {
+    col: {value: i for i, value in enumerate(analytics.CATEGORIES[col] + [analytics.UNKNOWN])}
+    for col in analytics.COUNT_COLUMNS
+}
+
+
+def _player_columns(player, counts):
+    """1選手分の件数（{"打点,着地,ショット,結果": 件数}）を COUNT_COLUMNS の順の列（numpy 配列、分類の列はコード）にする。"""
+    keys = [key.split(",") for key in counts]
+    columns = [np.full(len(keys), player, dtype=object)]
+    for i, col in enumerate(analytics.COUNT_COLUMNS):
+        codes = _CODES[col]
+        columns.append(np.array([codes.get(key[i], len(codes) - 1) for key in keys], dtype=np.int8))
+    return columns + [np.fromiter(counts.values(), dtype=np.int64, count=len(counts))]
+
+
+class PlayerStatsStore:
+    """選手ごとの 打点 × 着地 × ショット × 結果 の件数を JSON に保持する。
+
+    ショットの記録・取り消しのたびに該当する件数だけを増減させるので、生のショットを読み直さずに済む。
+    保存は件数全体のスナップショット（path）と、その後の差分を1行ずつ追記するジャーナル（JSON Lines）に分ける。
+    記録・取り消しはジャーナルに1行足すだけなので、記録の量に関係なく一定コスト。
+    ジャーナルがスナップショットの _FOLD_RATIO 倍の大きさになったらスナップショットに畳み込み、次の番号のジャーナルに切り替える。
+    add_shots() / remove_shot() はショットを書き込むのと同じロックの中で呼ぶこと。
+    lock はそのロックを返す関数で、作り直しの間にショットが追記されないようにするのに使う。
+    """
+
+    def __init__(self, path, lock=contextlib.nullcontext):
+        self.path = path
+        self.lock = lock
+        self._data = None
+        self._signature = None
+        # ジャーナルのうち _data に当て終えたバイト数
+        self._offset = 0
+        self._frames = None
+        # 選手 → 件数表のその選手の部分の列（_player_columns()）
+        self._columns = {}
+
+    def _journal_path(self, generation):
+        return f"{os.path.splitext(self.path)[0]}.{generation}.jsonl"
+
+    def _load(self):
+        signature = data_access.file_signature(self.path)
+        if self._data is None or signature != self._signature:
+            self._data = None
+            if signature[0] is not None:
+                with open(self.path, encoding="utf-8") as f:
+                    self._data = json.load(f)
+                self._data.setdefault("generation", 0)
+            self._signature = signature
+            self._offset = 0
+            self._frames = None
+            self._columns = {}
+        if self._data is not None:
+            self._replay()
+        return self._data
+
+    def _replay(self):
+        """ジャーナルのうち、まだ当てていない行を当てる（別のプロセスが追記した行も含む）。"""
+        try:
+            with open(self._journal_path(self._data["generation"]), "rb") as f:
+                f.seek(self._offset)
+                chunk = f.read()
+        except FileNotFoundError:
+            return
+        # 書きかけの最後の行は次に読むときに当てる
+        end = chunk.rfind(b"\n") + 1
+        try:
+            for line in chunk[:end].splitlines():
+                self._apply(json.loads(line))
+        except ValueError:
+            # 壊れた行があれば、次に件数を使うときに作り直す
+            self._data = None
+            self._signature = None
+            return
+        self._offset += end
+
+    def _apply(self, delta):
+        players = self._data["players"]
+        for field in ["counts", "試合"]:
+            for player, key, n in delta[field]:
+                _bump(players.setdefault(player, {"counts": {}, "試合": {}})[field], key, n)
+        for player in {row[0] for row in delta["counts"] + delta["試合"]}:
+            if player in players and not players[player]["counts"]:
+                del players[player]
+        self._data["shot_count"] += delta["n"]
+        self._frames = None
+        for player in {row[0] for row in delta["counts"]}:
+            self._columns.pop(player, None)
+
+    def _write(self, delta):
+        """delta を当て、ジャーナルに1行追記する。ジャーナルが大きくなっていればスナップショットに畳み込む。"""
+        self._apply(delta)
+        line = (json.dumps(delta, ensure_ascii=False) + "\n").encode("utf-8")
+        with open(self._journal_path(self._data["generation"]), "ab") as f:
+            f.write(line)
+        self._offset += len(line)
+        if self._offset >= max(_FOLD_MIN_BYTES, self._signature[0][1] * _FOLD_RATIO):
+            self._save()
+
+    def _save(self):
+        """件数全体をスナップショットに書き、次の番号の（空の）ジャーナルに切り替えて古いジャーナルを消す。"""
+        old = self._data.get("generation")
+        self._data["generation"] = 0 if old is None else old + 1
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            # json.dump はファイルへ少しずつ書くため遅い。C実装の dumps で一度に書く
+            f.write(json.dumps(self._data, ensure_ascii=False))
+        os.replace(tmp, self.path)
+        self._signature = data_access.file_signature(self.path)
+        self._offset = 0
+        # 新しい番号のジャーナルはまだ何も書いていないので、残っているジャーナルはすべて古い
+        self._remove_journals()
+
+    def _remove_journals(self):
+        root = os.path.basename(os.path.splitext(self.path)[0])
+        pattern = re.compile(re.escape(root) + r"\.(\d+)\.jsonl$")
+        directory = os.path.dirname(self.path) or "."
+        for name in os.listdir(directory):
+            found = pattern.match(name)
+            if found:
+                try:
+                    os.remove(os.path.join(directory, name))
+                except FileNotFoundError:
+                    pass
+
+    def add_shots(self, shots):
+        if self._load() is None:
+            return
+        shots = list(shots)
+        if len(shots) < _BATCH_SIZE:
+            self._write(_shot_delta(shots, 1))
+        else:
+            self._write(self._frame_delta(pd.DataFrame(shots), 1))
+
+    def _frame_delta(self, shots, sign):
+        """shots（DataFrame）を集計してから作る差分。引くときに保存済みの件数より多くなるなら None。"""
+        counts = analytics.tidy_counts(shots)
+        delta = {
+            "n": sign * len(shots),
+            "counts": [[str(row[0]), ",".join(row[1:5]), sign * int(row[5])] for row in counts.itertuples(index=False)],
+            "試合": [
+                [str(player), str(match_id), sign * int(n)]
+                for (player, match_id), n in shots.groupby(["打った選手", "試合ID"], sort=False, observed=True).size().items()
+            ],
+        }
+        if sign < 0:
+            players = self._data["players"]
+            for player, key, n in delta["counts"]:
+                if players.get(player, {}).get("counts", {}).get(key, 0) < -n:
+                    return None
+        return delta
+
+    def remove_shot(self, shot):
+        data = self._load()
+        if data is None:
+            return
+        if _count_key(shot) not in data["players"].get(shot["打った選手"], {}).get("counts", {}):
+            self.invalidate()
+            return
+        self._write(_shot_delta([shot], -1))
+
+    def remove_shots(self, shots):
+        """shots（DataFrame）の分を引く。試合の削除などでまとめて消すときに使う。"""
+        if self._load() is None:
+            return
+        delta = self._frame_delta(shots, -1)
+        if delta is None:
+            # 保存済みの件数より多くは引けない。合わなければ作り直す
+            self.invalidate()
+            return
+        self._write(delta)
+
+    def invalidate(self):
+        self._data = None
+        self._signature = None
+        self._frames = None
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        self._remove_journals()
+
+    @profiling.timed(profiling.COMPUTE, "PlayerStatsStore.rebuild")
+    def rebuild(self, shots):
+        players = {}
+        counts = analytics.tidy_counts(shots)
+        for row in counts.itertuples(index=False):
+            entry = players.setdefault(row[0], {"counts": {}, "試合": {}})
+            entry["counts"][",".join(row[1:5])] = int(row[5])
+        matches = shots.groupby(["打った選手", "試合ID"], sort=False, observed=True).size()
+        for (player, match_id), n in matches.items():
+            players[player]["試合"][str(match_id)] = int(n)
+        generation = None if self._data is None else self._data.get("generation")
+        self._data = {"shot_count": len(shots), "players": players, "generation": generation}
+        self._frames = None
+        self._columns = {}
+        self._save()
+
+    def _ensure(self, shot_count, load_shots):
+        data = self._load()
+        if data is None or data["shot_count"] != shot_count:
+            with self.lock():
+                # ロックを待つ間に別のプロセスが更新していれば、作り直さずに済む
+                data = self._load()
+                if data is None or data["shot_count"] != shot_count:
+                    self.rebuild(load_shots())
+        if self._frames is None:
+            players = self._data["players"]
+            # 選手ごとの列は、その選手の件数が変わるまで使い回す
+            for player in players.keys() - self._columns.keys():
+                self._columns[player] = _player_columns(player, players[player]["counts"])
+            parts = [self._columns[player] for player in players]
+            columns = [np.concatenate([part[i] for part in parts]) for i in range(len(COUNT_COLUMNS))] if parts else [
+                np.array([], dtype=object)] + [np.array([], dtype=np.int8)] * len(analytics.COUNT_COLUMNS) + [np.array([], dtype=np.int64)]
+            # analytics.tidy_counts() と同じく分類の列はカテゴリ型にする
+            counts = pd.DataFrame({"選手": columns[0], "件数": columns[-1]})
+            for i, col in enumerate(analytics.COUNT_COLUMNS, start=1):
+                counts.insert(i, col, pd.Categorical.from_codes(columns[i], analytics.CATEGORIES[col] + [analytics.UNKNOWN]))
+            matches = pd.Series({player: len(entry["試合"]) for player, entry in self._data["players"].items()}, dtype="int64")
+            self._frames = (counts, matches)
+        return self._frames
+
+    def counts(self, shot_count, load_shots):
+        """analytics.tidy_counts() と同じ形の件数表。保存済みの件数が shot_count と合わなければ load_shots() から作り直す。"""
+        return self._ensure(shot_count, load_shots)[0]
+
+    def metrics(self, shot_count, load_shots):
+        """選手ごとの指標（analytics.metrics_from_counts()）に 試合数 を加えたもの。"""
+        counts, matches = self._ensure(shot_count, load_shots)
+        metrics = analytics.metrics_from_counts(counts)
+        metrics["試合数"] = matches.reindex(metrics.index, fill_value=0)
+        return metrics
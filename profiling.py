@@ -0,0 +1,134 @@
+"""再実行ごとの処理時間の計測。
+
+読み込み・書き込み（CSV / SQLite）、集計、描画を span() または timed() で囲むと、
+その再実行の記録に (種類, 名前, 時間, バイト数) が残る。
+begin_rerun() / end_rerun() をスクリプトの先頭と末尾で呼び、終わった再実行は直近 HISTORY_SIZE 件を保持する。
+環境変数 BADMINTON_PROFILE_LOG にファイル名を指定すると、再実行のたびに JSON Lines で追記する。
+"""
+import contextlib
+import datetime
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import pandas as pd
+
+HISTORY_SIZE = 100
+LOG_PATH = os.environ.get("BADMINTON_PROFILE_LOG")
+
+# 種類（表示順）
+READ, WRITE, COMPUTE, RENDER, PAGE = "読み込み", "書き込み", "計算", "描画", "ページ"
+KINDS = [READ, WRITE, COMPUTE, RENDER, PAGE]
+
+history = deque(maxlen=HISTORY_SIZE)
+_history_lock = threading.Lock()
+# 再実行は Streamlit のセッションごとに別のスレッドで動くので、記録中の再実行はスレッドごとに持つ
+_local = threading.local()
+
+
+def begin_rerun():
+    """スクリプトの先頭で呼ぶ。このスレッドでの記録を始める。"""
+    _local.rerun = {"開始": datetime.datetime.now().isoformat(timespec="seconds"), "t0": time.perf_counter(), "records": []}
+    _local.stack = []
+    return _local.rerun
+
+
+def end_rerun(page=""):
+    """スクリプトの末尾で呼ぶ。記録を閉じて history に加え、その再実行の記録を返す。"""
+    rerun = getattr(_local, "rerun", None)
+    if rerun is None:
+        return None
+    _local.rerun = None
+    rerun["ページ"] = page
+    rerun["合計ms"] = round((time.perf_counter() - rerun.pop("t0")) * 1000, 2)
+    with _history_lock:
+        history.append(rerun)
+    if LOG_PATH:
+        with open(LOG_PATH, "a", encoding="utf-8") as f:
+            f.write(json.dumps(rerun, ensure_ascii=False) + "\n")
+    return rerun
+
+
+@contextlib.contextmanager
+def span(kind, name, nbytes=None):
+    """囲んだ処理の時間を記録する。バイト数は後から record["bytes"] に入れてもよい。
+
+    同じ種類の span の中で呼ばれたものは nested=True になり、種類ごとの合計には数えない。
+    """
+    rerun = getattr(_local, "rerun", None)
+    record = {"kind": kind, "name": str(name), "ms": 0.0, "bytes": nbytes}
+    if rerun is None:
+        yield record
+        return
+    record["nested"] = kind in _local.stack
+    _local.stack.append(kind)
+    t0 = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record["ms"] = round((time.perf_counter() - t0) * 1000, 3)
+        _local.stack.pop()
+        rerun["records"].append(record)
+
+
+def timed(kind, name=None):
+    """関数を span() で囲むデコレータ。名前を省略すると関数名。"""
+    def decorator(fn):
+        label = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(kind, label):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _size(path):
+    try:
+        return os.path.getsize(path)
+    except (OSError, TypeError):
+        return None
+
+
+def read_csv(path, **kwargs):
+    """pd.read_csv() と同じ。読み込んだファイルの時間とサイズを記録する。"""
+    with span(READ, path, _size(path)):
+        return pd.read_csv(path, **kwargs)
+
+
+def to_csv(df, path, **kwargs):
+    """df.to_csv(path) と同じ。書き込んだ時間とサイズを記録する。"""
+    with span(WRITE, path) as record:
+        df.to_csv(path, **kwargs)
+        record["bytes"] = _size(path)
+
+
+def summary(rerun):
+    """再実行の記録を種類ごとに合計した表（列: 時間(ms), バイト数, 回数）。"""
+    records = [r for r in rerun["records"] if not r.get("nested")]
+    if not records:
+        return pd.DataFrame(columns=["時間(ms)", "バイト数", "回数"])
+    frame = pd.DataFrame(records)
+    table = frame.groupby("kind", sort=False).agg(**{
+        "時間(ms)": ("ms", "sum"),
+        "バイト数": ("bytes", lambda b: int(b.fillna(0).sum())),
+        "回数": ("ms", "size"),
+    })
+    return table.reindex([k for k in KINDS if k in table.index])
+
+
+def to_jsonl(reruns=None):
+    """再実行の記録（省略すると history）を JSON Lines の文字列にする。"""
+    if reruns is None:
+        with _history_lock:
+            reruns = list(history)
+    return "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in reruns)
+
+
+def export_jsonl(path, reruns=None):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(to_jsonl(reruns))
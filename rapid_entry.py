@@ -0,0 +1,78 @@
+"""高速入力: ラリーを短いコードでまとめて入力し、ラリーの終わりに一度に記録する。
+
+1球は「打った選手の番号・打点・着地・ショット・結果」を続けて書く（例: 1RRLFs、最後の1球は 3CMRF+）。
+球と球の間は空白・カンマ・改行のどれでもよく、大文字・小文字は区別しない。
+- 選手の番号は試合の選手一覧の順（1 から）
+- 打点・着地は AREAS の2文字
+- ショットは SHOT_CODES の1文字
+- 結果は RESULT_CODES の記号で、付けなければ 続行
+レシーバーは同じラリーの次の球を打った選手になる（ラリーの最後の球は空欄）。
+"""
+import copy
+import re
+
+import match_state
+from schema import AREAS, SHOT_COLUMNS
+
+SHOT_CODES = {
+    "c": "クリア",
+    "s": "スマッシュ",
+    "d": "ドロップ",
+    "l": "ロングリターン",
+    "r": "ショートリターン",
+    "v": "ドライブ",
+    "b": "ロブ",
+    "p": "プッシュ",
+    "h": "ヘアピン",
+}
+RESULT_CODES = {"": "続行", "+": "得点", "-": "ミス", "x": "アウト"}
+
+_TOKEN = re.compile(r"^(\d)([A-Z]{2})([A-Z]{2})([A-Z])([+\-X]?)$")
+_SEPARATORS = re.compile(r"[\s,、]+")
+
+
+def parse(text, players):
+    """入力を1球ずつの dict（打った選手・打点・着地・ショット・結果）のリストにする。
+
+    players は番号順の選手名。読めない球があれば (None, エラーのリスト) を返す。
+    """
+    shots, errors = [], []
+    for i, token in enumerate(t for t in _SEPARATORS.split(text.strip()) if t):
+        m = _TOKEN.match(token.upper())
+        if m is None:
+            errors.append(f"{i + 1}球目「{token}」: 形式が違います（例: 1RRLFs）")
+            continue
+        number, start, end, shot, result = m.groups()
+        problems = []
+        if not 1 <= int(number) <= len(players):
+            problems.append(f"選手の番号は 1〜{len(players)}")
+        problems += [f"{area} はエリアではありません" for area in (start, end) if area not in AREAS]
+        if shot.lower() not in SHOT_CODES:
+            problems.append(f"ショット「{shot.lower()}」はありません")
+        if problems:
+            errors.append(f"{i + 1}球目「{token}」: " + "、".join(problems))
+            continue
+        shots.append({
+            "打った選手": players[int(number) - 1],
+            "打点": start,
+            "着地": end,
+            "ショット": SHOT_CODES[shot.lower()],
+            "結果": RESULT_CODES[result.lower()],
+        })
+    return (None, errors) if errors else (shots, [])
+
+
+def to_rows(match_id, shots, state):
+    """試合の今の状態 state に続けて shots を記録するときの行（SHOT_COLUMNS の順）と、記録後の状態。
+
+    ラリー番号・ショット順は state から数え、state 自体は変更しない。返す状態で記録前にスコアを表示できる。
+    """
+    state = copy.deepcopy(state)
+    rows = []
+    for i, shot in enumerate(shots):
+        ends_rally = shot["結果"] in match_state.RALLY_END_RESULTS
+        nxt = shots[i + 1] if i + 1 < len(shots) and not ends_rally else None
+        row = dict(shot, 試合ID=match_id, ラリー番号=state["rally_no"], ショット順=state["shot_order"], レシーバー=nxt["打った選手"] if nxt else "")
+        match_state.apply(state, row)
+        rows.append([row[col] for col in SHOT_COLUMNS])
+    return rows, state
@@ -0,0 +1,201 @@
+"""選手ごとのシーズンレポート（HTML / PNG）をまとめて書き出す。
+
+    python reports.py [--out reports] [--format html png] [--workers 4] [--start 2025-04-01 --end 2025-06-30] [--players 選手A 選手B] [--backend csv|sqlite]
+
+ショットは親プロセスで1回だけ読み、選手 × 打点 × 着地 × ショット × 結果 の件数（analytics.tidy_counts()）と
+選手ごとの指標にまとめる。ワーカー（ProcessPoolExecutor）にはそれを初期化のときに1回だけ渡し、
+選手ごとにデータ解析の画面と同じ図（charts.py のレーダーチャート・後衛ショットの円グラフ、heatmap.py のミス打点）を描いて書き出す。
+
+HTML は1選手1ファイル（Plotly の JavaScript は CDN から読む）と、全選手へのリンクの index.html。
+PNG はミス打点のヒートマップと、Kaleido が入っていればレーダーチャートと円グラフ。
+"""
+import argparse
+import datetime
+import importlib.util
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from html import escape
+
+import pandas as pd
+
+import analytics
+import charts
+import heatmap
+import storage
+
+FORMATS = ["html", "png"]
+# Plotly の図を PNG にするには Kaleido が要る
+HAS_KALEIDO = importlib.util.find_spec("kaleido") is not None
+
+# ワーカーごとに1回だけ受け取る集計（_init_worker() を参照）
+_shared = {}
+
+
+def file_stem(player):
+    """選手名をファイル名に使える形にする。"""
+    return re.sub(r'[\\/:*?"<>|\s]', "_", str(player)) or "_"
+
+
+def _init_worker(counts, metrics, players):
+    # 選手ごとの行の位置を1回だけ求めておき、選手ごとに件数の表全体を絞り込まない
+    positions = counts.groupby("選手", observed=True, sort=False).indices
+    _shared.update(counts=counts, positions=positions, metrics=metrics, players=players)
+
+
+def _player_counts(player):
+    return _shared["counts"].iloc[_shared["positions"].get(player, [])]
+
+
+def _player_info(player):
+    info = _shared["players"]
+    row = info[info["名前"] == player]
+    if row.empty:
+        return {"チーム": "-", "利き手": "-"}
+    return {col: ("-" if pd.isna(row.iloc[0][col]) else row.iloc[0][col]) for col in ["チーム", "利き手"]}
+
+
+def _figures(player):
+    """選手の図（名前 → Plotly の Figure）と、ミス打点の 3×3 の件数。"""
+    counts, m = _player_counts(player), _shared["metrics"].loc[player]
+    figures = {"レーダーチャート": charts.radar_figure(m, charts.ANALYSIS_RADAR, player, height=400)}
+    if m["後衛"] > 0:
+        figures["後衛からのショット"] = charts.rear_pie_figure(analytics.rear_shot_counts(counts, player), m["総ショット数"])
+    return figures, heatmap.court_grid(analytics.miss_area_counts(counts, player))
+
+
+def _html(player, title, figures, grid):
+    m = _shared["metrics"].loc[player]
+    info = _player_info(player)
+    rows = [
+        ("チーム", info["チーム"]), ("利き手", info["利き手"]), ("試合数", int(m["試合数"])),
+        ("総ショット数", int(m["総ショット数"])), ("得点率", f"{m['得点率'] * 100:.1f}%"), ("ミス率", f"{m['ミス率'] * 100:.1f}%"),
+        ("ドロップ率（後衛）", f"{m['ドロップ率（後衛）'] * 100:.1f}%"), ("スマッシュ率（後衛）", f"{m['スマッシュ率（後衛）'] * 100:.1f}%"),
+        ("クロス選択率（後衛）", f"{m['クロス選択率（後衛）'] * 100:.1f}%"),
+    ]
+    parts = [
+        f"<!DOCTYPE html><html lang='ja'><head><meta charset='utf-8'><title>{escape(str(player))}</title>",
+        "<style>body{font-family:sans-serif;max-width:900px;margin:24px auto}table{border-collapse:collapse}"
+        "td,th{border:1px solid #ccc;padding:4px 12px;text-align:left}section{page-break-inside:avoid}</style></head><body>",
+        f"<h1>🏸 {escape(str(player))}</h1><p>{escape(title)}</p><table>",
+        *(f"<tr><th>{escape(k)}</th><td>{escape(str(v))}</td></tr>" for k, v in rows),
+        "</table>",
+    ]
+    for i, (name, fig) in enumerate(figures.items()):
+        parts.append(f"<section><h2>{escape(name)}</h2>{fig.to_html(full_html=False, include_plotlyjs='cdn' if i == 0 else False)}</section>")
+    if "後衛からのショット" not in figures:
+        parts.append("<section><h2>後衛からのショット</h2><p>後衛エリアからのショットデータがありません。</p></section>")
+    parts.append(f"<section><h2>ミスが発生した打点エリア</h2>{heatmap.render_svg(grid, f'{player} のミス発生打点分布')}</section>")
+    parts.append("</body></html>")
+    return "".join(parts)
+
+
+def render_player(player, out_dir, formats, title):
+    """1選手分のレポートを書き出す。(選手, 秒, プロセスID, 書き出したファイル) を返す。"""
+    t0 = time.perf_counter()
+    stem = file_stem(player)
+    figures, grid = _figures(player)
+    written = []
+    if "html" in formats:
+        path = os.path.join(out_dir, stem + ".html")
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(_html(player, title, figures, grid))
+        written.append(path)
+    if "png" in formats:
+        path = os.path.join(out_dir, f"{stem}_ミス打点.png")
+        with open(path, "wb") as f:
+            f.write(heatmap.render_png(grid, f"{player} のミス発生打点分布"))
+        written.append(path)
+        if HAS_KALEIDO:
+            for name, fig in figures.items():
+                path = os.path.join(out_dir, f"{stem}_{name}.png")
+                fig.write_image(path)
+                written.append(path)
+    return player, time.perf_counter() - t0, os.getpid(), written
+
+
+def load(backend, period=None):
+    """レポートのもとになる集計（件数・選手ごとの指標・選手の表）を、ショットを1回だけ読んで求める。"""
+    if period is None:
+        counts, metrics = backend.load_player_counts(), backend.load_player_metrics()
+    else:
+        shots = backend.load_shots_between(*period)
+        counts = analytics.tidy_counts(shots)
+        metrics = analytics.metrics_from_counts(counts)
+        metrics["試合数"] = analytics.matches_played(shots).reindex(metrics.index, fill_value=0)
+    return counts, metrics, backend.load_players()
+
+
+def write_index(out_dir, title, results):
+    links = "".join(
+        f"<li><a href='{escape(file_stem(player))}.html'>{escape(str(player))}</a></li>" for player in sorted(results)
+    )
+    with open(os.path.join(out_dir, "index.html"), "w", encoding="utf-8") as f:
+        f.write(f"<!DOCTYPE html><html lang='ja'><head><meta charset='utf-8'><title>{escape(title)}</title></head>"
+                f"<body style='font-family:sans-serif'><h1>{escape(title)}</h1><ul>{links}</ul></body></html>")
+
+
+def export(backend, out_dir, formats=("html",), workers=None, period=None, players=None, log=print):
+    """全選手（players を指定するとその選手）のレポートを out_dir に書き出し、選手 → 秒 の dict を返す。
+
+    workers が 1 のときはプロセスを作らずにこのプロセスで順に描く（並列化の効果を比べるため）。
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    t0 = time.perf_counter()
+    counts, metrics, player_table = load(backend, period)
+    targets = [p for p in metrics.index if players is None or p in players]
+    for player in sorted(set(players or []) - set(targets)):
+        log(f"{player} の記録がありません。")
+    log(f"集計の読み込み: {time.perf_counter() - t0:.2f} 秒（{len(targets)} 人）")
+    title = "全期間" if period is None else f"{period[0]}〜{period[1]}"
+    title = f"シーズンレポート（{title}）"
+
+    results = {}
+
+    def done(result):
+        player, seconds, pid, written = result
+        results[player] = seconds
+        log(f"  {player}: {seconds * 1000:.0f} ms（pid {pid}、{len(written)} ファイル）")
+
+    shared = (counts, metrics, player_table)
+    t1 = time.perf_counter()
+    if workers == 1:
+        _init_worker(*shared)
+        for player in targets:
+            done(render_player(player, out_dir, formats, title))
+    else:
+        # 集計はワーカーの起動時に1回だけ渡し、選手ごとの仕事には選手名だけを渡す
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=shared) as pool:
+            for future in as_completed([pool.submit(render_player, p, out_dir, formats, title) for p in targets]):
+                done(future.result())
+    if "html" in formats:
+        write_index(out_dir, title, results)
+    elapsed = time.perf_counter() - t0
+    log(f"完了: {len(results)} 人を {elapsed:.2f} 秒（描画 {time.perf_counter() - t1:.2f} 秒、"
+        f"選手ごとの合計 {sum(results.values()):.2f} 秒）")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="選手ごとのレポート（HTML / PNG）をまとめて書き出す")
+    parser.add_argument("--out", default="reports", help="書き出すディレクトリ")
+    parser.add_argument("--format", nargs="+", choices=FORMATS, default=["html"])
+    parser.add_argument("--workers", type=int, help="プロセス数（省略時は CPU 数、1 なら並列にしない）")
+    parser.add_argument("--start", type=datetime.date.fromisoformat, help="期間の開始日（YYYY-MM-DD）")
+    parser.add_argument("--end", type=datetime.date.fromisoformat, help="期間の終了日（YYYY-MM-DD）")
+    parser.add_argument("--players", nargs="+", help="書き出す選手（省略時は全員）")
+    parser.add_argument("--backend", choices=["csv", "sqlite"], default=storage.STORAGE_BACKEND)
+    args = parser.parse_args()
+
+    if (args.start is None) != (args.end is None):
+        sys.exit("--start と --end は両方指定してください。")
+    if "png" in args.format and not HAS_KALEIDO:
+        print("Kaleido がないため、PNG はミス打点のヒートマップだけを書き出します（pip install kaleido）。")
+    period = None if args.start is None else (args.start, args.end)
+    export(storage.get_backend(args.backend), args.out, args.format, args.workers, period, args.players)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+import argparse
+import importlib.util
+import os
+
+import numpy as np
+import pandas as pd
+
+import profiling
+
+PLAYER_COLUMNS = ["名前", "利き手", "チーム"]
+MATCH_COLUMNS = ["試合ID", "試合形式", "選手名", "チーム"]
+SHOT_COLUMNS = ["試合ID", "ラリー番号", "ショット順", "打った選手", "打点", "着地", "ショット", "結果", "レシーバー"]
+
+AREAS = ["RR", "CR", "LR", "RM", "CM", "LM", "RF", "CF", "LF"]
+SHOT_TYPES = ["クリア", "スマッシュ", "ドロップ", "ロングリターン", "ショートリターン", "ドライブ", "ロブ", "プッシュ", "ヘアピン"]
+RESULTS = ["続行", "得点", "ミス", "アウト"]
+
+# 値の種類が決まっている列。定義外の値は欠損になる
+ENUM_DTYPES = {
+    "打点": pd.CategoricalDtype(AREAS),
+    "着地": pd.CategoricalDtype(AREAS),
+    "ショット": pd.CategoricalDtype(SHOT_TYPES),
+    "結果": pd.CategoricalDtype(RESULTS),
+}
+# 試合ID・選手名は出現した値で辞書化する
+ID_COLUMNS = ["試合ID", "打った選手", "レシーバー"]
+COUNTER_COLUMNS = ["ラリー番号", "ショット順"]
+COUNTER_DTYPE = "Int16"
+# COUNTER_DTYPE に入る最大値。これより大きいラリー番号・ショット順は保存しない（validate_shots()）
+COUNTER_MAX = int(np.iinfo(np.int16).max)
+
+CSV_DTYPES = {**ENUM_DTYPES, **{col: "category" for col in ID_COLUMNS}}
+
+
+def to_typed(df):
+    """ショット表を型付きにする（列挙値・ID はカテゴリ、ラリー番号・ショット順は16ビット整数）。
+
+    読み取り・集計用。定義外の列挙値と、16ビットに入らないラリー番号・ショット順は欠損になるため、
+    この表をそのまま書き戻さないこと。
+    """
+    df = df.copy()
+    for col, dtype in ENUM_DTYPES.items():
+        if col in df.columns:
+            df[col] = df[col].astype(dtype)
+    for col in ID_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    for col in COUNTER_COLUMNS:
+        if col in df.columns:
+            n = pd.to_numeric(df[col], errors="coerce").round()
+            df[col] = n.where(n.abs() <= COUNTER_MAX).astype(COUNTER_DTYPE)
+    return df
+
+
+def read_shots_csv(path):
+    """shots.csv を型付きで読み込む。"""
+    df = profiling.read_csv(path, dtype=CSV_DTYPES)
+    return to_typed(df)
+
+
+def validate_shots(df):
+    """行ごとの不正な理由（正しい行は空文字）。
+
+    列挙値は AREAS / SHOT_TYPES / RESULTS のいずれか、ラリー番号・ショット順は1以上 COUNTER_MAX 以下の整数、
+    試合ID・打った選手は空でないこと。レシーバーは空でもよい。
+    """
+    reasons = pd.Series("", index=df.index, dtype=object)
+
+    def flag(mask, reason):
+        reasons[mask & (reasons == "")] = reason
+
+    for col in SHOT_COLUMNS:
+        if col not in df.columns and col != "レシーバー":
+            reasons[:] = f"{col} 列がない"
+            return reasons
+    for col in ["試合ID", "打った選手"]:
+        flag(df[col].isna() | (df[col].astype(str).str.strip() == ""), f"{col} が空")
+    for col in COUNTER_COLUMNS:
+        n = pd.to_numeric(df[col], errors="coerce")
+        flag(~((n >= 1) & (n <= COUNTER_MAX) & (n % 1 == 0)).fillna(False).astype(bool), f"{col} が1以上{COUNTER_MAX}以下の整数でない")
+    for col, dtype in ENUM_DTYPES.items():
+        flag(~df[col].isin(dtype.categories), f"{col} が不正")
+    return reasons
+
+
+def has_parquet():
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def _smallest_int(n):
+    for dtype in (np.int8, np.int16, np.int32):
+        if n < np.iinfo(dtype).max:
+            return dtype
+    return np.int64
+
+
+def save_compact(df, path):
+    """型付きのショット表をバイナリで保存する。拡張子 .parquet は Parquet（pyarrow が必要）、.npz は NumPy 形式。"""
+    df = to_typed(df)
+    if path.endswith(".parquet"):
+        if not has_parquet():
+            raise RuntimeError("Parquet で保存するには pyarrow をインストールしてください。")
+        df.to_parquet(path, index=False)
+        return
+    arrays = {}
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            categories = df[col].cat.categories
+            arrays[f"{col}.codes"] = df[col].cat.codes.to_numpy().astype(_smallest_int(len(categories)))
+            arrays[f"{col}.categories"] = np.array(categories.astype(str), dtype=np.str_)
+        else:
+            arrays[f"{col}.values"] = df[col].to_numpy(dtype=np.int16, na_value=0)
+            arrays[f"{col}.mask"] = df[col].isna().to_numpy()
+    arrays["columns"] = np.array(df.columns, dtype=np.str_)
+    with open(path, "wb") as f:
+        np.savez(f, **arrays)
+
+
+def load_compact(path):
+    if path.endswith(".parquet"):
+        if not has_parquet():
+            raise RuntimeError("Parquet を読み込むには pyarrow をインストールしてください。")
+        return to_typed(pd.read_parquet(path))
+    with np.load(path) as data:
+        frame = {}
+        for col in data["columns"]:
+            if f"{col}.codes" in data:
+                frame[col] = pd.Categorical.from_codes(data[f"{col}.codes"], categories=data[f"{col}.categories"])
+            else:
+                frame[col] = pd.arrays.IntegerArray(data[f"{col}.values"], data[f"{col}.mask"])
+    df = pd.DataFrame(frame)
+    for col, dtype in ENUM_DTYPES.items():
+        if col in df.columns:
+            df[col] = df[col].cat.set_categories(dtype.categories)
+    return df
+
+
+def compact_path(csv_path, fmt=None):
+    fmt = fmt or ("parquet" if has_parquet() else "npz")
+    return os.path.splitext(csv_path)[0] + "." + fmt
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ショットのCSVを型付きのバイナリ形式に変換する")
+    parser.add_argument("csv", nargs="?", default="shots.csv")
+    parser.add_argument("--format", choices=["parquet", "npz"])
+    args = parser.parse_args()
+    path = compact_path(args.csv, args.format)
+    save_compact(read_shots_csv(args.csv), path)
+    print(f"{args.csv} → {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+import profiling
+from analytics import CATEGORIES, UNKNOWN, category_codes
+
+MAX_N = 3
+
+# ショット種類のコード（定義外は UNKNOWN）。n-gram のキーは この基数で並べた整数
+_SHOT_LABELS = CATEGORIES["ショット"] + [UNKNOWN]
+_BASE = len(_SHOT_LABELS)
+
+# パターンで条件にできる列
+FIELDS = ["ショット", "打点", "着地", "結果", "打った選手", "レシーバー"]
+
+# 索引にない値のコード。欠損（-1）を含めどのショットとも一致しない
+_NOT_FOUND = -2
+
+
+def _label_codes(series, column):
+    if column in CATEGORIES:
+        return category_codes(series, CATEGORIES[column]), CATEGORIES[column] + [UNKNOWN]
+    codes, uniques = pd.factorize(series)
+    return codes.astype(np.int64), list(uniques)
+
+
+class SequenceIndex:
+    """ラリー（試合ID・ラリー番号）ごとにショット順に並べたショットの n-gram 索引。
+
+    n = 1..max_n のそれぞれについて、連続する n 球のショット種類を1つの整数キーにしてソートしておく。
+    パターンの検索はキーの範囲を二分探索で引き、打点・着地・選手などの条件は見つかった候補だけに当てる。
+    """
+
+    def __init__(self, shots, max_n=MAX_N):
+        self.max_n = max_n
+        rally_no = shots["ラリー番号"].astype("Float64").fillna(-1).to_numpy(dtype=np.int64)
+        order = shots["ショット順"].astype("Float64").fillna(-1).to_numpy(dtype=np.int64)
+        match_codes = pd.factorize(shots["試合ID"])[0]
+        perm = np.lexsort((order, rally_no, match_codes))
+
+        self.codes = {}
+        self.labels = {}
+        for col in FIELDS:
+            codes, labels = _label_codes(shots[col], col)
+            self.codes[col] = codes[perm]
+            self.labels[col] = labels
+        self.size = len(perm)
+
+        # 同じラリーの連続したショットには同じ番号を振る
+        match_sorted, rally_sorted = match_codes[perm], rally_no[perm]
+        new_rally = np.ones(len(perm), dtype=bool)
+        new_rally[1:] = (match_sorted[1:] != match_sorted[:-1]) | (rally_sorted[1:] != rally_sorted[:-1])
+        self.rally = np.cumsum(new_rally)
+
+        self.keys = {}
+        self.starts = {}
+        shot = self.codes["ショット"]
+        for n in range(1, max_n + 1):
+            starts = np.arange(max(self.size - n + 1, 0))
+            starts = starts[self.rally[starts + n - 1] == self.rally[starts]]
+            key = np.zeros(len(starts), dtype=np.int64)
+            for k in range(n):
+                key = key * _BASE + shot[starts + k]
+            sort = np.argsort(key, kind="stable")
+            self.keys[n] = key[sort]
+            self.starts[n] = starts[sort]
+
+        # 最後の1球の結果ごとの件数（結果 × n-gram キー）。選手を絞らない集計はここから引く
+        results = len(self.labels["結果"])
+        self.outcomes = {}
+        for n in range(1, max_n + 1):
+            last_result = self.codes["結果"][self.starts[n] + n - 1]
+            flat = np.bincount(last_result * _BASE ** n + self.keys[n], minlength=results * _BASE ** n)
+            self.outcomes[n] = flat.reshape(results, _BASE ** n)
+
+    def _code(self, column, value):
+        labels = self.labels[column]
+        return labels.index(value) if value in labels else _NOT_FOUND
+
+    def find(self, pattern):
+        """pattern に一致する n 球の並びの、先頭のショットの位置（索引内の順）。
+
+        pattern は1球ごとの条件の dict のリストで、キーは FIELDS の列名。指定しない列は何でもよい。
+        """
+        n = len(pattern)
+        if not 1 <= n <= self.max_n:
+            raise ValueError(f"パターンの長さは 1〜{self.max_n} 球にしてください。")
+        choices = []
+        for cond in pattern:
+            if "ショット" in cond:
+                choices.append([self._code("ショット", cond["ショット"])])
+            else:
+                choices.append(range(_BASE))
+        keys, starts = self.keys[n], self.starts[n]
+        found = []
+        for combo in itertools.product(*choices):
+            if _NOT_FOUND in combo:
+                continue
+            key = 0
+            for code in combo:
+                key = key * _BASE + code
+            lo, hi = np.searchsorted(keys, [key, key + 1])
+            found.append(starts[lo:hi])
+        found = np.sort(np.concatenate(found)) if found else np.zeros(0, dtype=np.int64)
+
+        for k, cond in enumerate(pattern):
+            for column, value in cond.items():
+                if column == "ショット":
+                    continue
+                found = found[self.codes[column][found + k] == self._code(column, value)]
+        return found
+
+    def next_shots(self, pattern, player=None):
+        """pattern の直後（同じラリー）のショットを ショット × 結果 で数える。player を指定するとその選手が打ったものだけ。"""
+        starts = self.find(pattern)
+        nxt = starts + len(pattern)
+        nxt = nxt[nxt < self.size]
+        nxt = nxt[self.rally[nxt] == self.rally[nxt - 1]]
+        if player is not None:
+            nxt = nxt[self.codes["打った選手"][nxt] == self._code("打った選手", player)]
+        table = pd.crosstab(
+            pd.Categorical.from_codes(self.codes["ショット"][nxt], _SHOT_LABELS),
+            pd.Categorical.from_codes(self.codes["結果"][nxt], self.labels["結果"]),
+            dropna=False,
+        )
+        table.index.name = "ショット"
+        table.columns.name = "結果"
+        if UNKNOWN in table.columns and not table[UNKNOWN].any():
+            table = table.drop(columns=UNKNOWN)
+        table["件数"] = table.sum(axis=1)
+        return table[table["件数"] > 0].sort_values("件数", ascending=False)
+
+    def top_sequences(self, n, result=None, player=None, limit=10):
+        """n 球の流れ（ショット種類の並び）ごとの件数。
+
+        result を指定すると最後の1球がその結果になったものを数え、その流れ全体に対する割合も出す。
+        player を指定すると最後の1球をその選手が打ったものだけ。
+        """
+        if player is None:
+            total = self.outcomes[n].sum(axis=0)
+            code = self._code("結果", result) if result is not None else _NOT_FOUND
+            hits = self.outcomes[n][code] if code >= 0 else (total if result is None else np.zeros_like(total))
+        else:
+            keys, starts = self.keys[n], self.starts[n]
+            last = starts + n - 1
+            mask = self.codes["打った選手"][last] == self._code("打った選手", player)
+            total = np.bincount(keys[mask], minlength=_BASE ** n)
+            if result is not None:
+                mask &= self.codes["結果"][last] == self._code("結果", result)
+            hits = np.bincount(keys[mask], minlength=_BASE ** n)
+
+        top = np.argsort(-hits, kind="stable")[:limit]
+        top = top[hits[top] > 0]
+        digits = np.stack([(top // _BASE ** (n - 1 - k)) % _BASE for k in range(n)], axis=1) if len(top) else np.zeros((0, n), dtype=np.int64)
+        frame = pd.DataFrame({
+            "パターン": [" → ".join(_SHOT_LABELS[c] for c in row) for row in digits],
+            "件数": hits[top],
+        })
+        if result is not None:
+            frame["全体"] = total[top]
+            frame["割合"] = frame["件数"] / frame["全体"]
+        return frame
+
+
+_index = None
+
+
+def index_for(backend):
+    """backend のショットから作った索引。データが変わっていなければ作り直さない。"""
+    global _index
+    version = backend.data_version()
+    if _index is None or _index[0] != version:
+        shots = backend.load_shots()
+        with profiling.span(profiling.COMPUTE, "SequenceIndex"):
+            _index = (version, SequenceIndex(shots))
+    return _index[1]
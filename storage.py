@@ -0,0 +1,840 @@
+import argparse
+import csv
+import datetime
+import io
+import itertools
+import os
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+import analytics
+import data_access
+import manifest
+import match_summary
+import profiling
+import schema
+from locking import locked, replace_atomically
+from match_state import MatchStateStore
+from match_summary import MatchSummaryStore
+from partitions import ShotPartitions
+from player_stats import PlayerStatsStore
+from schema import MATCH_COLUMNS, PLAYER_COLUMNS, SHOT_COLUMNS
+
+PLAYER_CSV = "players.csv"
+MATCH_CSV = "matches.csv"
+SHOT_CSV = "shots.csv"
+DB_PATH = os.environ.get("BADMINTON_DB", "badminton.db")
+PLAYER_STATS_JSON = "player_stats.json"
+MATCH_STATES_DIR = "match_states"
+MATCH_SUMMARIES_DIR = "match_summaries"
+SHOT_PARTITIONS_DIR = "shot_partitions"
+
+# "csv" か "sqlite"。環境変数 BADMINTON_STORAGE で切り替える
+STORAGE_BACKEND = os.environ.get("BADMINTON_STORAGE", "csv")
+
+TABLE_COLUMNS = {
+    "players": PLAYER_COLUMNS,
+    "matches": MATCH_COLUMNS,
+    "shots": SHOT_COLUMNS,
+}
+
+# 削除の目印（tombstone）。種類 "試合" は その試合IDの 行 番目までの行、"ショット" は 行 番目の1行を消す。
+# 行 はファイル内の行番号（ヘッダーを除いて0から）
+TOMBSTONE_COLUMNS = ["種類", "試合ID", "行"]
+# ショットを一意に決める列（bulk_import.py の重複判定に使う）
+SHOT_KEY_COLUMNS = ["試合ID"] + schema.COUNTER_COLUMNS
+# 目印がこの件数を超えたら、裏で compact() して実際に行を消す
+COMPACT_THRESHOLD = 1000
+
+
+def ensure_csv(path, columns):
+    if not os.path.exists(path):
+        manifest.create(path, columns)
+
+
+def check_files(player_csv=PLAYER_CSV, match_csv=MATCH_CSV, shot_csv=SHOT_CSV):
+    """CSV を目録（manifest.py）と照らし合わせ、古い形式なら移行する。行ったことの説明のリストを返す。
+
+    目録と合っていればファイルの中身は読まないので、データの量に関係なく一定コスト。
+    """
+    tables = {"players": player_csv, "matches": match_csv, "shots": shot_csv}
+    return manifest.check(tables, companions={table: [tombstone_path(path)] for table, path in tables.items()})
+
+
+def _ends_with_newline(path):
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        if f.tell() == 0:
+            return True
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) in (b"\n", b"\r")
+
+
+def append_rows(path, columns, rows, fsync=False, removed=None):
+    """rows をファイル末尾に追記する。既存の行は読み込まないため、件数に関係なく一定コスト。
+
+    複数の端末から同時に追記しても行が混ざったり失われたりしないよう、ファイルロックの中で1回の write にまとめる。
+    削除の目印を追記するときは、目印で消える行数を removed に渡す（目録に足し込み、今の行数を数えずに求められるようにする）。
+    """
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    for row in rows:
+        writer.writerow(["" if v is None else v for v in row])
+    ensure_csv(path, columns)
+    with locked(path):
+        if manifest.read_header(path) != columns:
+            manifest.upgrade(path, columns)
+        prefix = "" if _ends_with_newline(path) else "\n"
+        data = (prefix + buf.getvalue()).encode("utf-8")
+        with profiling.span(profiling.WRITE, path, len(data)), open(path, "ab") as f:
+            f.write(data)
+            if fsync:
+                f.flush()
+                os.fsync(f.fileno())
+        manifest.record(path, len(rows), appended=data, removed=removed)
+    data_access.invalidate(path)
+
+
+class ShotLog:
+    """shots.csv への追記専用ログ。fsync は fsync_every 件ごとにまとめて行う。"""
+
+    def __init__(self, path, fsync_every=1):
+        self.path = path
+        self.fsync_every = fsync_every
+        self._pending = 0
+
+    def append(self, row):
+        self.append_many([row])
+
+    def append_many(self, rows):
+        rows = list(rows)
+        self._pending += len(rows)
+        do_sync = self.fsync_every > 0 and self._pending >= self.fsync_every
+        append_rows(self.path, SHOT_COLUMNS, rows, fsync=do_sync)
+        if do_sync:
+            self._pending = 0
+
+
+_shot_logs = {}
+
+
+def shot_log(path, fsync_every=1):
+    # Streamlit の再実行をまたいで同じログを使い回す
+    if path not in _shot_logs:
+        _shot_logs[path] = ShotLog(path, fsync_every=fsync_every)
+    return _shot_logs[path]
+
+
+def tombstone_path(path):
+    return os.path.splitext(path)[0] + "_deleted.csv"
+
+
+def read_tombstones(path):
+    tomb = tombstone_path(path)
+    if not os.path.exists(tomb):
+        return pd.DataFrame(columns=TOMBSTONE_COLUMNS)
+    return profiling.read_csv(tomb, dtype={"種類": str, "試合ID": str, "行": "int64"})
+
+
+def drop_deleted(df, tombstones):
+    """tombstones で消された行を除く。df の index はファイル内の行番号であること。"""
+    if tombstones.empty or df.empty:
+        return df
+    match_ids = df["試合ID"]
+    positions = df.index.to_numpy()
+    hidden = np.zeros(len(df), dtype=bool)
+
+    matches = tombstones[tombstones["種類"] == "試合"]
+    if len(matches):
+        limits = matches.groupby("試合ID")["行"].max()
+        limit = pd.to_numeric(match_ids.map(limits).astype(object), errors="coerce").to_numpy(dtype=float, na_value=np.nan)
+        hidden |= positions <= np.nan_to_num(limit, nan=-1)
+
+    shots = tombstones[tombstones["種類"] == "ショット"]
+    if len(shots):
+        locs = df.index.get_indexer(shots["行"])
+        found = locs >= 0
+        # 行番号が同じでも試合IDが違えば（別の行なので）消さない
+        same = match_ids.iloc[locs[found]].astype(object).to_numpy() == shots["試合ID"].to_numpy()[found]
+        hidden[locs[found][same]] = True
+    return df[~hidden]
+
+
+def match_teams(matches, match_id):
+    """{選手名: チーム}。"""
+    rows = matches[matches["試合ID"] == match_id]
+    return {str(p): "" if pd.isna(t) else str(t) for p, t in zip(rows["選手名"], rows["チーム"]) if not pd.isna(p)}
+
+
+def _to_sql_value(v):
+    if pd.isna(v):
+        return None
+    # numpy の整数などは sqlite3 がそのまま扱えないため Python の値に戻す
+    return v.item() if hasattr(v, "item") else v
+
+
+class CsvBackend:
+    """players.csv / matches.csv / shots.csv をそのまま使う保存先。
+
+    試合の削除と記録の取り消しはファイルを書き直さず、*_deleted.csv に目印を追記する。
+    読み込み時に目印の付いた行を除き、compact() で実際にファイルから取り除く。
+    """
+
+    def __init__(self, player_csv=PLAYER_CSV, match_csv=MATCH_CSV, shot_csv=SHOT_CSV, stats_path=PLAYER_STATS_JSON, states_dir=None):
+        self.paths = {"players": player_csv, "matches": match_csv, "shots": shot_csv}
+        check_files(player_csv, match_csv, shot_csv)
+        self.player_stats = PlayerStatsStore(stats_path, lock=lambda: locked(shot_csv))
+        self.match_states = MatchStateStore(
+            states_dir or os.path.join(os.path.dirname(stats_path), MATCH_STATES_DIR),
+            lock=lambda: locked(shot_csv),
+        )
+        self.match_summaries = MatchSummaryStore(os.path.join(os.path.dirname(states_dir or stats_path), MATCH_SUMMARIES_DIR))
+        self.shot_partitions = ShotPartitions(os.path.join(os.path.dirname(states_dir or stats_path), SHOT_PARTITIONS_DIR))
+        self._compacting = set()
+
+    def _load_live(self, table, kind, read):
+        path = self.paths[table]
+        # 本体と目印を同じ時点で読むため、書き込みと同じロックを取る。
+        # 本体は目印と別にキャッシュするので、削除の後は目印を当て直すだけで済む
+        with locked(path):
+            df = data_access.cached((kind + "-all", path), data_access.file_signature(path), lambda: read(path))
+            return data_access.cached(
+                (kind, path),
+                data_access.file_signature(path, tombstone_path(path)),
+                lambda: drop_deleted(df, read_tombstones(path)),
+            )
+
+    def load_table(self, table):
+        return self._load_live(table, "csv-live", profiling.read_csv)
+
+    def save_table(self, table, df):
+        path = self.paths[table]
+        with locked(path):
+            # 書き直した後のファイルに古い目印が当たらないよう、先に目印を消す
+            self._remove_tombstones(path)
+            replace_atomically(path, lambda tmp: profiling.to_csv(df, tmp, index=False))
+            manifest.record(path, len(df))
+            data_access.invalidate(path)
+            if table == "shots":
+                self.player_stats.invalidate()
+                self.match_states.invalidate()
+                self.match_summaries.invalidate()
+                self.shot_partitions.invalidate()
+
+    def count_rows(self, table):
+        return len(self.load_table(table))
+
+    def load_rows(self, table, start, stop):
+        """保存順で start 行目から stop 行目の手前まで。インデックスは表の中の位置。"""
+        return self.load_table(table).iloc[start:stop]
+
+    def save_rows(self, table, start, stop, df, expected_rows):
+        """start〜stop の行を df で置き換える。表の行数が expected_rows から変わっていれば保存せず False。
+
+        CSV は行の位置で書き換えられないので、ファイル全体を書き直す。
+        """
+        path = self.paths[table]
+        with locked(path):
+            live = self.load_table(table)
+            if len(live) != expected_rows:
+                return False
+            self.save_table(table, pd.concat([live.iloc[:start], df.reindex(columns=live.columns), live.iloc[stop:]], ignore_index=True))
+        return True
+
+    def _remove_tombstones(self, path):
+        try:
+            os.remove(tombstone_path(path))
+        except FileNotFoundError:
+            return
+        manifest.forget(tombstone_path(path))
+
+    def _add_tombstone(self, table, kind, match_id, position, removed):
+        path = self.paths[table]
+        append_rows(tombstone_path(path), TOMBSTONE_COLUMNS, [[kind, match_id, int(position)]], removed=removed)
+        if len(read_tombstones(path)) >= COMPACT_THRESHOLD and table not in self._compacting:
+            self._compacting.add(table)
+            threading.Thread(target=self._compact_in_background, args=(table,), daemon=True).start()
+
+    def _compact_in_background(self, table):
+        try:
+            self.compact([table])
+        finally:
+            self._compacting.discard(table)
+
+    def compact(self, tables=None):
+        """目印の付いた行をファイルから取り除き、目印を消す。取り除いた行数を表ごとに返す。
+
+        目印を消してから本体を差し替えるので、途中で止まっても消した行が戻ることはあるが、別の行が消えることはない。
+        """
+        removed = {}
+        for table in tables or self.paths:
+            path = self.paths[table]
+            with locked(path):
+                tombstones = read_tombstones(path)
+                if tombstones.empty:
+                    continue
+                before = self.data_version()
+                # 残る行は変わらないので、アプリの外で書き換えられていなければ世代を引き継ぐ（試合の状態を作り直さない）
+                generation = manifest.generation(path, [tombstone_path(path)])
+                df = profiling.read_csv(path)
+                live = drop_deleted(df, tombstones)
+                self._remove_tombstones(path)
+                replace_atomically(path, lambda tmp: profiling.to_csv(live, tmp, index=False))
+                manifest.record(path, len(live), generation=generation)
+                data_access.invalidate(path)
+                if table == "shots":
+                    self.shot_partitions.touch(before, self.data_version())
+                removed[table] = len(df) - len(live)
+        return removed
+
+    def load_players(self):
+        return self.load_table("players")
+
+    def load_matches(self):
+        return self.load_table("matches")
+
+    def load_shots(self):
+        """型付き（schema.to_typed()）のショット表。書き戻しには load_table("shots") を使う。"""
+        return self._load_live("shots", "csv-typed", schema.read_shots_csv)
+
+    def load_shot_keys(self):
+        """保存済みショットの SHOT_KEY_COLUMNS だけ（型付き）。キャッシュせず、その3列だけを読む。"""
+        path = self.paths["shots"]
+        with locked(path):
+            df = profiling.read_csv(path, usecols=SHOT_KEY_COLUMNS, dtype={"試合ID": "category"})
+            return schema.to_typed(drop_deleted(df, read_tombstones(path)))
+
+    def data_version(self):
+        """ショットが変わると変わる値。読み込んだデータから作った索引などのキャッシュに使う。"""
+        path = self.paths["shots"]
+        return (path,) + data_access.file_signature(path, tombstone_path(path))
+
+    def load_shots_between(self, start=None, end=None):
+        """試合日が start〜end（datetime.date、両端を含む。None は制限なし）の試合のショット（型付き）。
+
+        試合日ごとの分割（partitions.py）から期間内の分だけを読む。分割が古ければ先に作り直す。
+        """
+        with locked(self.paths["shots"]):
+            version = self.data_version()
+            if not self.shot_partitions.is_current(version):
+                self.shot_partitions.rebuild(self.load_table("shots"), version)
+            return self.shot_partitions.load(start and start.isoformat(), end and end.isoformat())
+
+    def query_shots(self, match_id=None, player=None):
+        df = self.load_shots()
+        if match_id is not None:
+            df = df[df["試合ID"] == match_id]
+        if player is not None:
+            df = df[df["打った選手"] == player]
+        return df
+
+    def count_shots(self, match_id):
+        # 試合の状態がショットの記録・取り消しのたびに数え直すショット数を使う（shots.csv を読まない）
+        return self.load_match_state(match_id)["shot_count"]
+
+    def match_shot_counts(self, match_ids):
+        """試合ID → ショット数 の Series。ショットを全部読んで数える（アプリの外で書き換えられたときなどに使う）。"""
+        return analytics.match_shot_counts(self.load_shots()).reindex(match_ids, fill_value=0)
+
+    def shots_generation(self):
+        """shots.csv とその削除の目印の世代（manifest.generation()）。
+
+        アプリの外で書き換えられていれば、目録を数え直して新しい世代にする（世代が変わるので、保存済みの試合の状態は作り直される）。
+        """
+        path = self.paths["shots"]
+        companions = [tombstone_path(path)]
+        generation = manifest.generation(path, companions)
+        if generation is None:
+            with locked(path):
+                generation = manifest.generation(path, companions)
+                if generation is None:
+                    self._recount_shots()
+                    generation = manifest.generation(path, companions)
+        return generation
+
+    def _recount_shots(self):
+        """shots.csv と削除の目印の行数・目印で消える行数を数え直して目録に書く。shots のロックの中で呼ぶ。"""
+        path = self.paths["shots"]
+        tomb = tombstone_path(path)
+        df = profiling.read_csv(path, dtype=str, keep_default_na=False)
+        if os.path.exists(tomb):
+            manifest.record(tomb, manifest.count_rows(tomb), removed=len(df) - len(drop_deleted(df, read_tombstones(path))))
+        else:
+            manifest.forget(tomb)
+        manifest.record(path, len(df))
+
+    def shot_total(self):
+        """削除されていないショット数。目録の行数から目印で消える行数を引いて求め、shots.csv は読まない。"""
+        path = self.paths["shots"]
+        total = manifest.live_rows(path, tombstone_path(path))
+        if total is None:
+            # アプリの外で書き換えられていれば数え直す（一度だけ）
+            with locked(path):
+                total = manifest.live_rows(path, tombstone_path(path))
+                if total is None:
+                    self._recount_shots()
+                    total = manifest.live_rows(path, tombstone_path(path))
+        return total
+
+    def load_player_counts(self):
+        return self.player_stats.counts(self.shot_total(), self.load_shots)
+
+    def load_player_metrics(self):
+        return self.player_stats.metrics(self.shot_total(), self.load_shots)
+
+    def load_match_state(self, match_id):
+        """試合のスコア・次のラリー番号とショット順・次の打者など（match_state.new_state() を参照）。"""
+        teams = match_teams(self.load_matches(), match_id)
+        # 状態のショット数は記録・取り消しと同じロックの中で更新しているので、ショットの世代が変わっていなければそのまま使える
+        return self.match_states.get(match_id, lambda: self.query_shots(match_id=match_id), teams, generation=self.shots_generation())
+
+    def finish_match(self, match_id):
+        """試合の終了時に呼ぶ。試合のまとめ（match_summary.build()）を作って保存し、返す。"""
+        with locked(self.paths["shots"]):
+            summary = match_summary.build(match_id, self.query_shots(match_id=match_id), match_teams(self.load_matches(), match_id))
+            summary["generation"] = self.shots_generation()
+            self.match_summaries.save(summary)
+        return summary
+
+    def load_match_summary(self, match_id):
+        """保存済みの試合のまとめ。まだ作っていないか、作った後にショットが変わっていれば None。"""
+        summary = self.match_summaries.get(match_id)
+        if summary is None or summary["shot_count"] != self.count_shots(match_id):
+            return None
+        return summary
+
+    def add_player(self, row):
+        append_rows(self.paths["players"], PLAYER_COLUMNS, [row])
+
+    def add_match_rows(self, rows):
+        append_rows(self.paths["matches"], MATCH_COLUMNS, rows)
+
+    def shots_lock(self):
+        """ショットの書き込みと同じロック。状態を読んでから書くまでを、別プロセスの書き込みと重ねないときに使う。"""
+        return locked(self.paths["shots"])
+
+    def append_shots(self, rows):
+        rows = list(rows)
+        shots = [dict(zip(SHOT_COLUMNS, row)) for row in rows]
+        # 集計・試合の状態の更新も同じロックの中で行い、ショットとずれないようにする
+        with locked(self.paths["shots"]):
+            before = self.data_version()
+            shot_log(self.paths["shots"]).append_many(rows)
+            self.player_stats.add_shots(shots)
+            self.match_states.add_shots(shots)
+            self.match_summaries.remove_matches(shot["試合ID"] for shot in shots)
+            self.shot_partitions.add_shots(rows, before, self.data_version())
+
+    def delete_match(self, match_id):
+        with locked(self.paths["matches"]):
+            rows = self.load_matches()
+            rows = rows[rows["試合ID"] == match_id]
+            if len(rows):
+                self._add_tombstone("matches", "試合", match_id, rows.index[-1], len(rows))
+        with locked(self.paths["shots"]):
+            shots = self.query_shots(match_id=match_id)
+            if len(shots):
+                before = self.data_version()
+                self._add_tombstone("shots", "試合", match_id, shots.index[-1], len(shots))
+                self.player_stats.remove_shots(shots)
+                self.shot_partitions.remove_match(match_id, before, self.data_version())
+            self.match_states.remove_match(match_id)
+            self.match_summaries.remove(match_id)
+
+    def delete_last_shot(self, match_id, player=None):
+        with locked(self.paths["shots"]):
+            target = self.query_shots(match_id=match_id, player=player)
+            if target.empty:
+                return None
+            last = {col: _to_sql_value(v) for col, v in target.iloc[-1].items()}
+            before = self.data_version()
+            self._add_tombstone("shots", "ショット", match_id, target.index[-1], 1)
+            self.shot_partitions.remove_last_shot(match_id, player, before, self.data_version())
+            self.player_stats.remove_shot(last)
+            self.match_states.remove_shot(last)
+            self.match_summaries.remove(match_id)
+        return last
+
+
+_connection_ids = itertools.count()
+
+
+class SqliteBackend:
+    """sqlite3（WALモード）に保存する。試合ID・打った選手で絞り込む検索はインデックスを使う。"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS players (
+        "名前" TEXT, "利き手" TEXT, "チーム" TEXT
+    );
+    CREATE TABLE IF NOT EXISTS matches (
+        "試合ID" TEXT, "試合形式" TEXT, "選手名" TEXT, "チーム" TEXT
+    );
+    CREATE TABLE IF NOT EXISTS shots (
+        "試合ID" TEXT, "ラリー番号" INTEGER, "ショット順" INTEGER, "打った選手" TEXT,
+        "打点" TEXT, "着地" TEXT, "ショット" TEXT, "結果" TEXT, "レシーバー" TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_matches_match ON matches ("試合ID");
+    CREATE INDEX IF NOT EXISTS idx_shots_match ON shots ("試合ID");
+    CREATE INDEX IF NOT EXISTS idx_shots_player ON shots ("打った選手");
+    CREATE INDEX IF NOT EXISTS idx_shots_order ON shots ("試合ID", "ラリー番号", "ショット順");
+    """
+
+    def __init__(self, db_path=DB_PATH, stats_path=None):
+        self.db_path = db_path
+        self._writes = 0
+        # data_version は接続ごとの値なので、キャッシュのシグネチャには接続の通し番号も含める
+        self._connection_id = next(_connection_ids)
+        self.player_stats = PlayerStatsStore(
+            stats_path or os.path.splitext(db_path)[0] + "_" + PLAYER_STATS_JSON,
+            lock=lambda: locked(db_path),
+        )
+        self.match_states = MatchStateStore(os.path.splitext(db_path)[0] + "_" + MATCH_STATES_DIR, lock=lambda: locked(db_path))
+        self.match_summaries = MatchSummaryStore(os.path.splitext(db_path)[0] + "_" + MATCH_SUMMARIES_DIR)
+        # 接続は Streamlit のセッション（スレッド）間で共有するので、使うときは _lock を取る。
+        # 別プロセスとの書き込みの競合は SQLite 自体のロックと timeout で待ち合わせる
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+
+    @staticmethod
+    def _column_list(columns):
+        return ", ".join(f'"{c}"' for c in columns)
+
+    def _fetch(self, sql, params=()):
+        with profiling.span(profiling.READ, "sqlite: " + sql.split(" FROM ")[-1][:60]), self._lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def _write(self, statements):
+        with profiling.span(profiling.WRITE, "sqlite"), self._lock, self.conn:
+            for sql, params in statements:
+                self.conn.execute(sql, params)
+        self._changed()
+
+    def _signature(self):
+        # data_version は他の接続（別プロセス）からのコミットで変わる。自分の書き込みは _writes で数える
+        return (self._connection_id, self._writes, self._fetch("PRAGMA data_version")[0][0])
+
+    def _changed(self):
+        self._writes += 1
+        data_access.invalidate(self.db_path)
+
+    def data_version(self):
+        """ショットが変わると変わる値。読み込んだデータから作った索引などのキャッシュに使う。"""
+        return (self.db_path,) + self._signature()
+
+    def _select(self, table, where="", params=(), typed=False):
+        columns = TABLE_COLUMNS[table]
+        sql = f"SELECT {self._column_list(columns)} FROM {table} {where} ORDER BY rowid"
+
+        def load():
+            df = pd.DataFrame(self._fetch(sql, params), columns=columns)
+            return schema.to_typed(df) if typed else df
+
+        return data_access.cached(("sqlite", self.db_path, sql, tuple(params), typed), self._signature(), load)
+
+    def _insert(self, table, rows):
+        columns = TABLE_COLUMNS[table]
+        placeholders = ", ".join("?" for _ in columns)
+        with profiling.span(profiling.WRITE, f"sqlite: {table}"), self._lock, self.conn:
+            self.conn.executemany(
+                f"INSERT INTO {table} ({self._column_list(columns)}) VALUES ({placeholders})",
+                [[_to_sql_value(v) for v in row] for row in rows],
+            )
+        self._changed()
+
+    def load_table(self, table):
+        return self._select(table)
+
+    def save_table(self, table, df):
+        with locked(self.db_path):
+            self._write([(f"DELETE FROM {table}", ())])
+            self._insert(table, df.reindex(columns=TABLE_COLUMNS[table]).itertuples(index=False, name=None))
+            if table == "shots":
+                self.player_stats.invalidate()
+                self.match_states.invalidate()
+                self.match_summaries.invalidate()
+
+    def count_rows(self, table):
+        return self._fetch(f"SELECT COUNT(*) FROM {table}")[0][0]
+
+    def load_rows(self, table, start, stop):
+        """保存順で start 行目から stop 行目の手前まで。インデックスは表の中の位置。"""
+        columns = TABLE_COLUMNS[table]
+        rows = self._fetch(
+            f"SELECT {self._column_list(columns)} FROM {table} ORDER BY rowid LIMIT ? OFFSET ?",
+            (max(stop - start, 0), start),
+        )
+        return pd.DataFrame(rows, columns=columns, index=range(start, start + len(rows)))
+
+    def save_rows(self, table, start, stop, df, expected_rows):
+        """start〜stop の行を df で置き換える。表の行数が expected_rows から変わっていれば保存せず False。
+
+        置き換える範囲の行だけを更新する。df の行が多ければ残りは表の末尾に追加し、少なければ余った行を削除する。
+        """
+        columns = TABLE_COLUMNS[table]
+        rows = [[_to_sql_value(v) for v in row] for row in df.reindex(columns=columns).itertuples(index=False, name=None)]
+        assignments = ", ".join(f'"{c}" = ?' for c in columns)
+        with locked(self.db_path):
+            if self.count_rows(table) != expected_rows:
+                return False
+            rowids = [r[0] for r in self._fetch(f"SELECT rowid FROM {table} ORDER BY rowid LIMIT ? OFFSET ?", (max(stop - start, 0), start))]
+            statements = [(f"UPDATE {table} SET {assignments} WHERE rowid = ?", (*row, rowid)) for row, rowid in zip(rows, rowids)]
+            statements += [(f"DELETE FROM {table} WHERE rowid = ?", (rowid,)) for rowid in rowids[len(rows):]]
+            self._write(statements)
+            if len(rows) > len(rowids):
+                self._insert(table, rows[len(rowids):])
+            if table == "shots":
+                self.player_stats.invalidate()
+                self.match_states.invalidate()
+                self.match_summaries.invalidate()
+        return True
+
+    def load_players(self):
+        return self.load_table("players")
+
+    def load_matches(self):
+        return self.load_table("matches")
+
+    def load_shot_keys(self):
+        """保存済みショットの SHOT_KEY_COLUMNS だけ（型付き）。キャッシュせず、その3列だけを読む。"""
+        rows = self._fetch(f"SELECT {self._column_list(SHOT_KEY_COLUMNS)} FROM shots ORDER BY rowid")
+        return schema.to_typed(pd.DataFrame(rows, columns=SHOT_KEY_COLUMNS))
+
+    def _match_rows(self, match_id):
+        # 試合の一覧のキャッシュはショットを記録するたびに作り直しになるので、1試合の行だけをインデックスで読む
+        return self._select("matches", 'WHERE "試合ID" = ?', (match_id,))
+
+    def load_shots(self):
+        """型付き（schema.to_typed()）のショット表。書き戻しには load_table("shots") を使う。"""
+        return self._select("shots", typed=True)
+
+    def query_shots(self, match_id=None, player=None):
+        conditions, params = [], []
+        if match_id is not None:
+            conditions.append('"試合ID" = ?')
+            params.append(match_id)
+        if player is not None:
+            conditions.append('"打った選手" = ?')
+            params.append(player)
+        where = "WHERE " + " AND ".join(conditions) if conditions else ""
+        return self._select("shots", where, params, typed=True)
+
+    def load_shots_between(self, start=None, end=None):
+        """試合日が start〜end（datetime.date、両端を含む。None は制限なし）の試合のショット（型付き）。
+
+        試合IDは日付で始まるので、試合IDの索引の範囲検索で期間内の試合だけを読む。
+        """
+        conditions, params = [], []
+        if start is not None:
+            conditions.append('"試合ID" >= ?')
+            params.append(start.isoformat())
+        if end is not None:
+            conditions.append('"試合ID" < ?')
+            params.append((end + datetime.timedelta(days=1)).isoformat())
+        if conditions:
+            # 日付で始まらない試合IDを除く
+            conditions.append('"試合ID" GLOB ?')
+            params.append("[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*")
+        where = "WHERE " + " AND ".join(conditions) if conditions else ""
+        return self._select("shots", where, params, typed=True)
+
+    def count_shots(self, match_id):
+        return self._fetch('SELECT COUNT(*) FROM shots WHERE "試合ID" = ?', (match_id,))[0][0]
+
+    def match_shot_counts(self, match_ids):
+        """試合ID → ショット数 の Series。試合IDの索引で1試合ずつ数える。"""
+        return pd.Series([self.count_shots(match_id) for match_id in match_ids], index=match_ids, dtype="int64")
+
+    def shots_generation(self):
+        """SQLite のショットには記録をまたいで変わらない世代がないので None（試合のまとめはショット数で確かめる）。"""
+        return None
+
+    def shot_total(self):
+        return self._fetch("SELECT COUNT(*) FROM shots")[0][0]
+
+    def load_player_counts(self):
+        return self.player_stats.counts(self.shot_total(), self.load_shots)
+
+    def load_player_metrics(self):
+        return self.player_stats.metrics(self.shot_total(), self.load_shots)
+
+    def load_match_state(self, match_id):
+        """試合のスコア・次のラリー番号とショット順・次の打者など（match_state.new_state() を参照）。"""
+        teams = match_teams(self._match_rows(match_id), match_id)
+        return self.match_states.get(match_id, lambda: self.query_shots(match_id=match_id), teams, shot_count=self.count_shots(match_id))
+
+    def finish_match(self, match_id):
+        """試合の終了時に呼ぶ。試合のまとめ（match_summary.build()）を作って保存し、返す。"""
+        with locked(self.db_path):
+            summary = match_summary.build(match_id, self.query_shots(match_id=match_id), match_teams(self._match_rows(match_id), match_id))
+            self.match_summaries.save(summary)
+        return summary
+
+    def load_match_summary(self, match_id):
+        """保存済みの試合のまとめ。まだ作っていないか、作った後にショットが変わっていれば None。"""
+        summary = self.match_summaries.get(match_id)
+        if summary is None or summary["shot_count"] != self.count_shots(match_id):
+            return None
+        return summary
+
+    def add_player(self, row):
+        self._insert("players", [row])
+
+    def add_match_rows(self, rows):
+        self._insert("matches", rows)
+
+    def shots_lock(self):
+        """ショットの書き込みと同じロック。状態を読んでから書くまでを、別プロセスの書き込みと重ねないときに使う。"""
+        return locked(self.db_path)
+
+    def append_shots(self, rows):
+        rows = list(rows)
+        with locked(self.db_path):
+            self._insert("shots", rows)
+            shots = [dict(zip(SHOT_COLUMNS, row)) for row in rows]
+            self.player_stats.add_shots(shots)
+            self.match_states.add_shots(shots)
+            self.match_summaries.remove_matches(shot["試合ID"] for shot in shots)
+
+    def compact(self, tables=None):
+        """削除した行の領域を VACUUM で回収する（削除自体はインデックスで行うので目印は使わない）。"""
+        with self._lock:
+            self.conn.execute("VACUUM")
+        return {}
+
+    def delete_match(self, match_id):
+        with locked(self.db_path):
+            self._write([
+                ('DELETE FROM matches WHERE "試合ID" = ?', (match_id,)),
+                ('DELETE FROM shots WHERE "試合ID" = ?', (match_id,)),
+            ])
+            self.player_stats.invalidate()
+            self.match_states.remove_match(match_id)
+            self.match_summaries.remove(match_id)
+
+    def delete_last_shot(self, match_id, player=None):
+        sql = f'SELECT rowid, {self._column_list(SHOT_COLUMNS)} FROM shots WHERE "試合ID" = ?'
+        params = [match_id]
+        if player is not None:
+            sql += ' AND "打った選手" = ?'
+            params.append(player)
+        with locked(self.db_path):
+            rows = self._fetch(sql + " ORDER BY rowid DESC LIMIT 1", params)
+            if not rows:
+                return None
+            self._write([("DELETE FROM shots WHERE rowid = ?", (rows[0][0],))])
+            last = dict(zip(SHOT_COLUMNS, rows[0][1:]))
+            self.player_stats.remove_shot(last)
+            self.match_states.remove_shot(last)
+            self.match_summaries.remove(match_id)
+        return last
+
+
+_backends = {}
+
+
+def get_backend(kind=None):
+    kind = kind or STORAGE_BACKEND
+    if kind not in _backends:
+        if kind == "csv":
+            _backends[kind] = CsvBackend()
+        elif kind == "sqlite":
+            _backends[kind] = SqliteBackend()
+        else:
+            raise ValueError(f"不明な保存先です: {kind}")
+    return _backends[kind]
+
+
+def migrate_csv_to_sqlite(db_path=DB_PATH, player_csv=PLAYER_CSV, match_csv=MATCH_CSV, shot_csv=SHOT_CSV):
+    """既存のCSVをSQLiteへ一括で取り込む（取り込み先のテーブルは置き換える）。"""
+    src = CsvBackend(player_csv, match_csv, shot_csv)
+    dst = SqliteBackend(db_path)
+    counts = {}
+    for table in TABLE_COLUMNS:
+        df = src.load_table(table)
+        for col in TABLE_COLUMNS[table]:
+            if col not in df.columns:
+                df[col] = ""
+        if table == "shots":
+            df["ラリー番号"] = pd.to_numeric(df["ラリー番号"], errors="coerce").astype("Int64")
+            df["ショット順"] = pd.to_numeric(df["ショット順"], errors="coerce").astype("Int64")
+        dst.save_table(table, df)
+        counts[table] = len(df)
+    return counts
+
+
+def export_sqlite_to_csv(db_path=DB_PATH, player_csv=PLAYER_CSV, match_csv=MATCH_CSV, shot_csv=SHOT_CSV):
+    """SQLiteの内容をCSVへ書き出す。"""
+    src = SqliteBackend(db_path)
+    dst = CsvBackend(player_csv, match_csv, shot_csv)
+    counts = {}
+    for table in TABLE_COLUMNS:
+        df = src.load_table(table)
+        dst.save_table(table, df)
+        counts[table] = len(df)
+    return counts
+
+
+def build_match_summaries(backend):
+    """まとめがない（またはショット数が合わない）試合のまとめを作る。作った試合数を返す。
+
+    終了の操作をせずに記録した試合や、まとめを作る前からある試合に使う。対象の試合はまとめて1回で集計する。
+    """
+    with backend.shots_lock():
+        return _build_match_summaries(backend)
+
+
+def _build_match_summaries(backend):
+    generation = backend.shots_generation()
+    shots = backend.load_shots()
+    rows = backend.match_summaries.player_rows().drop_duplicates("試合ID")
+    done = set(rows["試合ID"][rows["shot_count"].to_numpy() == analytics.match_shot_counts(shots).reindex(rows["試合ID"], fill_value=0).to_numpy()])
+    todo = set(shots["試合ID"].dropna().unique()) - done
+    teams = {}
+    for match_id, player, team in backend.load_matches()[["試合ID", "選手名", "チーム"]].itertuples(index=False):
+        if match_id in todo and not pd.isna(player):
+            teams.setdefault(match_id, {})[str(player)] = "" if pd.isna(team) else str(team)
+    summaries = match_summary.build_many(analytics.shots_in_matches(shots, todo), teams)
+    for summary in summaries.values():
+        summary["generation"] = generation
+        backend.match_summaries.save(summary)
+    return len(summaries)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="CSV と SQLite の間でデータを移行する。compact は削除済みの行を取り除き、summaries は試合のまとめを作る。"
+        "check は CSV を目録と照らし合わせて古い形式を移行し、verify は目録の行数・チェックサムを中身と照合する"
+    )
+    parser.add_argument("command", choices=["migrate", "export", "compact", "summaries", "check", "verify"])
+    parser.add_argument("--db", default=DB_PATH)
+    args = parser.parse_args()
+    if args.command in ("check", "verify"):
+        messages = check_files()
+        if args.command == "verify":
+            paths = [PLAYER_CSV, MATCH_CSV, SHOT_CSV]
+            messages += manifest.verify(paths + [tombstone_path(p) for p in paths if os.path.exists(tombstone_path(p))])
+        print("\n".join(messages) or "問題はありません。")
+        return
+    if args.command == "migrate":
+        counts = migrate_csv_to_sqlite(args.db)
+    elif args.command == "export":
+        counts = export_sqlite_to_csv(args.db)
+    elif args.command == "summaries":
+        backend = SqliteBackend(args.db) if STORAGE_BACKEND == "sqlite" else CsvBackend()
+        print(f"{build_match_summaries(backend)} 試合のまとめを作りました。")
+        return
+    else:
+        backend = SqliteBackend(args.db) if STORAGE_BACKEND == "sqlite" else CsvBackend()
+        counts = backend.compact()
+    for table, n in counts.items():
+        print(f"{table}: {n} 行")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""schema.py のラリー番号・ショット順の上限（COUNTER_MAX）の境界。
+
+    python -m pytest tests
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd  # noqa: E402
+
+from schema import COUNTER_MAX, SHOT_COLUMNS, to_typed, validate_shots  # noqa: E402
+
+
+def shots(order):
+    return pd.DataFrame([["試合", 1, o, "選手", "RR", "LF", "クリア", "続行", ""] for o in order], columns=SHOT_COLUMNS)
+
+
+def test_validate_shots_accepts_up_to_counter_max():
+    reasons = validate_shots(shots([COUNTER_MAX - 1, COUNTER_MAX, COUNTER_MAX + 1, 40000]))
+    assert reasons.tolist()[:2] == ["", ""]
+    assert all(r.startswith("ショット順 が") for r in reasons.tolist()[2:])
+
+
+def test_to_typed_makes_out_of_range_counters_missing():
+    typed = to_typed(shots([COUNTER_MAX, COUNTER_MAX + 1, 40000, -40000]))
+    assert str(typed["ショット順"].dtype) == "Int16"
+    assert typed["ショット順"].iloc[0] == COUNTER_MAX
+    assert typed["ショット順"].iloc[1:].isna().all()
@@ -0,0 +1,12 @@
+# ページ名 → モジュール。各モジュールは render(backend) を持つ。
+# plotly・matplotlib・seaborn などはページのモジュール側で読み込むので、ここでは何も import しない
+PAGES = {
+    "選手登録": "views.player_register",
+    "試合管理": "views.match_manage",
+    "試合登録": "views.match_register",
+    "試合開始・記録": "views.recording",
+    "選手プロフィール一覧": "views.profiles",
+    "データ解析": "views.analysis",
+    "選手比較・ランキング": "views.compare",
+    "CSV編集": "views.csv_editor",
+}
@@ -0,0 +1,166 @@
+import time
+
+import numpy as np
+import plotly.graph_objects as go
+import streamlit as st
+
+import analytics
+import charts
+import heatmap
+import markov
+import profiling
+import sequences
+from schema import AREAS, RESULTS, SHOT_TYPES
+from views import period
+
+
+def render(backend):
+    st.title("データ解析")
+    bounds = period.date_bounds(backend)
+    selected_period = period.select(bounds, "analysis_period")
+    if selected_period is None:
+        counts = backend.load_player_counts()
+    else:
+        # 期間内の試合日の分割だけを読む
+        window_shots = backend.load_shots_between(*selected_period)
+        counts = analytics.tidy_counts(window_shots)
+    if counts.empty:
+        st.warning("データがありません。記録を追加してください。" if selected_period is None else "この期間の記録がありません。")
+    else:
+        metrics = analytics.metrics_from_counts(counts)
+        player_list = metrics.index.tolist()
+        selected_player = st.session_state.get("selected_analysis_player") or st.selectbox("選手を選択", player_list)
+        if selected_player not in metrics.index:
+            st.info(f"{selected_player} のこの期間の記録はありません。")
+            return
+        m = metrics.loc[selected_player]
+
+        st.subheader("📈 得点率・ミス率")
+        total = m["総ショット数"]
+        st.metric("得点率", f"{m['得点率'] * 100:.1f}%")
+        st.metric("ミス率", f"{m['ミス率'] * 100:.1f}%")
+
+        st.subheader("🔍 後衛からのショット傾向")
+        st.metric("ドロップ率（後衛）", f"{m['ドロップ率（後衛）'] * 100:.1f}%")
+        st.metric("スマッシュ率（後衛）", f"{m['スマッシュ率（後衛）'] * 100:.1f}%")
+        st.metric("クロス選択率（後衛）", f"{m['クロス選択率（後衛）'] * 100:.1f}%")
+
+        st.subheader("レーダーチャート")
+        fig_radar = charts.radar_figure(m, charts.ANALYSIS_RADAR, selected_player)
+        with profiling.span(profiling.RENDER, "レーダーチャート"):
+            st.plotly_chart(fig_radar, use_container_width=True)
+
+        st.subheader("後衛からのショット傾向")
+        if m["後衛"] == 0:
+            st.info("後衛エリアからのショットデータがありません。")
+        else:
+            # ショット種別
+            shot_counts = analytics.rear_shot_counts(counts, selected_player)
+            st.markdown("**後衛エリアからのショット種類の割合（全体ショットに対する割合）**")
+
+            # 円グラフとして割合を全体ショット数で可視化
+            fig_pie = charts.rear_pie_figure(shot_counts, total)
+            with profiling.span(profiling.RENDER, "後衛ショットの円グラフ"):
+                st.plotly_chart(fig_pie, use_container_width=True)
+
+        st.subheader("📍 ミスが発生した打点エリア ヒートマップ")
+        area_counts = analytics.miss_area_counts(counts, selected_player)
+        # 描画結果は件数が変わらない限り使い回す（再実行のたびに図を作らない）
+        with profiling.span(profiling.RENDER, "ミス打点ヒートマップ"):
+            st.image(heatmap.cached_heatmap(heatmap.court_grid(area_counts), f"{selected_player} のミス発生打点分布"))
+
+        st.subheader("📅 調子の推移")
+        # 期間を選んでいなければ直近の期間。読むのはその期間の分割だけなので、全期間の記録の量には左右されない
+        window = selected_period or (bounds and period.recent(bounds))
+        if window is None:
+            st.info("試合IDが日付で始まる試合の記録がありません。")
+        else:
+            t0 = time.perf_counter()
+            shots = window_shots if selected_period is not None else backend.load_shots_between(*window)
+            trend = analytics.metrics_by_date(shots[shots["打った選手"] == selected_player])
+            if trend.empty:
+                st.info("この期間の記録がありません。")
+            else:
+                with profiling.span(profiling.RENDER, "調子の推移"):
+                    st.plotly_chart(period.trend_figure(trend.loc[selected_player]), use_container_width=True)
+            st.caption(f"{window[0]}〜{window[1]} の {len(shots)} 球から集計（{(time.perf_counter() - t0) * 1000:.0f} ms）")
+
+        st.subheader("🔗 配球パターン（ラリーの流れ）")
+        index = sequences.index_for(backend)
+        t0 = time.perf_counter()
+
+        st.markdown(f"**直前のショットに対する {selected_player} の次の一手**")
+        col_shot, col_area = st.columns(2)
+        prev_shot = col_shot.selectbox("直前のショット", SHOT_TYPES, index=SHOT_TYPES.index("スマッシュ"))
+        prev_area = col_area.selectbox("直前のショットの着地", ["指定なし"] + AREAS)
+        condition = {"ショット": prev_shot}
+        if prev_area != "指定なし":
+            condition["着地"] = prev_area
+        next_table = index.next_shots([condition], player=selected_player)
+        if next_table.empty:
+            st.info("該当するラリーがありません。")
+        else:
+            st.dataframe(next_table, use_container_width=True)
+
+        st.markdown("**結果につながった流れ**")
+        col_n, col_result = st.columns(2)
+        n = col_n.radio("球数", list(range(2, sequences.MAX_N + 1)), index=sequences.MAX_N - 2, horizontal=True)
+        result = col_result.selectbox("最後の1球の結果", [r for r in RESULTS if r != "続行"], index=1)
+        only_player = st.checkbox(f"最後の1球を {selected_player} が打ったものだけ")
+        top = index.top_sequences(n, result=result, player=selected_player if only_player else None)
+        if top.empty:
+            st.info("該当するラリーがありません。")
+        else:
+            top["割合"] = (top["割合"] * 100).round(1).astype(str) + "%"
+            st.dataframe(top, hide_index=True, use_container_width=True)
+        st.caption(f"{index.size} 球から検索（{(time.perf_counter() - t0) * 1000:.1f} ms）")
+
+        st.subheader("🎯 ラリーの流れ（マルコフ連鎖）")
+        t0 = time.perf_counter()
+        # モデルはデータと期間が変わったときだけ作り直す（選手・ペアを切り替えても作り直さない）
+        model = markov.model_for(backend, selected_period)
+        pairs = [p for p in model.pairs if selected_player in p.split("・")]
+        subject_name = st.selectbox("対象", [selected_player] + pairs, format_func=lambda s: "本人の球のみ" if s == selected_player else f"ペア {s}")
+        chain = model.subject("選手" if subject_name == selected_player else "ペア", subject_name)
+        if chain is None:
+            st.info("着地とショットの記録がある球がありません。")
+        else:
+            view = st.radio("遷移の表示", ["エリア → エリア", "ショット → ショット"], horizontal=True)
+            if view == "エリア → エリア":
+                trans, axis_labels = markov.area_transitions(chain["遷移"]), AREAS
+            else:
+                trans, axis_labels = markov.shot_transitions(chain["遷移"]), SHOT_TYPES
+            rows = trans.sum(axis=1, keepdims=True)
+            share = trans / np.where(rows > 0, rows, 1)
+            st.markdown(f"**{subject_name} の球（縦）→ 相手の返球（横）の割合**")
+            fig_trans = go.Figure(go.Heatmap(
+                z=share, x=axis_labels, y=axis_labels, customdata=trans, colorscale="Blues", zmin=0,
+                hovertemplate="%{y} → %{x}<br>%{z:.1%}（%{customdata} 球）<extra></extra>",
+            ))
+            fig_trans.update_layout(xaxis_title="相手の返球", yaxis_title="対象の球", yaxis_autorange="reversed", margin=dict(t=10, b=10))
+            with profiling.span(profiling.RENDER, "遷移ヒートマップ"):
+                st.plotly_chart(fig_trans, use_container_width=True)
+
+            st.markdown(f"**{subject_name} の球の着地・ショットごとの、ラリーを取る確率**")
+            grid = (len(AREAS), len(SHOT_TYPES))
+            played = chain["遷移"].sum(axis=1) + chain["終わり方"].sum(axis=1)
+            fig_win = go.Figure(go.Heatmap(
+                z=chain["勝率"].reshape(grid), x=SHOT_TYPES, y=AREAS, customdata=played.reshape(grid),
+                colorscale="RdYlGn", zmin=0, zmax=1, hovertemplate="%{y} の %{x}<br>%{z:.1%}（%{customdata} 球）<extra></extra>",
+            ))
+            fig_win.update_layout(xaxis_title="ショット", yaxis_title="着地", yaxis_autorange="reversed", margin=dict(t=10, b=10))
+            with profiling.span(profiling.RENDER, "勝率ヒートマップ"):
+                st.plotly_chart(fig_win, use_container_width=True)
+
+            st.markdown("**危険なゾーン（相手の返球の着地ごと、ラリーを取る確率の低い順）**")
+            zones = markov.danger_zones(chain)
+            if zones.empty:
+                st.info("相手の返球の記録がありません。")
+            else:
+                st.dataframe(zones, hide_index=True, use_container_width=True, column_config={
+                    "勝率": st.column_config.ProgressColumn("ラリーを取る確率", format="percent", min_value=0, max_value=1),
+                    "そのショットの勝率": st.column_config.NumberColumn(format="percent"),
+                })
+            st.caption(f"{chain['球数']} 球（全体 {model.size} 球）から計算（{(time.perf_counter() - t0) * 1000:.0f} ms）")
+
+        st.image("new_court_map.webp", caption="コート構成", use_container_width=True)
@@ -0,0 +1,94 @@
+import time
+
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+
+import analytics
+import match_summary
+import profiling
+
+SORT_DEFAULT = "得点率"
+
+
+def _match_filter(backend):
+    """期間・試合形式の入力欄を出し、絞り込む試合IDの集合を返す。絞り込まないときは None。"""
+    matches = backend.load_matches().drop_duplicates("試合ID")
+    dates = analytics.match_dates(matches["試合ID"])
+    types = sorted(matches["試合形式"].dropna().unique().tolist())
+
+    col_date, col_type = st.columns(2)
+    selected_types = col_type.multiselect("試合形式", types, default=types)
+    date_range = None
+    if dates.notna().any():
+        first, last = dates.min().date(), dates.max().date()
+        if col_date.checkbox("期間で絞り込む"):
+            date_range = col_date.date_input("期間", (first, last), min_value=first, max_value=last)
+
+    if date_range is None and set(selected_types) == set(types):
+        return None
+    keep = matches["試合形式"].isin(selected_types).to_numpy()
+    if date_range is not None and len(date_range) == 2:
+        match_dates = dates.reindex(matches["試合ID"]).to_numpy()
+        start, end = (pd.Timestamp(d) for d in date_range)
+        keep = keep & (match_dates >= start) & (match_dates <= end)
+    return set(matches["試合ID"][keep])
+
+
+def render(backend):
+    st.title("選手比較・ランキング")
+    t0 = time.perf_counter()
+    match_ids = _match_filter(backend)
+    if match_ids is None:
+        # 絞り込まないときは記録のたびに更新している集計をそのまま使う
+        metrics = backend.load_player_metrics()
+    else:
+        # 終了した試合はまとめの件数を足し合わせ、まとめのない試合だけショットから集計する
+        metrics = match_summary.metrics_for_matches(backend, match_ids)
+    if metrics.empty:
+        st.warning("条件に合うデータがありません。")
+        return
+
+    col_sort, col_min, col_top = st.columns(3)
+    sort_by = col_sort.selectbox("並べ替え", analytics.COMPARE_METRICS, index=analytics.COMPARE_METRICS.index(SORT_DEFAULT))
+    min_shots = col_min.number_input("最低ショット数", min_value=0, value=min(50, int(metrics["総ショット数"].max())), step=10)
+    top_n = col_top.number_input("図に表示する人数", min_value=1, max_value=100, value=20)
+
+    # ミス率は低いほうが上位
+    ranked = metrics[metrics["総ショット数"] >= min_shots]
+    ranked = ranked.sort_values(sort_by, ascending=sort_by == "ミス率", kind="stable")
+    table = ranked[["試合数", "総ショット数"] + analytics.COMPARE_METRICS]
+    table.insert(0, "順位", range(1, len(table) + 1))
+
+    st.subheader(f"🏆 {sort_by} の順位（{len(table)} 人）")
+    st.dataframe(
+        table,
+        use_container_width=True,
+        column_config={
+            col: st.column_config.ProgressColumn(col, format="percent", min_value=0, max_value=1)
+            for col in analytics.COMPARE_METRICS
+        },
+    )
+
+    st.subheader("📊 指標の比較")
+    top = table.head(int(top_n))
+    values = top[analytics.COMPARE_METRICS]
+    fig = go.Figure(go.Heatmap(
+        z=values.to_numpy(),
+        x=analytics.COMPARE_METRICS,
+        y=top.index.tolist(),
+        zmin=0,
+        zmax=1,
+        colorscale="Blues",
+        text=(values * 100).round(1).astype(str).to_numpy(),
+        texttemplate="%{text}%",
+        hovertemplate="%{y}<br>%{x}: %{text}%<extra></extra>",
+    ))
+    fig.update_layout(
+        yaxis=dict(autorange="reversed"),
+        margin=dict(t=10, b=10),
+        height=120 + 28 * len(top),
+    )
+    with profiling.span(profiling.RENDER, "指標の比較"):
+        st.plotly_chart(fig, use_container_width=True)
+    st.caption(f"{len(metrics)} 人を集計（{(time.perf_counter() - t0) * 1000:.0f} ms）")
@@ -0,0 +1,32 @@
+import os
+
+import streamlit as st
+
+import storage
+from views import paging
+
+
+def render(backend):
+    st.title("CSVファイル編集")
+
+    file_option = st.selectbox("編集するCSVファイルを選択", ["players.csv", "matches.csv", "shots.csv"])
+    table = {"players.csv": "players", "matches.csv": "matches", "shots.csv": "shots"}[file_option]
+    file_path = file_option
+
+    if storage.STORAGE_BACKEND != "csv" or os.path.exists(file_path):
+        # 表全体ではなく選んだページの行だけを編集し、その範囲だけを書き戻す
+        total = backend.count_rows(table)
+        start, stop = paging.page_selector(total, key=f"edit_page_{table}")
+        df = backend.load_rows(table, start, stop)
+        st.markdown(f"### {file_option} の内容を編集")
+        edited_df = st.data_editor(df, num_rows="dynamic", use_container_width=True, key=f"editor_{table}_{total}_{start}")
+
+        if st.button("💾 変更を保存"):
+            # すべてがNaNの行を削除
+            cleaned_df = edited_df.dropna(axis=0, how='all')
+            if backend.save_rows(table, start, stop, cleaned_df, expected_rows=total):
+                st.success(f"{file_option} の {start + 1}〜{stop} 行目を保存しました（空の行は削除されました）。")
+            else:
+                st.warning("編集中に他の端末で行が追加・削除されたため、保存しませんでした。もう一度読み込んでから編集してください。")
+    else:
+        st.warning(f"{file_path} が見つかりません。ファイルが存在するか確認してください。")
@@ -0,0 +1,44 @@
+import streamlit as st
+
+from views import match_summary, paging
+
+
+def render(backend):
+    st.title("試合管理（一覧と削除）")
+
+    # 試合一覧表示
+    match_df = backend.load_matches()
+    st.subheader("📅 登録済みの試合一覧")
+    selected_filter_player = st.selectbox("選手で絞り込み", ["全員"] + sorted(match_df["選手名"].unique().tolist()))
+    if selected_filter_player != "全員":
+        filtered_df = match_df[match_df["選手名"] == selected_filter_player]
+    else:
+        filtered_df = match_df
+    paging.show_frame(filtered_df, key="matches_page")
+
+    match_ids = match_df["試合ID"].unique().tolist()
+
+    # 終了した試合はそのときに作ったまとめを表示する（生のショットから集計し直さない）
+    st.subheader("📄 試合のまとめ")
+    selected_summary_match = st.selectbox("まとめを見る試合IDを選択", match_ids)
+    if selected_summary_match is not None:
+        summary = backend.load_match_summary(selected_summary_match)
+        if summary is None:
+            st.info("この試合のまとめはまだありません（試合の記録を終了すると作られます）。")
+            if st.button("📄 まとめを作成"):
+                summary = backend.finish_match(selected_summary_match)
+        if summary is not None:
+            match_summary.render(summary)
+
+    # 削除機能
+    selected_delete_match = st.selectbox("削除したい試合IDを選択", match_ids)
+    if st.button("🗑️ この試合を削除"):
+        backend.delete_match(selected_delete_match)
+
+        st.success(f"試合 {selected_delete_match} を削除しました。")
+        st.stop()
+
+    # 削除・取り消しした行は目印を付けただけなので、ときどきファイルから取り除く（件数が増えると自動でも行う）
+    if st.button("🧹 削除済みのデータを整理"):
+        removed = backend.compact()
+        st.success(f"削除済みの {sum(removed.values())} 行を取り除きました。")
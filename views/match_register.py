@@ -0,0 +1,22 @@
+import datetime
+
+import streamlit as st
+
+
+def render(backend):
+    st.title("🏸 試合登録")
+    players_df = backend.load_players()
+    all_players = players_df["名前"].tolist()
+    with st.form("match_form"):
+        match_date = st.date_input("試合日付", value=datetime.date.today())
+        match_number = st.selectbox("試合番号", ["①", "②", "③", "④", "⑤", "⑥", "⑦", "⑧", "⑨", "⑩"])
+        selected_players = st.multiselect("選手（1〜4人）", all_players, max_selections=4)
+        match_type = "ダブルス" if len(selected_players) > 2 else "シングルス"
+
+        auto_match_id = f"{match_date}_{match_number}_{'_'.join(selected_players)}"
+        st.text_input("自動生成された試合ID", value=auto_match_id, disabled=True)
+        submit_match = st.form_submit_button("試合を登録")
+
+        if submit_match and selected_players:
+            backend.add_match_rows([[auto_match_id, match_type, player, ""] for player in selected_players])
+            st.success("試合を登録しました。")
@@ -0,0 +1,58 @@
+# 試合のまとめの表示（ページではないので PAGES には載せない）。試合管理と試合記録の終了時に使う
+import json
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+
+import analytics
+import heatmap
+import profiling
+
+
+def render(summary):
+    """match_summary.build() の dict を表示する。"""
+    teams = list(summary["score"])
+    st.markdown("**最終スコア**　" + " - ".join(f"{team or '―'} {summary['score'][team]}" for team in teams) + f"（{summary['shot_count']} 球）")
+
+    progression = pd.DataFrame(summary["スコアの推移"])
+    if not progression.empty:
+        fig = go.Figure([go.Scatter(x=progression["ラリー"], y=progression[team], mode="lines", line_shape="hv", name=team or "―") for team in teams])
+        fig.update_layout(xaxis_title="ラリー", yaxis_title="得点", margin=dict(t=10, b=10), height=260)
+        with profiling.span(profiling.RENDER, "スコアの推移"):
+            st.plotly_chart(fig, use_container_width=True)
+
+    lengths = pd.Series(summary["ラリーの長さ"], dtype="int64")
+    if not lengths.empty:
+        lengths.index = lengths.index.astype(int)
+        fig = go.Figure(go.Bar(x=lengths.index, y=lengths.to_numpy()))
+        fig.update_layout(xaxis_title="ラリーの球数", yaxis_title="ラリー数", margin=dict(t=10, b=10), height=220)
+        with profiling.span(profiling.RENDER, "ラリーの長さ"):
+            st.plotly_chart(fig, use_container_width=True)
+
+    players = summary["players"]
+    table = pd.DataFrame({p: {"チーム": e["チーム"], "総ショット数": e["件数"]["総ショット数"], **e["指標"]} for p, e in players.items()}).T
+    st.dataframe(
+        table,
+        use_container_width=True,
+        column_config={
+            col: st.column_config.ProgressColumn(col, format="percent", min_value=0, max_value=1)
+            for col in analytics.COMPARE_METRICS
+        },
+    )
+
+    key = st.radio("ヒートマップ", ["ミス打点", "打点", "着地"], horizontal=True, key=f"summary_area_{summary['match_id']}")
+    cols = st.columns(min(len(players), 4) or 1)
+    for i, (player, entry) in enumerate(players.items()):
+        grid = np.asarray(entry[key], dtype=np.int64).reshape(3, 3)
+        with cols[i % len(cols)], profiling.span(profiling.RENDER, f"{key}ヒートマップ（{player}）"):
+            st.image(heatmap.cached_heatmap(grid, player))
+
+    st.download_button(
+        "まとめを JSON で保存",
+        json.dumps(summary, ensure_ascii=False, indent=1),
+        file_name=f"{summary['match_id']}.json",
+        mime="application/json",
+        key=f"summary_download_{summary['match_id']}",
+    )
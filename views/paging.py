@@ -0,0 +1,34 @@
+# 表をページに分けて表示する部品（ページではないので PAGES には載せない）。
+# 表全体をブラウザへ送らず、選んだページの行だけを送る
+import streamlit as st
+
+PAGE_SIZE = 50
+
+
+def page_bounds(total, page, size=PAGE_SIZE):
+    """page ページ目（1 が最新）の行の範囲 (start, stop)。最新のページが末尾の行になる。"""
+    stop = max(total - (page - 1) * size, 0)
+    return max(stop - size, 0), stop
+
+
+def page_selector(total, key, size=PAGE_SIZE):
+    """ページ番号の入力欄を出し、選んだページの (start, stop) を返す。"""
+    pages = max((total + size - 1) // size, 1)
+    if pages == 1:
+        return 0, total
+    page = st.number_input(f"ページ（1 が最新・全 {pages} ページ）", min_value=1, max_value=pages, value=1, key=key)
+    start, stop = page_bounds(total, page, size)
+    st.caption(f"全 {total} 件中 {start + 1}〜{stop} 件目")
+    return start, stop
+
+
+def show_table(backend, table, key, size=PAGE_SIZE):
+    """保存先の表を1ページ分だけ読み込んで表示する。"""
+    start, stop = page_selector(backend.count_rows(table), key, size)
+    st.dataframe(backend.load_rows(table, start, stop))
+
+
+def show_frame(df, key, size=PAGE_SIZE):
+    """読み込み済みの DataFrame を1ページ分だけ表示する。"""
+    start, stop = page_selector(len(df), key, size)
+    st.dataframe(df.iloc[start:stop])
@@ -0,0 +1,46 @@
+# 期間の入力欄（ページではないので PAGES には載せない）。データ解析と選手プロフィール一覧で使う。
+# 試合日は試合IDの先頭の日付。選んだ期間のショットは backend.load_shots_between() で期間内の分だけ読む
+import datetime
+
+import plotly.graph_objects as go
+import streamlit as st
+
+import analytics
+
+# 絞り込まないときの「調子の推移」と、期間の入力欄の初期値に使う日数
+RECENT_DAYS = 30
+
+
+def date_bounds(backend):
+    """記録のある試合日の最初と最後（datetime.date）。日付で始まる試合IDがなければ None。"""
+    dates = analytics.match_dates(backend.load_matches()["試合ID"])
+    if not dates.notna().any():
+        return None
+    return dates.min().date(), dates.max().date()
+
+
+def recent(bounds, days=RECENT_DAYS):
+    """最後の試合日までの days 日間。"""
+    first, last = bounds
+    return max(first, last - datetime.timedelta(days=days - 1)), last
+
+
+def select(bounds, key):
+    """「期間で絞り込む」の入力欄を出し、(開始日, 終了日) を返す。絞り込まないとき・日付が選び途中のときは None。"""
+    if bounds is None or not st.checkbox("期間で絞り込む", key=f"{key}_on"):
+        return None
+    value = st.date_input("期間", recent(bounds), min_value=bounds[0], max_value=bounds[1], key=f"{key}_range")
+    return tuple(value) if len(value) == 2 else None
+
+
+def trend_figure(trend, height=300):
+    """analytics.metrics_by_date() の1選手分（index は日付）の 得点率・ミス率 の折れ線。"""
+    fig = go.Figure([
+        go.Scatter(
+            x=trend.index, y=trend[col], mode="lines+markers", name=col,
+            customdata=trend["総ショット数"], hovertemplate="%{x|%Y-%m-%d}<br>" + col + ": %{y:.1%}（%{customdata} 球）<extra></extra>",
+        )
+        for col in ["得点率", "ミス率"]
+    ])
+    fig.update_layout(yaxis=dict(tickformat=".0%", rangemode="tozero"), margin=dict(t=10, b=10), height=height, legend=dict(orientation="h"))
+    return fig
@@ -0,0 +1,21 @@
+import streamlit as st
+
+from views import paging
+
+
+def render(backend):
+    st.title("選手登録")
+    with st.form("player_form"):
+        name = st.text_input("名前")
+        hand = st.selectbox("利き手", ["右", "左"])
+        team = st.text_input("チーム名")
+        submit = st.form_submit_button("登録")
+        if submit:
+            df = backend.load_players()
+            if name in df["名前"].values:
+                st.warning("この選手はすでに登録されています。")
+            else:
+                backend.add_player([name, hand, team])
+                st.success(f"{name} さんを登録しました！")
+    st.subheader("📋 登録済み選手")
+    paging.show_table(backend, "players", key="players_page")
@@ -0,0 +1,21 @@
+# サイドバーに出す処理時間の内訳（ページではないので PAGES には載せない）
+import streamlit as st
+
+import profiling
+
+
+def render(rerun):
+    """終わった再実行の記録 rerun を、種類ごとの合計と時間のかかった処理の順に表示する。"""
+    with st.sidebar.expander("⏱ 処理時間（この再実行）", expanded=True):
+        st.caption(f"{rerun['ページ']}: 合計 {rerun['合計ms']:.0f} ms")
+        st.dataframe(profiling.summary(rerun), use_container_width=True)
+        slowest = sorted(rerun["records"], key=lambda r: r["ms"], reverse=True)[:10]
+        for r in slowest:
+            size = f"・{r['bytes'] / 1024:.0f} KB" if r["bytes"] else ""
+            st.caption(f"{r['kind']} {r['name']}: {r['ms']:.1f} ms{size}")
+        st.download_button(
+            f"直近 {len(profiling.history)} 回分を JSONL で保存",
+            profiling.to_jsonl(),
+            file_name="reruns.jsonl",
+            mime="application/jsonl",
+        )
@@ -0,0 +1,59 @@
+import streamlit as st
+
+import analytics
+import charts
+import profiling
+from views import period
+
+
+def render(backend):
+    st.title("選手プロフィール一覧")
+    players_df = backend.load_players()
+    selected_period = period.select(period.date_bounds(backend), "profiles_period")
+    if selected_period is None:
+        metrics = backend.load_player_metrics()
+        trend = None
+    else:
+        # 期間内の試合日の分割だけを読み、その中で集計する
+        shots = backend.load_shots_between(*selected_period)
+        metrics = analytics.player_metrics(shots)
+        metrics["試合数"] = analytics.matches_played(shots).reindex(metrics.index, fill_value=0)
+        trend = analytics.metrics_by_date(shots)
+    player_list = metrics.index.tolist()
+    cols = st.columns(2)
+    for i, player in enumerate(player_list):
+        with cols[i % 2]:
+            with st.container():
+                st.markdown("""
+                <div style='background-color: #f0f2f6; padding: 16px; border-radius: 12px; box-shadow: 0 4px 6px rgba(0,0,0,0.1);'>
+                """, unsafe_allow_html=True)
+
+                m = metrics.loc[player]
+                score = m["得点"]
+                miss = m["ミス"]
+                total = m["総ショット数"]
+                categories = charts.PROFILE_RADAR
+
+                st.markdown(f"#### 🏸 {player}")
+                player_info = players_df[players_df["名前"] == player].iloc[0]
+                st.markdown(f"- チーム: {player_info['チーム']}")
+                st.markdown(f"- 利き手: {player_info['利き手']}")
+
+                st.markdown(f"- 試合数: {m['試合数']}")
+                st.markdown(f"- 総ショット数: {total}")
+                st.markdown(f"- 決定率: {(score / total * 100):.1f}%")
+                st.markdown(f"- ミス率: {(miss / total * 100):.1f}%")
+
+                fig_radar = charts.radar_figure(m, categories, player, margin=dict(t=0, b=0), height=300)
+                with profiling.span(profiling.RENDER, f"レーダーチャート（{player}）"):
+                    st.plotly_chart(fig_radar, use_container_width=True)
+
+                if trend is not None and player in trend.index.get_level_values("選手"):
+                    with profiling.span(profiling.RENDER, f"調子の推移（{player}）"):
+                        st.plotly_chart(period.trend_figure(trend.loc[player], height=200), use_container_width=True, key=f"trend_{player}")
+
+                if st.button(f"🔍 {player} のデータ解析を見る", key=f"view_{player}"):
+                    st.session_state["selected_analysis_player"] = player
+                    st.rerun()
+
+                st.markdown("""</div>""", unsafe_allow_html=True)
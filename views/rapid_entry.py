@@ -0,0 +1,66 @@
+# 試合記録ページの高速入力（ページではないので PAGES には載せない）。
+# 入力中のコードはブラウザ側のフォームに溜まるだけで、送信（ラリーの終わり）まで再実行しない
+import pandas as pd
+import streamlit as st
+
+import rapid_entry
+from schema import SHOT_COLUMNS
+
+
+def _state(backend, match_id):
+    # 前回このセッションで記録した直後からデータが変わっていなければ、そのとき求めた状態をそのまま使う
+    saved = st.session_state.get("rapid_state")
+    if saved and saved[0] == match_id and saved[1] == backend.data_version():
+        return saved[2]
+    return backend.load_match_state(match_id)
+
+
+def _flush(backend, match_id, players):
+    """送信ボタンのコールバック。入力をまとめて記録し、入力欄を空にする。"""
+    shots, errors = rapid_entry.parse(st.session_state.get("rapid_text", ""), players)
+    if errors:
+        st.session_state["rapid_message"] = ("error", errors)
+        return
+    if not shots:
+        return
+    if shots[-1]["結果"] == "続行":
+        st.session_state["rapid_message"] = ("error", ["ラリーの最後の1球に結果（+ 得点 / - ミス / x アウト）を付けてください。"])
+        return
+    # 状態を読んでから記録するまでの間に別のコートが同じ番号で記録しないよう、ショットのロックの中で行う
+    with backend.shots_lock():
+        rows, state = rapid_entry.to_rows(match_id, shots, _state(backend, match_id))
+        backend.append_shots(rows)
+        st.session_state["rapid_state"] = (match_id, backend.data_version(), state)
+    st.session_state["rapid_last"] = rows
+    st.session_state["rapid_message"] = ("success", [f"{len(rows)} 球を記録しました。"])
+    st.session_state["rapid_text"] = ""
+
+
+def render_match(backend, match_id, match_players):
+    players = match_players["選手名"].tolist()
+    teams = match_players["チーム"].fillna("").tolist()
+    state = _state(backend, match_id)
+
+    score = " - ".join(f"{team or '―'} {n}" for team, n in state["score"].items())
+    st.subheader(f"🌟 スコア：{score}")
+    st.caption(f"次: ラリー {state['rally_no']}・{state['shot_order']} 球目" + (f"（{state['next_player']}）" if state["next_player"] else ""))
+
+    st.markdown("**選手の番号**　" + "　".join(f"{i + 1}: {p}" + (f"（{t}）" if t else "") for i, (p, t) in enumerate(zip(players, teams))))
+    st.caption(
+        "1球 = 番号・打点・着地・ショット・結果（例: 1RRLFs 2LFRRh 1CMRF+）。ショット: "
+        + " ".join(f"{code}={name}" for code, name in rapid_entry.SHOT_CODES.items())
+        + "　結果: + 得点 / - ミス / x アウト（なしは続行）"
+    )
+
+    with st.form("rapid_form"):
+        st.text_area("ラリーのコード（空白・改行区切り）", key="rapid_text", height=100)
+        st.form_submit_button("ラリーを記録", on_click=_flush, args=(backend, match_id, players))
+
+    message = st.session_state.pop("rapid_message", None)
+    if message:
+        kind, lines = message
+        (st.success if kind == "success" else st.error)("\n\n".join(lines))
+    last = st.session_state.get("rapid_last")
+    if last and last[0][0] == match_id:
+        st.markdown("**直前に記録したラリー**")
+        st.dataframe(pd.DataFrame(last, columns=SHOT_COLUMNS).drop(columns="試合ID"), hide_index=True)
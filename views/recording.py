@@ -0,0 +1,65 @@
+import streamlit as st
+
+from views import match_summary, paging, rapid_entry
+
+
+def _finish_button(backend, match_id):
+    if st.button("✅ この試合の記録を終了する"):
+        # 試合のまとめは終了時に一度だけ作り、後で見返すときはそれを読む
+        summary = backend.finish_match(match_id)
+        st.success("試合の記録を終了しました。別のページへ移動してください。")
+        match_summary.render(summary)
+        st.stop()
+
+
+def render(backend):
+    st.title("個人ショット記録")
+
+    st.subheader("🎯 試合と選手を選択")
+    match_df = backend.load_matches()
+    match_ids = match_df["試合ID"].unique().tolist()
+    selected_match = st.selectbox("試合IDを選択", match_ids)
+
+    # 高速入力はラリー単位で試合の全員分を記録する
+    if st.radio("入力方法", ["1球ずつ", "高速入力（ラリーごと）"], horizontal=True) != "1球ずつ":
+        rapid_entry.render_match(backend, selected_match, match_df[match_df["試合ID"] == selected_match])
+        _finish_button(backend, selected_match)
+        return
+
+    match_players = match_df[match_df["試合ID"] == selected_match]["選手名"].tolist()
+    selected_player = st.selectbox("選手名を選択", match_players)
+
+    col_left, col_right = st.columns([1, 2])
+    with col_left:
+        st.image("new_court_map.webp", caption="コート図", use_container_width=True)
+    with col_right:
+        with st.form("individual_shot_form"):
+
+            st.markdown("### 🔽 ショット記録")
+            area_list = ["RR", "CR", "LR", "RM", "CM", "LM", "RF", "CF", "LF"]
+
+            start_area = st.selectbox("打点エリア", area_list)
+            end_area = st.selectbox("着地点エリア", area_list)
+            shot_type = st.radio("ショット種類", ["クリア", "スマッシュ", "ドロップ", "ロングリターン", "ショートリターン", "ドライブ", "ロブ", "プッシュ", "ヘアピン"], horizontal=True)
+            result = st.radio("結果", ["続行", "得点", "ミス", "アウト"], horizontal=True)
+            match_id = selected_match
+
+            submit = st.form_submit_button("記録する")
+            if submit:
+                # 状態を読んでから記録するまでの間に別のコートが同じ番号で記録しないよう、ショットのロックの中で行う
+                with backend.shots_lock():
+                    state = backend.load_match_state(match_id)
+                    rally_no = state["rally_no"]
+                    shot_order = state["shot_order"]
+                    backend.append_shots([[match_id, rally_no, shot_order, selected_player, start_area, end_area, shot_type, result, ""]])
+                st.success(f"{selected_player} のショットを記録しました！")
+    st.subheader(f"📋 {selected_player} のショット履歴")
+    personal_shots = backend.query_shots(match_id=selected_match, player=selected_player).sort_values(by=["ラリー番号", "ショット順"])
+    paging.show_frame(personal_shots.reset_index(drop=True), key="history_page")
+
+    _finish_button(backend, selected_match)
+
+    if st.button("🗑️ 最後の1件を削除"):
+        if backend.delete_last_shot(selected_match, player=selected_player) is not None:
+            st.success("最後のショット記録を削除しました。")
+            st.rerun()